@@ -1,52 +1,55 @@
+import functools
 import os
-
-from dotenv import load_dotenv
-
-from google.adk.agents import Agent
-from google.adk.tools import VertexAiSearchTool
+import threading
+from typing import Optional
 
 # --- Load Environment Variables ---
-# This looks for a .env file in the same directory
-load_dotenv()
-
-os.environ["GOOGLE_CLOUD_PROJECT"] = os.getenv("GOOGLE_CLOUD_PROJECT") or "qwiklabs-gcp-01-3bb38adc87a2"
-os.environ["GOOGLE_CLOUD_LOCATION"] = os.getenv("GOOGLE_CLOUD_LOCATION") or "us-central1"
-os.environ["MODEL"] = os.getenv("MODEL") or "gemini-2.5-flash"
-os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "True"
-
-PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
-LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-MODEL_NAME = os.getenv("MODEL", "gemini-2.5-flash")
-DATASTORE_ID = os.getenv("DATASTORE_ID")
-DATASTORE_PATH = f"projects/{PROJECT_ID}/locations/global/collections/default_collection/dataStores/{DATASTORE_ID}"
+# Nothing heavy happens at import time: the .env file, google.adk and the Agent
+# itself are only loaded when get_agent() (or root_agent) is first used, so a
+# cold start only pays for what it touches.
+@functools.lru_cache(maxsize=None)
+def load_settings() -> dict:
+    """Loads the .env file in this directory and fills in defaults, once per process."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    os.environ["GOOGLE_CLOUD_PROJECT"] = os.getenv("GOOGLE_CLOUD_PROJECT") or "qwiklabs-gcp-01-3bb38adc87a2"
+    os.environ["GOOGLE_CLOUD_LOCATION"] = os.getenv("GOOGLE_CLOUD_LOCATION") or "us-central1"
+    os.environ["MODEL"] = os.getenv("MODEL") or "gemini-2.5-flash"
+    os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "True"
+
+    project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
+    datastore_id = os.getenv("DATASTORE_ID")
+    return {
+        "PROJECT_ID": project_id,
+        "LOCATION": os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"),
+        "MODEL_NAME": os.getenv("MODEL", "gemini-2.5-flash"),
+        "DATASTORE_ID": datastore_id,
+        "DATASTORE_PATH": f"projects/{project_id}/locations/global/collections/default_collection/dataStores/{datastore_id}",
+    }
 
 # --- Tools ---
-import requests
-
-class EmailClient:
-    def __init__(self, host="34.136.30.136", port=8080):
-        self.base_url = f"http://{host}:{port}"
-
-    def send_email(self, recipient_email, subject, body_html, attachment_content='', attachment_name="event.ics"):
-        """
-        Calls the Flask web service to send an email via Brevo.
-        """
-        endpoint = f"{self.base_url}/send-email"
-        
-        payload = {
-            "recipient_email": recipient_email,
-            "subject": subject,
-            "body_html": body_html,
-            "attachment_content": attachment_content,
-            "attachment_name": attachment_name
-        }
+try:
+    from . import attachments, dates, ics, policy_index, templates
+except ImportError:
+    import attachments
+    import dates
+    import ics
+    import policy_index
+    import templates
+
+def _import_email_client():
+    # email_client pulls in requests, so it is only imported on the first send.
+    try:
+        from .email_client import EmailClient
+    except ImportError:
+        from email_client import EmailClient
+    return EmailClient
 
-        try:
-            response = requests.post(endpoint, json=payload)
-            response.raise_for_status()  # Raises an error for 4xx or 5xx responses
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
+@functools.lru_cache(maxsize=None)
+def get_email_client():
+    """One shared client (and keep-alive session) for every send_email call."""
+    return _import_email_client()()
 
 # # --- Example Usage ---
 # if __name__ == "__main__":
@@ -73,57 +76,93 @@ def get_date(x_days_from_today:int):
         A dict with the date in a formal writing format. For example:
         {"date": "Wednesday, May 7, 2025"}
     """
-    from datetime import datetime, timedelta
-
-    target_date = datetime.today() + timedelta(days=x_days_from_today)
-    date_string = target_date.strftime("%A, %B %d, %Y")
+    target_date = dates.days_from_today(x_days_from_today)
+    date_string = target_date.strftime(dates.FORMAL_FORMAT)
 
     return {"date": date_string}
 
 def create_calendar_event(event_name: str, date_str: str) -> dict:
-    """Generates an RFC-compliant ICS file and returns the base64 content."""
-    import datetime
-    import base64
-    from dateutil import parser 
-    from icalendar import Calendar, Event
-    cal = Calendar()
-    cal.add('prodid', '-//AI Agent Calendar//mxm.dk//')
-    cal.add('version', '2.0')
-    event = Event()
-    event.add('summary', event_name)
-    
+    """
+    Generates an RFC-compliant ICS file and returns a short handle to it as
+    attachment_content. Pass it to send_email unchanged.
+    """
     try:
-        dt = parser.parse(date_str)
-        event.add('dtstart', dt)
-        event.add('dtend', dt + datetime.timedelta(hours=1))
-        event.add('dtstamp', datetime.datetime.now())
-        event.add('uid', f"{int(datetime.datetime.now().timestamp())}@ddintl.com")
-    except (ValueError, TypeError) as e:
+        dt = dates.resolve_start(date_str)
+    except (ValueError, TypeError, OverflowError) as e:
         return {"error": f"Could not parse date '{date_str}': {str(e)}"}
-    
-    cal.add_component(event)
-    ical_bytes = cal.to_ical()
-    b64_content = base64.b64encode(ical_bytes).decode('utf-8')
-    
+
+    # The ICS bytes stay in the attachment store; the model only sees a short handle.
+    return {
+        "attachment_content": attachments.put_attachment(ics.build_calendar([(event_name, dt)])),
+        "attachment_name": ics.attachment_name(event_name)
+    }
+
+def create_calendar_events(events: list[dict]) -> dict:
+    """
+    Generates one ICS file holding several events, e.g. one reminder per policy
+    for a user who holds more than one, and returns a handle to it as
+    attachment_content.
+
+    Args:
+        events: list of {"event_name": str, "date_str": str} entries.
+    """
+    entries = []
+    for item in events:
+        event_name = item.get("event_name", "")
+        date_str = item.get("date_str", "")
+        try:
+            entries.append((event_name, dates.resolve_start(date_str)))
+        except (ValueError, TypeError, OverflowError) as e:
+            return {"error": f"Could not parse date '{date_str}' for '{event_name}': {str(e)}"}
+    if not entries:
+        return {"error": "No events given"}
+
     return {
-        "attachment_content": b64_content,
-        "attachment_name": f"{event_name.replace(' ', '_')}.ics"
+        "attachment_content": attachments.put_attachment(ics.build_calendar(entries)),
+        "attachment_name": "reminders.ics" if len(entries) > 1 else ics.attachment_name(entries[0][0])
     }
 
+def lookup_policy_expiration(policy_id: str = "", holder: str = "") -> dict:
+    """
+    Looks up policy expiration dates in the precomputed policy index.
+
+    Args:
+        policy_id (str): the policy number, if known.
+        holder (str): the policy holder's full name, if the policy number is not known.
+
+    Returns:
+        {"policies": [{"policy_id", "holder", "email", "expiration_date"}, ...]}
+        or an error if the index is unavailable or nothing matched, in which
+        case search with 'vertex_ai_search' instead.
+    """
+    index = policy_index.get_index()
+    if index is None:
+        return {"error": "Policy index is not available"}
+    policies = index.lookup(policy_id=policy_id, holder=holder)
+    if not policies:
+        return {"error": f"No policy found for policy_id='{policy_id}' holder='{holder}'"}
+    return {"policies": policies}
+
+def list_expiring_policies(days: int) -> dict:
+    """
+    Lists policies that expire between today and `days` days from today, soonest first.
+
+    Args:
+        days (int): size of the window in days, e.g. 30.
+    """
+    index = policy_index.get_index()
+    if index is None:
+        return {"error": "Policy index is not available"}
+    return {"policies": index.expiring_within(days, today=dates.today().date())}
+
 # def send_email(recipient_email: str, subject: str, body_html: str, 
 #                attachment_content: str = '', attachment_name: str = "event.ics") -> dict:
 #     """Sends an email via Brevo with the corrected attachment structure."""
-#     import os
 #     import requests
-#     from google.cloud import secretmanager
-#     client = secretmanager.SecretManagerServiceClient()
-#     # We use environment variables that will be available in the cloud
-#     project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-#     secret_path = f"projects/{project_id}/secrets/BREVO_API_KEY/versions/latest"
+#     from .credentials import get_brevo_api_key
     
 #     try:
-#         response = client.access_secret_version(request={"name": secret_path})
-#         api_key = response.payload.data.decode("UTF-8")
+#         api_key = get_brevo_api_key()
 #     except Exception as e:
 #         return {"error": f"Failed to retrieve API key: {str(e)}"}
 
@@ -144,18 +183,28 @@ def create_calendar_event(event_name: str, date_str: str) -> dict:
 #     return resp.json() if resp.status_code < 400 else {"error": resp.text}
 
 
-def send_email(recipient_email: str, subject: str, body_html: str, 
-               attachment_content: str = '', attachment_name: str = "event.ics") -> dict:
-    """Sends an email via Brevo with the corrected attachment structure."""
-    client = EmailClient()
+def send_email(recipient_email: str, subject: str = "", body_html: str = "",
+               attachment_content: str = '', attachment_name: str = "event.ics",
+               template_id: str = "", variables: Optional[dict] = None) -> dict:
+    """
+    Sends an email via Brevo with the corrected attachment structure.
+
+    Prefer template_id plus variables (e.g. template_id="policy_expiration_reminder",
+    variables={"policy_id": "...", "expiration_date": "..."}); the service renders the
+    subject and HTML body. Only write subject/body_html for messages no template covers.
+    """
+    client = get_email_client()
     
     result = client.send_email(
         recipient_email=recipient_email,
-        subject=subject,
-        body_html=body_html,
+        subject=subject or None,
+        body_html=body_html or None,
         attachment_content= attachment_content,
-        attachment_name=attachment_name
+        attachment_name=attachment_name,
+        template_id=template_id or None,
+        variables=variables
     )
+    return result
 
 
 # --- Example Usage ---
@@ -173,28 +222,103 @@ def send_email(recipient_email: str, subject: str, body_html: str,
 
 
 
-vertex_search_tool = VertexAiSearchTool(
-    data_store_id=DATASTORE_PATH,
-    bypass_multi_tools_limit=True
-)
-
-root_agent = Agent(
-    name="root_agent",
-    description="Sends and email",
-    model=os.getenv("MODEL", "gemini-2.5-flash"),
-    instruction="""
+INSTRUCTION = """
     You are an insurance assistant. Your goal is to help users find policy expiration dates
     and set reminders.
-    1. ALWAYS call 'VertexAiSearchTool' first to retrieve the data.
+    1. To find an expiration date, call 'lookup_policy_expiration' first; use 'list_expiring_policies' for
+       questions like "which policies expire in the next N days". If either returns an error or nothing useful,
+       ALWAYS call the Vertex AI Search tool ('vertex_ai_search') to retrieve the data.
     2. DO NOT claim you lack access to policy information.
     3. If the user mentions a date/reminder or you find one in the search results, you MUST first call 'create_calendar_event'.
+       If the user holds several policies, call 'create_calendar_events' once with all of them instead.
     4. Once you receive the 'attachment_content' from that tool, you MUST then call 'send_email'.
     5. Pass the 'attachment_content' and 'attachment_name' from the first tool into the 'send_email' tool.
-    6. Only tell the user "The email has been sent" AFTER you have received a successful response from the 'send_email' tool.
-    7. Show the curl statement that would be called from a terminal that send_mail function would make as part of the output if the prompt asks for the debugging information.
-    """,
-    tools=[vertex_search_tool, send_email, create_calendar_event]
-    )
+       'attachment_content' is a short handle such as 'att-1a2b...'; copy it exactly, never expand or re-encode it.
+    6. Do not write the email yourself. Call 'send_email' with a 'template_id' and its 'variables'
+       and leave 'subject' and 'body_html' empty; the service renders them. Use
+       'policy_expiration_reminder' for one policy and 'policy_expiration_digest' (with 'policies' as a
+       short list such as "AUTO-1 on May 7, 2025, HOME-2 on June 1, 2025") for several. Only write
+       'subject' and 'body_html' for a message no template covers. Available templates:
+       {templates}
+    7. Only tell the user "The email has been sent" AFTER you have received a successful response from the 'send_email' tool.
+    8. Show the curl statement that would be called from a terminal that send_mail function would make as part of the output if the prompt asks for the debugging information.
+    """.replace("{templates}", templates.describe().replace("\n", "\n       "))
+
+_agent_lock = threading.Lock()
+_root_agent = None
+
+@functools.lru_cache(maxsize=None)
+def get_vertex_search_tool():
+    """
+    By default searches go through a caching function tool against the same data
+    store; SEARCH_CACHE=off falls back to Gemini's built-in retrieval.
+    """
+    datastore_path = load_settings()["DATASTORE_PATH"]
+    if os.getenv("SEARCH_CACHE", "on").lower() in ("off", "0", "false"):
+        from google.adk.tools import VertexAiSearchTool
+        return VertexAiSearchTool(
+            data_store_id=datastore_path,
+            bypass_multi_tools_limit=True
+        )
+    try:
+        from .search_cache import CachedVertexSearchTool
+    except ImportError:
+        from search_cache import CachedVertexSearchTool
+    return CachedVertexSearchTool(data_store_id=datastore_path)
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache():
+    """The root_agent response cache, or None unless RESPONSE_CACHE=on. stats() has the hit rates."""
+    try:
+        from .response_cache import cache_from_env
+    except ImportError:
+        from response_cache import cache_from_env
+    return cache_from_env()
+
+def get_agent():
+    """Builds root_agent on first use. deploy.py and ADK's loader (via root_agent) both end up here."""
+    global _root_agent
+    if _root_agent is None:
+        with _agent_lock:
+            if _root_agent is None:
+                settings = load_settings()
+                from google.adk.agents import Agent
+                try:
+                    from .agent_trace import tracer_from_env
+                except ImportError:
+                    from agent_trace import tracer_from_env
+
+                # The response cache goes first so a cached answer short-circuits the turn before
+                # the tracer starts timing it. Both are off unless their env vars are set.
+                callbacks = {}
+                tracer = tracer_from_env()
+                for hooks in (get_response_cache(), tracer):
+                    for key, callback in (hooks.callbacks() if hooks is not None else {}).items():
+                        callbacks.setdefault(key, []).append(callback)
+                _root_agent = Agent(
+                    name="root_agent",
+                    description="Sends and email",
+                    model=settings["MODEL_NAME"],
+                    instruction=INSTRUCTION,
+                    tools=[lookup_policy_expiration, list_expiring_policies, get_vertex_search_tool(), send_email,
+                           create_calendar_event, create_calendar_events],
+                    **callbacks
+                )
+    return _root_agent
+
+_LAZY_SETTINGS = ("PROJECT_ID", "LOCATION", "MODEL_NAME", "DATASTORE_ID", "DATASTORE_PATH")
+
+def __getattr__(name):
+    # Module-level names that used to be built at import time are now built on first access.
+    if name == "root_agent":
+        return get_agent()
+    if name == "vertex_search_tool":
+        return get_vertex_search_tool()
+    if name == "EmailClient":
+        return _import_email_client()
+    if name in _LAZY_SETTINGS:
+        return load_settings()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # adk deploy agent_engine send_mail --display_name "Send mail agent 1.5" --staging_bucket gs://qwiklabs-gcp-01-3bb38adc87a2-agent-engine
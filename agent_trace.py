@@ -0,0 +1,337 @@
+"""
+Per-turn tracing for root_agent.
+
+TurnTracer hooks ADK's agent, model and tool callbacks and, for every turn
+(one invocation), records the end-to-end latency, each LLM call with its
+token usage, and the wall time of every tool call. Finished turns are kept in
+memory (recent()), appended as JSON lines and/or emitted as OpenTelemetry
+spans. Nothing is recorded unless one of these is set:
+
+    AGENT_TRACE_PATH=agent-traces.jsonl   one JSON line per turn
+    AGENT_TRACE_SPANS=1                   one span per turn with a child per step
+    AGENT_PROFILE_SLOW_MS=2000            cProfile every turn; keep the profile
+                                          of turns slower than this in
+                                          AGENT_PROFILE_DIR (default: profiles)
+
+ADK skips after_agent when a turn raises or is ended early, so turns are
+also closed out when their invocation is garbage collected, or after
+AGENT_TRACE_TURN_TIMEOUT_SECONDS at the latest; their records carry
+"abandoned": true.
+
+Gemini's built-in VertexAiSearchTool (SEARCH_CACHE=off) runs inside the model
+call, so its time shows up in the LLM step rather than as a tool.
+
+    python agent_trace.py agent-traces.jsonl    # per-step summary of a trace file
+"""
+import collections
+import cProfile
+import json
+import os
+import threading
+import time
+import weakref
+
+DEFAULT_PROFILE_DIR = os.getenv("AGENT_PROFILE_DIR", "profiles")
+# A turn still open after this long is closed out as abandoned.
+DEFAULT_TURN_TIMEOUT_SECONDS = float(os.getenv("AGENT_TRACE_TURN_TIMEOUT_SECONDS", 600))
+RECENT_TURNS = 100
+
+
+def when_invocation_ends(callback_context, callback, *args):
+    """
+    Calls callback(*args) once the turn's InvocationContext is garbage
+    collected, however the turn ended. ADK skips after_agent callbacks when a
+    turn raises or sets end_invocation, so per-turn state cannot rely on them.
+    """
+    context = getattr(callback_context, "_invocation_context", None)
+    if context is not None:
+        weakref.finalize(context, callback, *args)
+
+
+class _Turn:
+    def __init__(self, invocation_id, session_id, agent_name):
+        self.invocation_id = invocation_id
+        self.session_id = session_id
+        self.agent_name = agent_name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.steps = []
+        self.open_llm = None
+        self.open_tools = {}
+        self.profiler = None
+        self.thread_id = None
+
+    def offset_ms(self, at):
+        return round((at - self.start) * 1000, 3)
+
+
+class TurnTracer:
+    def __init__(self, path=None, spans=False, profile_slow_ms=None, profile_dir=DEFAULT_PROFILE_DIR,
+                 turn_timeout=DEFAULT_TURN_TIMEOUT_SECONDS):
+        self.path = path
+        self.spans = spans
+        self.profile_slow_ms = profile_slow_ms
+        self.profile_dir = profile_dir
+        self.turn_timeout = turn_timeout
+        self._turns = {}
+        self._recent = collections.deque(maxlen=RECENT_TURNS)
+        self._lock = threading.Lock()
+        # cProfile hooks the whole thread, so one turn per thread is profiled at a time. A profiler
+        # can only be unhooked from its own thread; orphans wait for that thread's next callback.
+        self._profiled_threads = set()
+        self._orphans = {}
+        self._tracer = None
+        if spans:
+            from opentelemetry import trace
+            self._tracer = trace.get_tracer(__name__)
+
+    def callbacks(self) -> dict:
+        """Keyword arguments for Agent(...)."""
+        return {
+            "before_agent_callback": self.before_agent,
+            "after_agent_callback": self.after_agent,
+            "before_model_callback": self.before_model,
+            "after_model_callback": self.after_model,
+            "before_tool_callback": self.before_tool,
+            "after_tool_callback": self.after_tool,
+            "on_tool_error_callback": self.on_tool_error,
+        }
+
+    def recent(self) -> list:
+        with self._lock:
+            return list(self._recent)
+
+    def _turn(self, context):
+        with self._lock:
+            return self._turns.get(context.invocation_id)
+
+    # --- Agent callbacks: one turn ---
+    def before_agent(self, callback_context):
+        self._sweep()
+        turn = _Turn(callback_context.invocation_id, callback_context.session.id, callback_context.agent_name)
+        if self.profile_slow_ms is not None:
+            thread_id = threading.get_ident()
+            with self._lock:
+                profile = thread_id not in self._profiled_threads
+                if profile:
+                    self._profiled_threads.add(thread_id)
+            if profile:
+                turn.thread_id = thread_id
+                turn.profiler = cProfile.Profile()
+                turn.profiler.enable()
+        with self._lock:
+            self._turns[turn.invocation_id] = turn
+        when_invocation_ends(callback_context, self._abandon, turn.invocation_id)
+        return None
+
+    def after_agent(self, callback_context):
+        with self._lock:
+            turn = self._turns.pop(callback_context.invocation_id, None)
+        if turn is not None:
+            self._finish(turn)
+        return None
+
+    def _abandon(self, invocation_id):
+        """Closes out a turn that ended without after_agent (it raised, or was ended early)."""
+        with self._lock:
+            turn = self._turns.pop(invocation_id, None)
+        if turn is not None:
+            self._finish(turn, abandoned=True)
+
+    def _finish(self, turn, abandoned=False):
+        end = time.perf_counter()
+        record = self._record(turn, end)
+        if abandoned:
+            record["abandoned"] = True
+        if turn.profiler is not None and self._stop_profiler(turn) and record["total_ms"] >= self.profile_slow_ms:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile_path = os.path.join(self.profile_dir, f"{turn.invocation_id}.prof")
+            turn.profiler.dump_stats(profile_path)
+            record["profile"] = profile_path
+        self._export(turn, record, end)
+
+    def _stop_profiler(self, turn) -> bool:
+        """Unhooks the turn's profiler. Returns False if that has to wait for the profiled thread."""
+        if threading.get_ident() != turn.thread_id:
+            with self._lock:
+                self._orphans[turn.thread_id] = turn.profiler
+            return False
+        turn.profiler.disable()
+        with self._lock:
+            self._profiled_threads.discard(turn.thread_id)
+        return True
+
+    def _sweep(self):
+        """Unhooks orphaned profilers on this thread and closes out turns older than turn_timeout."""
+        thread_id = threading.get_ident()
+        cutoff = time.perf_counter() - self.turn_timeout
+        with self._lock:
+            orphan = self._orphans.pop(thread_id, None)
+            if orphan is not None:
+                self._profiled_threads.discard(thread_id)
+            if self._orphans:
+                # A thread that exited took its profile hook with it.
+                alive = {thread.ident for thread in threading.enumerate()}
+                for dead in [ident for ident in self._orphans if ident not in alive]:
+                    del self._orphans[dead]
+                    self._profiled_threads.discard(dead)
+            stale = [turn.invocation_id for turn in self._turns.values() if turn.start < cutoff]
+        if orphan is not None:
+            orphan.disable()
+        for invocation_id in stale:
+            self._abandon(invocation_id)
+
+    # --- Model callbacks: LLM calls and token usage ---
+    def before_model(self, callback_context, llm_request):
+        if self._orphans:
+            self._sweep()
+        turn = self._turn(callback_context)
+        if turn is not None:
+            turn.open_llm = {"kind": "llm", "name": getattr(llm_request, "model", None) or "llm",
+                             "start": time.perf_counter(), "end": None, "tokens": {}}
+            turn.steps.append(turn.open_llm)
+        return None
+
+    def after_model(self, callback_context, llm_response):
+        turn = self._turn(callback_context)
+        step = turn.open_llm if turn is not None else None
+        if step is None:
+            return None
+        # Streaming calls this once per chunk; the last chunk carries the usage totals.
+        step["end"] = time.perf_counter()
+        usage = llm_response.usage_metadata
+        if usage is not None:
+            step["tokens"] = {
+                "prompt": usage.prompt_token_count or 0,
+                "output": usage.candidates_token_count or 0,
+                "total": usage.total_token_count or 0,
+            }
+        return None
+
+    # --- Tool callbacks: per-tool wall time ---
+    def before_tool(self, tool, args, tool_context):
+        if self._orphans:
+            self._sweep()
+        turn = self._turn(tool_context)
+        if turn is not None:
+            step = {"kind": "tool", "name": tool.name, "start": time.perf_counter(), "end": None}
+            turn.open_tools[tool_context.function_call_id] = step
+            turn.steps.append(step)
+        return None
+
+    def after_tool(self, tool, args, tool_context, tool_response):
+        self._close_tool(tool_context)
+        return None
+
+    def on_tool_error(self, tool, args, tool_context, error):
+        self._close_tool(tool_context, error)
+        return None
+
+    def _close_tool(self, tool_context, error=None):
+        turn = self._turn(tool_context)
+        step = turn.open_tools.pop(tool_context.function_call_id, None) if turn is not None else None
+        if step is not None:
+            step["end"] = time.perf_counter()
+            if error is not None:
+                step["error"] = f"{type(error).__name__}: {error}"
+
+    # --- Export ---
+    def _record(self, turn, end):
+        steps = []
+        tokens = {"prompt": 0, "output": 0, "total": 0}
+        for step in turn.steps:
+            step_end = step["end"] or end
+            item = {"kind": step["kind"], "name": step["name"], "start_ms": turn.offset_ms(step["start"]),
+                    "ms": round((step_end - step["start"]) * 1000, 3)}
+            if step.get("tokens"):
+                item["tokens"] = step["tokens"]
+                for key in tokens:
+                    tokens[key] += step["tokens"][key]
+            if "error" in step:
+                item["error"] = step["error"]
+            steps.append(item)
+        return {
+            "invocation_id": turn.invocation_id,
+            "session_id": turn.session_id,
+            "agent": turn.agent_name,
+            "started_at": turn.started_at,
+            "total_ms": turn.offset_ms(end),
+            "llm_calls": sum(1 for step in steps if step["kind"] == "llm"),
+            "llm_ms": round(sum(step["ms"] for step in steps if step["kind"] == "llm"), 3),
+            "tool_ms": round(sum(step["ms"] for step in steps if step["kind"] == "tool"), 3),
+            "tokens": tokens,
+            "steps": steps,
+        }
+
+    def _export(self, turn, record, end):
+        with self._lock:
+            self._recent.append(record)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+        if self._tracer is not None:
+            self._emit_spans(turn, record, end)
+
+    def _emit_spans(self, turn, record, end):
+        from opentelemetry import trace
+
+        # perf_counter offsets are mapped onto the wall-clock start of the turn.
+        def wall_ns(at):
+            return int((turn.started_at + (at - turn.start)) * 1e9)
+
+        root = self._tracer.start_span(f"agent_turn {turn.agent_name}", start_time=wall_ns(turn.start), attributes={
+            "agent.invocation_id": turn.invocation_id, "agent.session_id": turn.session_id,
+            "agent.llm_calls": record["llm_calls"], "agent.tokens.total": record["tokens"]["total"],
+        })
+        context = trace.set_span_in_context(root)
+        for step in turn.steps:
+            span = self._tracer.start_span(f"{step['kind']} {step['name']}", context=context,
+                                           start_time=wall_ns(step["start"]))
+            for key, value in (step.get("tokens") or {}).items():
+                span.set_attribute(f"llm.tokens.{key}", value)
+            if "error" in step:
+                span.set_attribute("error", step["error"])
+            span.end(end_time=wall_ns(step["end"] or end))
+        root.end(end_time=wall_ns(end))
+
+
+def tracer_from_env():
+    """Returns a TurnTracer configured from AGENT_TRACE_* / AGENT_PROFILE_*, or None when all are unset."""
+    path = os.getenv("AGENT_TRACE_PATH") or None
+    spans = os.getenv("AGENT_TRACE_SPANS", "").lower() in ("1", "true", "yes")
+    slow_ms = os.getenv("AGENT_PROFILE_SLOW_MS")
+    if not (path or spans or slow_ms):
+        return None
+    return TurnTracer(path=path, spans=spans, profile_slow_ms=float(slow_ms) if slow_ms else None)
+
+
+def summarize(records):
+    """Aggregates turn records into {step name: {"count", "total_ms", "mean_ms", "max_ms"}}."""
+    summary = {}
+    for record in records:
+        for step in record["steps"]:
+            item = summary.setdefault(f"{step['kind']}:{step['name']}", {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            item["count"] += 1
+            item["total_ms"] += step["ms"]
+            item["max_ms"] = max(item["max_ms"], step["ms"])
+    for item in summary.values():
+        item["total_ms"] = round(item["total_ms"], 3)
+        item["mean_ms"] = round(item["total_ms"] / item["count"], 3)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize an AGENT_TRACE_PATH file")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    with open(args.path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    totals = sorted(record["total_ms"] for record in records)
+    if totals:
+        print(f"{len(records)} turns, median {totals[len(totals) // 2]:.1f} ms, max {totals[-1]:.1f} ms, "
+              f"{sum(record['tokens']['total'] for record in records)} tokens")
+    for name, item in sorted(summarize(records).items(), key=lambda kv: kv[1]["total_ms"], reverse=True):
+        print(f"  {name:<40} n={item['count']:<5} mean {item['mean_ms']:>9.1f} ms  max {item['max_ms']:>9.1f} ms")
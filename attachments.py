@@ -0,0 +1,121 @@
+"""
+Content-addressed attachment store.
+
+create_calendar_event puts the ICS bytes here and hands the model a short
+handle ("att-" + 24 hex digits of the SHA-256) instead of a base64 blob. The
+send path resolves the handle back to bytes, so the payload never has to be
+copied through the model's output. Anything that is not a handle is treated
+as base64 content, as before.
+
+Entries live in an in-process LRU bounded by total size. Set
+ATTACHMENT_STORE_DIR to also keep them on disk, e.g. a directory shared with
+send_mail_ws, so handles survive eviction and restarts.
+"""
+import base64
+import collections
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+DEFAULT_MAX_BYTES = int(os.getenv("ATTACHMENT_STORE_MAX_BYTES", 64 * 1024 * 1024))
+DEFAULT_DIRECTORY = os.getenv("ATTACHMENT_STORE_DIR") or None
+
+HANDLE_PREFIX = "att-"
+_HANDLE_RE = re.compile(r"^att-[0-9a-f]{24}$")
+
+
+def is_handle(value) -> bool:
+    return isinstance(value, str) and _HANDLE_RE.match(value) is not None
+
+
+class AttachmentStore:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=DEFAULT_DIRECTORY):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def put(self, data: bytes) -> str:
+        handle = HANDLE_PREFIX + hashlib.sha256(data).hexdigest()[:24]
+        with self._lock:
+            if handle in self._entries:
+                self._entries.move_to_end(handle)
+            else:
+                self._insert_locked(handle, data)
+        if self.directory:
+            self._write_file(handle, data)
+        return handle
+
+    def get(self, handle: str):
+        """Returns the bytes for `handle`, or None if it is unknown or was evicted."""
+        with self._lock:
+            data = self._entries.get(handle)
+            if data is not None:
+                self._entries.move_to_end(handle)
+                return data
+        if not self.directory:
+            return None
+        data = self._read_file(handle)
+        if data is not None:
+            with self._lock:
+                if handle not in self._entries:
+                    self._insert_locked(handle, data)
+        return data
+
+    def _insert_locked(self, handle, data):
+        if len(data) > self.max_bytes:
+            return
+        self._entries[handle] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _path(self, handle):
+        return os.path.join(self.directory, handle)
+
+    def _write_file(self, handle, data):
+        path = self._path(handle)
+        if os.path.exists(path):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_file(self, handle):
+        try:
+            with open(self._path(handle), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes}
+
+
+default_store = AttachmentStore()
+
+
+def put_attachment(data: bytes) -> str:
+    return default_store.put(data)
+
+
+def resolve_content(value: str, store=None) -> str:
+    """
+    Returns base64 attachment content for either a handle or raw base64.
+
+    Raises KeyError if `value` is a handle the store does not know.
+    """
+    if not is_handle(value):
+        return value
+    data = (store or default_store).get(value)
+    if data is None:
+        raise KeyError(value)
+    return base64.b64encode(data).decode('utf-8')
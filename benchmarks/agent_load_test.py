@@ -0,0 +1,85 @@
+"""
+Load test for CalendarAgent against a stubbed LLM.
+
+The stub answers the first model call with a create_calendar_event tool call
+and the second with a short text reply, sleeping --llm-latency seconds per
+call to stand in for Gemini. Throughput should scale with concurrency up to
+the agent's max_in_flight limit.
+
+    python benchmarks/agent_load_test.py [--requests 64] [--levels 1,4,16,32]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+import deploy_agent
+
+
+class StubLlm(BaseLlm):
+    model: str = "stub-llm"
+    latency: float = 0.2
+
+    async def generate_content_async(self, llm_request, stream=False):
+        await asyncio.sleep(self.latency)
+        last = llm_request.contents[-1]
+        if any(part.function_response for part in last.parts):
+            part = types.Part(text="Your reminder has been created.")
+        else:
+            part = types.Part(function_call=types.FunctionCall(
+                name="create_calendar_event",
+                args={"event_name": "Policy renewal", "date_str": "2026-11-01"}))
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+def run_threads(agent, requests, concurrency):
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        replies = list(pool.map(lambda i: agent.query(f"Remind me about policy {i}"), range(requests)))
+    assert all("reminder" in reply for reply in replies), replies[:3]
+
+
+async def run_tasks(agent, requests, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            return [chunk async for chunk in agent.async_stream_query(f"Remind me about policy {i}")]
+
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    assert all(any(chunk["type"] == "text" for chunk in chunks) for chunks in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CalendarAgent concurrency load test")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", default="1,4,16,32")
+    parser.add_argument("--max-in-flight", type=int, default=deploy_agent.MAX_IN_FLIGHT)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    agent = deploy_agent.CalendarAgent("stub-llm", "local-project", "us-central1", max_in_flight=args.max_in_flight)
+    agent.set_up(llm=StubLlm(latency=args.llm_latency))
+
+    print(f"{args.requests} requests, stub LLM latency {args.llm_latency}s, max_in_flight {args.max_in_flight}")
+    for mode in ("threads", "asyncio"):
+        for level in [int(level) for level in args.levels.split(",")]:
+            start = time.perf_counter()
+            if mode == "threads":
+                run_threads(agent, args.requests, level)
+            else:
+                asyncio.run(run_tasks(agent, args.requests, level))
+            elapsed = time.perf_counter() - start
+            print(f"  {mode:<8} concurrency {level:>3}: {args.requests / elapsed:7.1f} req/s  ({elapsed:.2f}s)")
+    assert agent.limiter.stats()["in_flight"] == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Peak RSS and latency of /send-email for multi-megabyte attachments.
+
+For each attachment size a fresh send_mail_ws process is started against
+benchmarks/mock_brevo.py, sent --requests messages, and its peak resident set
+size (VmHWM) is read from /proc. Bodies are sent plain or gzip-compressed the
+way EmailClient sends them. Results are written to benchmarks/results/<label>.json;
+pass --compare with an earlier file to see the difference.
+
+    python benchmarks/attachment_bench.py --sizes-mb 1,4,8 --label after
+    python benchmarks/attachment_bench.py --root /path/to/older/checkout --encodings identity --label before
+"""
+import argparse
+import base64
+import datetime
+import gzip
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from mock_brevo import MockBrevoConfig, serve
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+ICS_EVENT = (b"BEGIN:VEVENT\r\nUID:%d@example.com\r\nDTSTAMP:20260101T000000Z\r\nDTSTART;VALUE=DATE:20261101\r\n"
+             b"SUMMARY:Policy renewal reminder %d\r\nDESCRIPTION:Your policy expires soon.\r\nEND:VEVENT\r\n")
+
+
+def make_attachment(size, content):
+    if content == "random":
+        raw = os.urandom(size)
+    else:
+        events = []
+        total = 0
+        i = 0
+        while total < size:
+            event = ICS_EVENT % (i, i)
+            events.append(event)
+            total += len(event)
+            i += 1
+        raw = b"".join(events)[:size]
+    return base64.b64encode(raw).decode()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def start_server(root, port, brevo_port):
+    env = dict(os.environ, PORT=str(port), BREVO_SECRET_SOURCE="fake",
+               BREVO_URL=f"http://127.0.0.1:{brevo_port}/v3/smtp/email")
+    proc = subprocess.Popen([sys.executable, "send_mail_ws.py"], cwd=root, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("send_mail_ws did not start")
+
+
+def run_size(root, brevo_port, size, content, encoding, num_requests):
+    port = free_port()
+    proc = start_server(root, port, brevo_port)
+    try:
+        baseline_kb = peak_rss_kb(proc.pid)
+        attachment = make_attachment(size, content)
+        session = requests.Session()
+        latencies = []
+        wire_bytes = 0
+        for i in range(num_requests):
+            body = json.dumps({
+                "recipient_email": f"bench{i}@example.com",
+                "subject": f"Attachment bench {i} {time.time()}",
+                "body_html": "<p>Attachment benchmark</p>",
+                "attachment_content": attachment,
+                "attachment_name": "events.ics",
+            }).encode()
+            headers = {"Content-Type": "application/json"}
+            if encoding == "gzip":
+                body = gzip.compress(body, compresslevel=1)
+                headers["Content-Encoding"] = "gzip"
+            wire_bytes = len(body)
+            start = time.perf_counter()
+            resp = session.post(f"http://127.0.0.1:{port}/send-email", data=body, headers=headers, timeout=120)
+            latencies.append(time.perf_counter() - start)
+            if resp.status_code != 200:
+                raise RuntimeError(f"/send-email answered {resp.status_code}: {resp.text[:200]}")
+        return {
+            "attachment_mb": round(size / (1024 * 1024), 2),
+            "encoding": encoding,
+            "wire_kb": round(wire_bytes / 1024, 1),
+            "baseline_rss_mb": round(baseline_kb / 1024, 1),
+            "peak_rss_mb": round(peak_rss_kb(proc.pid) / 1024, 1),
+            "latency_ms": {
+                "median": round(statistics.median(latencies) * 1000, 2),
+                "max": round(max(latencies) * 1000, 2),
+            },
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"vs {previous_path} ({previous.get('label')}):")
+    before = {(r["attachment_mb"], r["encoding"]): r for r in previous["results"]}
+    for row in current:
+        for (size, encoding), old in sorted(before.items()):
+            if size != row["attachment_mb"]:
+                continue
+            print(f"  {size:>6} MB {encoding}->{row['encoding']:<8} "
+                  f"peak RSS {old['peak_rss_mb']:>7} -> {row['peak_rss_mb']:>7} MB   "
+                  f"median {old['latency_ms']['median']:>8} -> {row['latency_ms']['median']:>8} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS and latency of /send-email with large attachments")
+    parser.add_argument("--root", default=ROOT, help="Checkout whose send_mail_ws.py is measured")
+    parser.add_argument("--sizes-mb", default="1,4,8")
+    parser.add_argument("--encodings", default="identity,gzip")
+    parser.add_argument("--content", choices=["ics", "random"], default="ics")
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--label", default=datetime.datetime.now().strftime("attachments-%Y%m%d-%H%M%S"))
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    brevo = serve(port=0, config=MockBrevoConfig())
+    results = []
+    try:
+        for size_mb in args.sizes_mb.split(","):
+            for encoding in args.encodings.split(","):
+                row = run_size(args.root, brevo.server_port, int(float(size_mb) * 1024 * 1024),
+                               args.content, encoding, args.requests)
+                results.append(row)
+                print(json.dumps(row))
+    finally:
+        brevo.shutdown()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"{args.label}.json")
+    with open(out_path, "w") as f:
+        json.dump({"label": args.label, "config": vars(args), "results": results}, f, indent=2)
+    print(f"Saved {out_path}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
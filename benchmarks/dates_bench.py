@@ -0,0 +1,69 @@
+"""
+Benchmark: dates.resolve vs. calling dateutil.parser.parse on every input.
+
+The corpus mimics what the model sends create_calendar_event: get_date
+output, ISO strings, and a handful of free-text phrasings repeated often.
+
+    python benchmarks/dates_bench.py [--rounds N]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dates
+
+FREE_TEXT = [
+    "May 7, 2025",
+    "7 May 2025",
+    "05/07/2025",
+    "May 7th, 2025 at 9am",
+    "2025/05/07 09:00",
+    "June 30 2026 5:00 PM",
+    "Dec 31, 2025",
+]
+
+
+def build_corpus():
+    base = datetime.datetime(2025, 5, 7, 9, 0)
+    corpus = []
+    for offset in range(60):
+        day = base + datetime.timedelta(days=offset)
+        corpus.append(day.strftime(dates.FORMAL_FORMAT))
+        corpus.append(day.date().isoformat())
+        corpus.append(day.isoformat())
+    corpus.extend(FREE_TEXT * 20)
+    return corpus
+
+
+def run(label, fn, corpus, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in corpus:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    calls = rounds * len(corpus)
+    print(f"{label:<28} {elapsed / calls * 1e6:8.2f} us/parse  ({calls} parses)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dates.resolve benchmark")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    from dateutil import parser as dateutil_parser
+
+    corpus = build_corpus()
+    for text in corpus:
+        assert dates.resolve(text).replace(tzinfo=None) == dateutil_parser.parse(text).replace(tzinfo=None), text
+
+    run("dateutil.parser.parse", dateutil_parser.parse, corpus, args.rounds)
+    run("dates.resolve", dates.resolve, corpus, args.rounds)
+    print(f"dateutil fallback cache: {dates.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cold-start budget check for `import agent`.
+
+Runs `python -X importtime -c "import agent"` in fresh interpreters, reports
+the median cumulative import time and the slowest modules, and exits non-zero
+if the budget is exceeded or if a heavy dependency (google.adk, requests, ...)
+gets imported eagerly again.
+
+    python benchmarks/import_time.py [--budget-ms 100] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load when the agent is built or a tool first runs.
+DEFERRED_MODULES = ["google.adk", "google.genai", "requests", "dateutil", "icalendar", "dotenv"]
+
+
+def measure(module):
+    """Returns (total_us, {module: self_us}) for one fresh import of `module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total = None
+    self_times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.rstrip()
+        self_times[name.strip()] = int(self_us)
+        if name == f" {module}":
+            total = int(cumulative_us)
+    return total, self_times
+
+
+def eager_imports(module):
+    code = (f"import sys, {module}; "
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [name for name in proc.stdout.strip().split(",") if name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget check")
+    parser.add_argument("--module", default="agent")
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    totals = []
+    self_times = {}
+    for _ in range(args.runs):
+        total, times = measure(args.module)
+        totals.append(total)
+        self_times = times
+    median_ms = statistics.median(totals) / 1000
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("slowest modules (self time, last run):")
+    for name, us in sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.2f} ms  {name}")
+
+    failed = False
+    eager = eager_imports(args.module)
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: {median_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
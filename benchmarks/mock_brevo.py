@@ -0,0 +1,150 @@
+"""
+Local stand-in for Brevo's POST /v3/smtp/email.
+
+Accepts the same payloads (single and messageVersions bulk), answers 201 with
+message ids, and can inject latency, 5xx errors and 429s so send_mail_ws can
+be load-tested without sending real mail:
+
+    python benchmarks/mock_brevo.py --port 9090 --latency-ms 80 --jitter-ms 40 \\
+        --error-rate 0.01 --rate-limit 200
+    BREVO_URL=http://127.0.0.1:9090/v3/smtp/email BREVO_SECRET_SOURCE=fake python send_mail_ws.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockBrevoConfig:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0,
+                 rate_limit=None, retry_after=1, require_key=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.require_key = require_key
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.counts = {}
+
+    def count(self, status):
+        with self.lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def over_rate_limit(self):
+        """Fixed one-second window, like Brevo's per-second limits. Returns seconds to reset or None."""
+        if not self.rate_limit:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            if self.window_count > self.rate_limit:
+                return max(1.0 - (now - self.window_start), 0.0)
+        return None
+
+
+class MockBrevoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = MockBrevoConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.config.count(status)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.config.lock:
+                return self._reply(200, {str(k): v for k, v in self.config.counts.items()})
+        self._reply(404, {"message": "not found"})
+
+    def do_POST(self):
+        config = self.config
+        length = int(self.headers.get("content-length", 0))
+        raw = self.rfile.read(length)
+
+        if self.path != "/v3/smtp/email":
+            return self._reply(404, {"code": "not_found", "message": "Unknown endpoint"})
+        if config.require_key and self.headers.get("api-key") != config.require_key:
+            return self._reply(401, {"code": "unauthorized", "message": "Key not found"})
+
+        reset = config.over_rate_limit()
+        if reset is not None or random.random() < config.throttle_rate:
+            wait = config.retry_after if reset is None else max(round(reset, 3), 0.001)
+            return self._reply(429, {"code": "too_many_requests", "message": "Rate limit exceeded"}, {
+                "Retry-After": str(wait),
+                "x-sib-ratelimit-limit": str(config.rate_limit or 0),
+                "x-sib-ratelimit-remaining": "0",
+                "x-sib-ratelimit-reset": str(wait),
+            })
+
+        delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        if random.random() < config.error_rate:
+            return self._reply(503, {"code": "service_unavailable", "message": "Injected failure"})
+
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return self._reply(400, {"code": "bad_request", "message": "Invalid JSON"})
+        if "messageVersions" in payload:
+            ids = [f"<{uuid.uuid4().hex}@mock.brevo>" for _ in payload["messageVersions"]]
+            return self._reply(201, {"messageIds": ids})
+        if not payload.get("to") or not payload.get("subject"):
+            return self._reply(400, {"code": "missing_parameter", "message": "to and subject are required"})
+        self._reply(201, {"messageId": f"<{uuid.uuid4().hex}@mock.brevo>"})
+
+
+def serve(host="127.0.0.1", port=9090, config=None):
+    """Starts the mock in a background thread and returns the server."""
+    handler = type("ConfiguredMockBrevoHandler", (MockBrevoHandler,), {"config": config or MockBrevoConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of Brevo's /v3/smtp/email")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Base latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered 429")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Requests per second before answering 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds for injected 429s")
+    parser.add_argument("--require-key", default=None, help="Answer 401 unless the api-key header matches")
+    args = parser.parse_args()
+
+    config = MockBrevoConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate,
+                             args.rate_limit, args.retry_after, args.require_key)
+    server = serve(args.host, args.port, config)
+    print(f"Mock Brevo listening on http://{args.host}:{server.server_port}/v3/smtp/email (stats at /stats)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Load generator for send_mail_ws's /send-email.
+
+Fires requests on an open-loop schedule at --rps for --duration seconds,
+then reports achieved throughput, status codes and p50/p95/p99 latency.
+Each request has a unique subject so idempotency deduplication does not
+short-circuit it. Results are written to benchmarks/results/<label>.json;
+pass --compare with an earlier file to see the difference.
+
+    python benchmarks/mock_brevo.py --latency-ms 80 &
+    BREVO_URL=http://127.0.0.1:9090/v3/smtp/email BREVO_SECRET_SOURCE=fake python send_mail_ws.py &
+    python benchmarks/send_load_test.py --rps 100 --duration 30 --label pooled
+"""
+import argparse
+import base64
+import concurrent.futures
+import datetime
+import json
+import os
+import threading
+import time
+
+import requests
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_load(url, rps, duration, concurrency, attachment_bytes=0, path="/send-email"):
+    local = threading.local()
+    attachment = base64.b64encode(os.urandom(attachment_bytes)).decode() if attachment_bytes else ""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        body = {
+            "recipient_email": f"load{i}@example.com",
+            "subject": f"Load test {i} {time.time()}",
+            "body_html": f"<p>Load test message {i}</p>",
+            "attachment_content": attachment,
+            "attachment_name": "event.ics",
+        }
+        start = time.perf_counter()
+        try:
+            status = session.post(url + path, json=body, timeout=60).status_code
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    total = int(rps * duration)
+    began = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        futures = []
+        for i in range(total):
+            # Open loop: request i is due at i / rps regardless of how earlier ones fared.
+            delay = began + i / rps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(one, i))
+        concurrent.futures.wait(futures)
+    elapsed = time.perf_counter() - began
+
+    ok = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 400)
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "success_rps": round(ok / elapsed, 2),
+        "statuses": statuses,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"vs {previous_path} ({previous.get('label')}):")
+    for key in ("throughput_rps", "success_rps"):
+        print(f"  {key:<15} {previous['result'][key]:>10} -> {current[key]:>10}")
+    for key in ("p50", "p95", "p99"):
+        before, after = previous["result"]["latency_ms"][key], current["latency_ms"][key]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"  latency {key:<7} {before:>10} -> {after:>10} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /send-email")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--rps", type=float, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight")
+    parser.add_argument("--attachment-kb", type=int, default=0, help="Random attachment size per request")
+    parser.add_argument("--label", default=datetime.datetime.now().strftime("run-%Y%m%d-%H%M%S"))
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    result = run_load(args.url, args.rps, args.duration, args.concurrency, args.attachment_kb * 1024)
+    print(json.dumps(result, indent=2))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"{args.label}.json")
+    with open(out_path, "w") as f:
+        json.dump({"label": args.label, "config": vars(args), "result": result}, f, indent=2)
+    print(f"Saved {out_path}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Local SMTP sink for testing SmtpProvider.
+
+Speaks enough SMTP (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) to accept
+and count messages without delivering them, and can inject latency and
+transient 451 failures:
+
+    python benchmarks/smtp_sink.py --port 1025 --latency-ms 20 --fail-rate 0.01
+    SEND_PROVIDERS=brevo,smtp SMTP_PORT=1025 python send_mail_ws.py
+"""
+import argparse
+import random
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+
+
+class SmtpSinkConfig:
+    def __init__(self, latency_ms=0.0, fail_rate=0.0, keep_messages=False):
+        self.latency_ms = latency_ms
+        self.fail_rate = fail_rate
+        self.keep_messages = keep_messages
+        self.lock = threading.Lock()
+        self.received = 0
+        self.failed = 0
+        self.messages = []
+
+    def accept(self, data):
+        with self.lock:
+            self.received += 1
+            if self.keep_messages:
+                self.messages.append(message_from_bytes(data))
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    config = SmtpSinkConfig()
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 smtp-sink ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-smtp-sink\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n")
+            elif verb == "HELO":
+                self.reply("250 smtp-sink")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:])
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line == b".\r\n":
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                delay = self.config.latency_ms / 1000
+                if delay:
+                    time.sleep(delay)
+                if random.random() < self.config.fail_rate:
+                    with self.config.lock:
+                        self.config.failed += 1
+                    self.reply("451 Injected transient failure")
+                else:
+                    self.config.accept(b"".join(lines))
+                    self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def serve(host="127.0.0.1", port=1025, config=None):
+    """Starts the sink in a background thread and returns the server."""
+    handler = type("ConfiguredSmtpSinkHandler", (SmtpSinkHandler,), {"config": config or SmtpSinkConfig()})
+    server = socketserver.ThreadingTCPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP sink")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before answering DATA")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of messages answered 451")
+    args = parser.parse_args()
+
+    config = SmtpSinkConfig(args.latency_ms, args.fail_rate)
+    server = serve(args.host, args.port, config)
+    print(f"SMTP sink listening on {args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"received {config.received}, failed {config.failed}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Template rendering throughput and per-turn savings from server-side templates.
+
+Part 1 times templates.render() against re-substituting the raw template on
+every call. Part 2 compares the send_email arguments the model has to
+generate when it writes the HTML itself with the template_id + variables
+call, in output tokens and in decode time at --decode-tps. Token counts are
+estimated at 4 characters per token unless --count-tokens is given, which
+asks the Gemini API (needs credentials) for exact counts.
+
+    python benchmarks/template_bench.py [--renders 200000] [--count-tokens]
+
+For measured numbers from real turns, run the agent with AGENT_TRACE_PATH set
+before and after and compare `python agent_trace.py <file>` output tokens.
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import templates  # noqa: E402
+
+VARIABLES = {"holder_name": "Jane Doe", "policy_id": "AUTO-48213", "expiration_date": "Friday, November 6, 2026"}
+
+# What the model typically writes for the same reminder when it composes the email itself.
+MODEL_WRITTEN_ARGS = {
+    "recipient_email": "jane.doe@example.com",
+    "subject": "Reminder: Your Auto Insurance Policy AUTO-48213 Expires on November 6, 2026",
+    "body_html": (
+        "<html><body><p>Dear Jane Doe,</p><p>We hope this message finds you well. This is a friendly reminder "
+        "that your auto insurance policy <strong>AUTO-48213</strong> is scheduled to expire on "
+        "<strong>Friday, November 6, 2026</strong>.</p><p>To avoid any lapse in coverage, we recommend "
+        "renewing your policy before the expiration date. We have attached a calendar event to this email "
+        "so you can add a reminder to your calendar.</p><p>If you have any questions or would like to "
+        "review your coverage options, please do not hesitate to contact us.</p><p>Best regards,<br>"
+        "Your Insurance Assistant</p></body></html>"
+    ),
+    "attachment_content": "att-3f2a9c0d1e4b5a6978c0d1e2",
+    "attachment_name": "policy_AUTO-48213_expiration.ics",
+}
+TEMPLATE_ARGS = {
+    "recipient_email": "jane.doe@example.com",
+    "template_id": "policy_expiration_reminder",
+    "variables": VARIABLES,
+    "attachment_content": "att-3f2a9c0d1e4b5a6978c0d1e2",
+    "attachment_name": "policy_AUTO-48213_expiration.ics",
+}
+
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+
+def naive_render(definition, variables):
+    merged = dict(definition.get("defaults") or {}, **variables)
+    subject = _PLACEHOLDER_RE.sub(lambda m: str(merged[m.group(1)]), definition["subject"])
+    body = _PLACEHOLDER_RE.sub(lambda m: html.escape(str(merged[m.group(1)])), definition["html"])
+    return subject, body
+
+
+def throughput(fn, renders):
+    start = time.perf_counter()
+    for _ in range(renders):
+        fn()
+    elapsed = time.perf_counter() - start
+    return renders / elapsed, elapsed / renders * 1e6
+
+
+def count_tokens(text, exact, model):
+    if not exact:
+        return max(1, round(len(text) / 4))
+    from google import genai
+    client = genai.Client()
+    return client.models.count_tokens(model=model, contents=text).total_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Template render and token-savings benchmark")
+    parser.add_argument("--renders", type=int, default=200000)
+    parser.add_argument("--decode-tps", type=float, default=150.0, help="Model output tokens per second")
+    parser.add_argument("--count-tokens", action="store_true", help="Exact counts via the Gemini API")
+    parser.add_argument("--model", default=os.getenv("MODEL", "gemini-2.5-flash"))
+    args = parser.parse_args()
+
+    definition = templates.BUILTIN_TEMPLATES["policy_expiration_reminder"]
+    assert naive_render(definition, VARIABLES) == templates.render("policy_expiration_reminder", VARIABLES)
+
+    print("render throughput:")
+    for name, fn in [("compiled", lambda: templates.render("policy_expiration_reminder", VARIABLES)),
+                     ("regex per call", lambda: naive_render(definition, VARIABLES))]:
+        per_second, per_call_us = throughput(fn, args.renders)
+        print(f"  {name:<15} {per_second:>12,.0f} renders/s  {per_call_us:6.2f} us/render")
+
+    before = count_tokens(json.dumps(MODEL_WRITTEN_ARGS), args.count_tokens, args.model)
+    after = count_tokens(json.dumps(TEMPLATE_ARGS), args.count_tokens, args.model)
+    kind = "exact" if args.count_tokens else "estimated"
+    print(f"send_email arguments per turn ({kind} output tokens, decode at {args.decode_tps:.0f} tokens/s):")
+    print(f"  model-written HTML {before:>6} tokens  {before / args.decode_tps * 1000:8.0f} ms")
+    print(f"  template_id        {after:>6} tokens  {after / args.decode_tps * 1000:8.0f} ms")
+    print(f"  saved              {before - after:>6} tokens  {(before - after) / args.decode_tps * 1000:8.0f} ms "
+          f"({(before - after) / before * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
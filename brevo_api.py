@@ -0,0 +1,266 @@
+import json
+import os
+import uuid
+
+from attachments import resolve_content
+import metrics
+from templates import TemplateError, render
+from transport import DEFAULT_RETRIES, POST_RETRY_STATUSES, backoff
+
+# Override with e.g. http://127.0.0.1:9090/v3/smtp/email to send to benchmarks/mock_brevo.py.
+BREVO_URL = os.getenv("BREVO_URL", "https://api.brevo.com/v3/smtp/email")
+SENDER = {"name": "AI Agent", "email": "backup@ddintl.com"}
+
+MISSING_FIELDS_ERROR = "Missing required fields: recipient_email, subject, or body_html (or template_id)"
+
+# Base64 length of the largest attachment accepted, about 10 MB decoded by default.
+MAX_ATTACHMENT_CHARS = int(os.getenv("SEND_MAX_ATTACHMENT_CHARS", 14 * 1024 * 1024))
+ATTACHMENT_TOO_LARGE_ERROR = f"Attachment exceeds {MAX_ATTACHMENT_CHARS} base64 characters"
+
+# How many times a 429 is retried before it is passed back to the caller.
+RATE_LIMIT_RETRIES = int(os.getenv("BREVO_RATE_LIMIT_RETRIES", 2))
+
+# The base64 alphabet; none of these need escaping inside a JSON string.
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+
+
+def brevo_headers(api_key: str) -> dict:
+    return {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "api-key": api_key
+    }
+
+
+def with_idempotency_key(payload: dict, key) -> dict:
+    """
+    A copy of `payload` carrying `key` as Brevo's idempotencyKey header, so
+    Brevo drops a repeat of the same send (a resend after a read timeout, a
+    client retry). Returns the payload unchanged without a key.
+    """
+    if not key:
+        return payload
+    return dict(payload, headers=dict(payload.get("headers") or {}, idempotencyKey=key))
+
+
+class UpstreamAttempts:
+    """
+    Retry bookkeeping for one Brevo call, shared by both servers so they
+    resend, throttle and count the same way. The caller takes a token from
+    `limiter` before every attempt, then reports the outcome; the answer is
+    the number of seconds to wait before the next attempt, or None to stop.
+
+    A 429 shrinks the limiter's rate and is retried up to RATE_LIMIT_RETRIES
+    times. Connect errors and 500/503 answers, where Brevo accepted nothing,
+    are retried with backoff up to `retries` times. Anything else (notably a
+    read timeout) is final, since the message may already be on its way.
+    """
+
+    def __init__(self, limiter, retries=DEFAULT_RETRIES, rate_limit_retries=RATE_LIMIT_RETRIES, backoff=backoff):
+        self.limiter = limiter
+        self.retries = retries
+        self.rate_limit_retries = rate_limit_retries
+        self.backoff = backoff
+        self.throttled = 0
+        self.failed = 0
+
+    def _retry_failure(self):
+        if self.failed >= self.retries:
+            return None
+        self.failed += 1
+        metrics.UPSTREAM_RETRIES.inc(reason="transport")
+        return self.backoff(self.failed)
+
+    def after_error(self, connect_error: bool):
+        """After the request raised; `connect_error` is True if it never reached Brevo."""
+        return self._retry_failure() if connect_error else None
+
+    def after_response(self, status_code, headers):
+        metrics.UPSTREAM_RESPONSES.inc(status=status_code)
+        if status_code == 429:
+            # The limiter itself holds the next acquire until Brevo's window resets.
+            self.limiter.on_rate_limited(headers)
+            if self.throttled >= self.rate_limit_retries:
+                return None
+            self.throttled += 1
+            metrics.UPSTREAM_RETRIES.inc(reason="rate_limited")
+            return 0.0
+        if status_code in POST_RETRY_STATUSES:
+            return self._retry_failure()
+        if status_code < 400:
+            self.limiter.on_success(headers)
+        return None
+
+
+def build_payload(data: dict):
+    """
+    Validates a /send-email request body and turns it into a Brevo payload.
+
+    With template_id (plus optional variables) the subject and body are
+    rendered from templates.py instead of taken from subject/body_html; an
+    explicit subject still wins. attachment_content may be base64 or an
+    attachments.py handle; handles are resolved to base64 here. Returns
+    (payload, None) on success or (None, error_message) when a required field
+    is missing or of the wrong type, a template cannot be rendered or a
+    handle is unknown.
+    """
+    if not isinstance(data, dict):
+        data = {}
+    recipient_email = data.get('recipient_email')
+    subject = data.get('subject')
+    body_html = data.get('body_html')
+
+    template_id = data.get('template_id')
+    if template_id:
+        try:
+            template_subject, body_html = render(template_id, data.get('variables'))
+        except TemplateError as e:
+            return None, str(e)
+        subject = subject or template_subject
+
+    if not all([recipient_email, subject, body_html]):
+        return None, MISSING_FIELDS_ERROR
+
+    # Optional fields
+    # An explicit null means the field was left out, as it always has.
+    attachment_content = data.get('attachment_content')
+    attachment_name = data.get('attachment_name')
+    if attachment_content is None:
+        attachment_content = ''
+    if attachment_name is None:
+        attachment_name = 'event.ics'
+
+    if not isinstance(attachment_content, str) or not isinstance(attachment_name, str):
+        return None, "attachment_content and attachment_name must be strings"
+    if attachment_content:
+        try:
+            attachment_content = resolve_content(attachment_content)
+        except KeyError:
+            return None, f"Unknown attachment handle: {attachment_content}"
+        if len(attachment_content) > MAX_ATTACHMENT_CHARS:
+            return None, ATTACHMENT_TOO_LARGE_ERROR
+
+    payload = {
+        "sender": SENDER,
+        "to": [{"email": recipient_email}],
+        "subject": subject,
+        "htmlContent": body_html
+    }
+
+    if attachment_content:
+        payload["attachment"] = [{"name": attachment_name, "content": attachment_content}]
+
+    return payload, None
+
+
+def encode_payload(payload: dict) -> bytes:
+    """
+    Serializes a Brevo payload to the JSON request body.
+
+    Attachment content is base64, which needs no JSON escaping, so it is
+    spliced into the body as-is instead of going through json.dumps; for a
+    multi-megabyte attachment that saves a full escape-and-copy pass.
+    """
+    attachments = payload.get("attachment")
+    if not attachments:
+        return json.dumps(payload).encode("utf-8")
+
+    contents = []
+    for item in attachments:
+        content = item["content"]
+        raw = content.encode("ascii") if content.isascii() else None
+        # translate() with only a delete table leaves exactly the non-base64 bytes behind.
+        if raw is None or raw.translate(None, _BASE64_ALPHABET):
+            return json.dumps(payload).encode("utf-8")
+        contents.append(raw)
+
+    # A per-call nonce keeps the placeholders from matching anything in the other fields.
+    nonce = uuid.uuid4().hex
+    placeholders = [f"@@{nonce}-{i}@@" for i in range(len(attachments))]
+    skeleton = dict(payload, attachment=[dict(item, content=placeholder)
+                                         for item, placeholder in zip(attachments, placeholders)])
+    text = json.dumps(skeleton)
+    parts = []
+    for raw, placeholder in zip(contents, placeholders):
+        before, text = text.split(placeholder, 1)
+        parts.append(before.encode("utf-8"))
+        parts.append(raw)
+    parts.append(text.encode("utf-8"))
+    return b"".join(parts)
+
+
+# Brevo accepts at most this many messageVersions in one /v3/smtp/email call.
+BREVO_MAX_MESSAGE_VERSIONS = 1000
+
+
+def build_batch_payloads(messages, max_versions=BREVO_MAX_MESSAGE_VERSIONS):
+    """
+    Packs many /send-email request bodies into Brevo bulk payloads.
+
+    Each message becomes one entry of "messageVersions". Brevo only takes
+    attachments at the top level of a payload, so messages are grouped by
+    attachment first and each group is chunked to `max_versions`.
+
+    Returns (chunks, errors): chunks is a list of (payload, indexes) where
+    indexes are the positions in `messages` covered by that payload, in
+    messageVersions order; errors maps the index of every invalid message to
+    its error.
+    """
+    groups = {}
+    errors = {}
+    for index, data in enumerate(messages or []):
+        payload, error = build_payload(data)
+        if error:
+            errors[index] = error
+            continue
+        attachment = payload.get("attachment")
+        key = (attachment[0]["name"], attachment[0]["content"]) if attachment else None
+        groups.setdefault(key, []).append((index, payload))
+
+    chunks = []
+    for key, entries in groups.items():
+        for start in range(0, len(entries), max_versions):
+            chunk = entries[start:start + max_versions]
+            first = chunk[0][1]
+            payload = {
+                "sender": SENDER,
+                "subject": first["subject"],
+                "htmlContent": first["htmlContent"],
+                "messageVersions": [
+                    {"to": p["to"], "subject": p["subject"], "htmlContent": p["htmlContent"]}
+                    for _, p in chunk
+                ],
+            }
+            if key is not None:
+                payload["attachment"] = first["attachment"]
+            chunks.append((payload, [index for index, _ in chunk]))
+
+    return chunks, errors
+
+
+def batch_results(messages, errors, chunks, outcomes):
+    """
+    Per-message results for /send-email/batch, in input order. outcomes[i]
+    is the (body, status_code) for chunks[i] from build_batch_payloads; a
+    202 means the chunk was queued rather than sent.
+    """
+    results = [None] * len(messages)
+    for index, error in errors.items():
+        results[index] = {"status": "invalid", "error": error}
+
+    for (payload, indexes), (body, status_code) in zip(chunks, outcomes):
+        message_ids = body.get("messageIds", []) if status_code < 400 else []
+        for position, index in enumerate(indexes):
+            if status_code == 202:
+                results[index] = {"status": "queued", "message_id": body.get("message_id")}
+            elif status_code < 400:
+                message_id = message_ids[position] if position < len(message_ids) else None
+                results[index] = {"status": "sent", "message_id": message_id}
+            else:
+                results[index] = {"status": "failed", "status_code": status_code, "error": body.get("error")}
+
+    for index, result in enumerate(results):
+        message = messages[index] if isinstance(messages[index], dict) else {}
+        result["index"] = index
+        result["recipient_email"] = message.get('recipient_email')
+    return results
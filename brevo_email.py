@@ -7,27 +7,21 @@ def send_email(recipient_email: str, subject: str, body_html: str) -> dict:
         body_html: HTML content.
     """
     import requests
-    from google.cloud import secretmanager
-    
-    project_id = "qwiklabs-gcp-01-3bb38adc87a2"
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/{project_id}/secrets/BREVO_API_KEY/versions/latest"
-    
-    response = client.access_secret_version(request={"name": name})
-    api_key = response.payload.data.decode("UTF-8")
+    try:
+        from .brevo_api import BREVO_URL, brevo_headers, build_payload
+        from .credentials import get_brevo_api_key, refresh_brevo_api_key
+    except ImportError:
+        from brevo_api import BREVO_URL, brevo_headers, build_payload
+        from credentials import get_brevo_api_key, refresh_brevo_api_key
 
-    url = "https://api.brevo.com/v3/smtp/email"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "api-key": api_key
-    }
-    payload = {
-        "sender": {"name": "AI Agent", "email": "backup@ddintl.com"},
-        "to": [{"email": recipient_email}],
-        "subject": subject,
-        "htmlContent": body_html
-    }
-    
-    resp = requests.post(url, json=payload, headers=headers)
-    return resp.json()
\ No newline at end of file
+    payload, error = build_payload({"recipient_email": recipient_email, "subject": subject, "body_html": body_html})
+    if error:
+        return {"error": error}
+
+    # BREVO_URL can point at benchmarks/mock_brevo.py, like the send services.
+    headers = brevo_headers(get_brevo_api_key())
+    resp = requests.post(BREVO_URL, json=payload, headers=headers)
+    if resp.status_code == 401:
+        headers["api-key"] = refresh_brevo_api_key()
+        resp = requests.post(BREVO_URL, json=payload, headers=headers)
+    return resp.json()
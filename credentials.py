@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+DEFAULT_PROJECT_ID = "qwiklabs-gcp-01-3bb38adc87a2"
+BREVO_SECRET_ID = "BREVO_API_KEY"
+
+# How long a fetched key is trusted, and how long before expiry we start a
+# background refresh. Both can be tuned per deployment from the environment.
+DEFAULT_TTL_SECONDS = float(os.getenv("BREVO_KEY_TTL_SECONDS", 600))
+DEFAULT_REFRESH_MARGIN_SECONDS = float(os.getenv("BREVO_KEY_REFRESH_MARGIN_SECONDS", 60))
+# After a failed background refresh, wait this long before trying another.
+DEFAULT_REFRESH_RETRY_SECONDS = float(os.getenv("BREVO_KEY_REFRESH_RETRY_SECONDS", 5))
+
+
+# --- Secret Backends ---
+class SecretManagerSource:
+    """Reads the latest version of a secret from Google Secret Manager."""
+
+    def __init__(self, secret_id=BREVO_SECRET_ID, project_id=None):
+        self.project_id = project_id or os.environ.get("GOOGLE_CLOUD_PROJECT") or DEFAULT_PROJECT_ID
+        self.secret_path = f"projects/{self.project_id}/secrets/{secret_id}/versions/latest"
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def _get_client(self):
+        # Building the gRPC client is expensive, so it is created once and reused.
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from google.cloud import secretmanager
+                    self._client = secretmanager.SecretManagerServiceClient()
+        return self._client
+
+    def fetch(self) -> str:
+        response = self._get_client().access_secret_version(request={"name": self.secret_path})
+        return response.payload.data.decode("UTF-8")
+
+
+class EnvSecretSource:
+    """Reads the secret from an environment variable, e.g. for local runs and load tests."""
+
+    def __init__(self, variable="BREVO_API_KEY"):
+        self.variable = variable
+
+    def fetch(self) -> str:
+        value = os.environ.get(self.variable)
+        if not value:
+            raise KeyError(f"{self.variable} is not set")
+        return value
+
+
+class FakeSecretSource:
+    """In-memory backend for running offline. Counts fetches so callers can
+    check how often the real backend would have been hit."""
+
+    def __init__(self, value="fake-brevo-api-key", error=None):
+        self.value = value
+        self.error = error
+        self.fetch_count = 0
+
+    def fetch(self) -> str:
+        self.fetch_count += 1
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+# --- Cached Provider ---
+class CachedSecret:
+    """
+    Caches a secret in process for `ttl` seconds.
+
+    Once the cached value is within `refresh_margin` of expiring, the next
+    caller kicks off a background refresh and keeps getting the current value
+    until the refresh lands; a failed refresh is retried no sooner than
+    `refresh_retry` seconds later. Only a cold cache (or an expired one whose refresh
+    failed) makes the caller wait on the backend.
+    """
+
+    def __init__(self, source, ttl=DEFAULT_TTL_SECONDS, refresh_margin=DEFAULT_REFRESH_MARGIN_SECONDS,
+                 refresh_retry=DEFAULT_REFRESH_RETRY_SECONDS):
+        self.source = source
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl)
+        self.refresh_retry = refresh_retry
+        self._value = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._next_refresh_at = 0.0
+
+    def get(self) -> str:
+        now = time.monotonic()
+        value, expires_at = self._value, self._expires_at
+
+        if value is not None and now < expires_at:
+            if now >= expires_at - self.refresh_margin:
+                self._start_background_refresh()
+            return value
+
+        # Cold or expired: fetch synchronously, one caller at a time.
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires_at:
+                return self._value
+            return self._store(self.source.fetch())
+
+    def refresh(self) -> str:
+        """Fetches a fresh value immediately, e.g. after the provider answered 401."""
+        with self._lock:
+            return self._store(self.source.fetch())
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._expires_at = 0.0
+
+    def _store(self, value):
+        self._value = value
+        self._expires_at = time.monotonic() + self.ttl
+        return value
+
+    def _start_background_refresh(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() < self._next_refresh_at:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            value = self.source.fetch()
+        except Exception as e:
+            # Keep serving the current value; a caller past expiry fetches synchronously.
+            print(f"Background refresh of secret failed: {str(e)}")
+            with self._lock:
+                self._next_refresh_at = time.monotonic() + self.refresh_retry
+                self._refreshing = False
+            return
+        with self._lock:
+            self._store(value)
+            self._refreshing = False
+
+
+_brevo_api_key = None
+_brevo_api_key_lock = threading.Lock()
+
+
+def get_brevo_provider() -> CachedSecret:
+    """Returns the process-wide Brevo API key provider."""
+    global _brevo_api_key
+    if _brevo_api_key is None:
+        with _brevo_api_key_lock:
+            if _brevo_api_key is None:
+                # BREVO_SECRET_SOURCE picks the backend: secretmanager (default), env or fake.
+                backend = os.getenv("BREVO_SECRET_SOURCE", "secretmanager")
+                if os.getenv("BREVO_API_KEY_FAKE") or backend == "fake":
+                    source = FakeSecretSource(os.getenv("BREVO_API_KEY_FAKE") or "fake-brevo-api-key")
+                elif backend == "env":
+                    source = EnvSecretSource()
+                else:
+                    source = SecretManagerSource()
+                _brevo_api_key = CachedSecret(source)
+    return _brevo_api_key
+
+
+def set_brevo_provider(provider: CachedSecret):
+    """Replaces the process-wide provider (for offline runs with FakeSecretSource)."""
+    global _brevo_api_key
+    with _brevo_api_key_lock:
+        _brevo_api_key = provider
+
+
+def get_brevo_api_key() -> str:
+    return get_brevo_provider().get()
+
+
+def refresh_brevo_api_key() -> str:
+    return get_brevo_provider().refresh()
@@ -0,0 +1,121 @@
+"""
+Date resolution shared by the agent tools.
+
+Model-produced dates are resolved in three layers:
+    1. a fast path for ISO 8601 and the "Wednesday, May 7, 2025" format that
+       get_date emits,
+    2. an LRU cache in front of
+    3. dateutil's parser for everything else.
+
+Dates the model writes without an offset are the user's local time, so they
+stay naive ("floating" in ICS terms) unless DEFAULT_TIMEZONE names a zone to
+pin them to. resolve_start() also tells a bare date apart from a date-time,
+so a calendar event for "Wednesday, May 7, 2025" can be an all-day event
+instead of midnight.
+"""
+import datetime
+import functools
+import os
+import re
+from zoneinfo import ZoneInfo
+
+# Unset: naive inputs stay floating and today() uses the host's local time.
+DEFAULT_TIMEZONE = ZoneInfo(os.environ["DEFAULT_TIMEZONE"]) if os.getenv("DEFAULT_TIMEZONE") else None
+CACHE_SIZE = int(os.getenv("DATE_CACHE_SIZE", 4096))
+
+# The format get_date returns, e.g. "Wednesday, May 7, 2025".
+FORMAL_FORMAT = "%A, %B %d, %Y"
+
+_MONTHS = {name: index for index, name in enumerate(
+    ["January", "February", "March", "April", "May", "June", "July",
+     "August", "September", "October", "November", "December"], start=1)}
+_FORMAL_RE = re.compile(
+    r"^(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday), "
+    r"(" + "|".join(_MONTHS) + r") (\d{1,2}), (\d{4})$"
+)
+
+
+def _localize(dt, tz):
+    return dt.replace(tzinfo=tz) if dt.tzinfo is None and tz is not None else dt
+
+
+def _fast_parse(text):
+    """Returns a naive or aware datetime for the formats we see most, or None."""
+    if text[:4].isdigit():
+        try:
+            return datetime.datetime.fromisoformat(text)
+        except ValueError:
+            return None
+    match = _FORMAL_RE.match(text)
+    if match:
+        month, day, year = match.groups()
+        return datetime.datetime(int(year), _MONTHS[month], int(day))
+    return None
+
+
+# Clock times written out in words or digits, for telling "May 7 2025 12am" from "May 7 2025".
+_TIME_RE = re.compile(r"\d:\d|\d\s*[ap]\.?m\b|\b(?:noon|midnight)\b", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _dateutil_parse(text, day):
+    """
+    Returns (datetime, has_time). dateutil fills fields missing from `text`
+    from `day`, so the day is part of the cache key: "3pm" parsed yesterday
+    must not come back as yesterday afternoon.
+    """
+    from dateutil import parser
+    dt = parser.parse(text, default=datetime.datetime(day.year, day.month, day.day))
+    # Anything but midnight came from the text; midnight only counts if a time was written.
+    return dt, dt.time() != datetime.time() or _TIME_RE.search(text) is not None
+
+
+def has_time(text: str, tz=None) -> bool:
+    """True unless `text` is a bare date such as "2025-05-07" or "Wednesday, May 7, 2025"."""
+    text = text.strip()
+    if text[:4].isdigit():
+        try:
+            datetime.date.fromisoformat(text)
+            return False
+        except ValueError:
+            pass
+    if _FORMAL_RE.match(text):
+        return False
+    if _fast_parse(text) is not None:
+        return True
+    return _dateutil_parse(text, today(tz).date())[1]
+
+
+def resolve(text: str, tz=None) -> datetime.datetime:
+    """
+    Parses a date or date-time string into a datetime. Naive input is placed
+    in `tz` (default DEFAULT_TIMEZONE) or, if neither is set, left naive.
+
+    Raises ValueError (or OverflowError for absurd years) if it can't be parsed.
+    """
+    if not isinstance(text, str):
+        raise TypeError(f"Expected a date string, got {type(text).__name__}")
+    tz = tz or DEFAULT_TIMEZONE
+    text = text.strip()
+    dt = _fast_parse(text)
+    if dt is None:
+        dt = _dateutil_parse(text, today(tz).date())[0]
+    return _localize(dt, tz)
+
+
+def resolve_start(text: str, tz=None):
+    """resolve() for calendar events: a bare date comes back as a datetime.date, i.e. an all-day event."""
+    dt = resolve(text, tz)
+    return dt.date() if not has_time(text, tz) else dt
+
+
+def today(tz=None) -> datetime.datetime:
+    return datetime.datetime.now(tz or DEFAULT_TIMEZONE)
+
+
+def days_from_today(days: int, tz=None) -> datetime.datetime:
+    return today(tz) + datetime.timedelta(days=days)
+
+
+def cache_info():
+    return _dateutil_parse.cache_info()
@@ -7,11 +7,9 @@ if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
 # 2. Explicitly import the local agent.py
+# (Importing is cheap; the Agent itself is built once, by agent.get_agent() below.)
 try:
     import agent
-    # Optional: Force a reload to ensure you aren't using a cached version
-    import importlib
-    importlib.reload(agent)
 except ImportError as e:
     print(f"Error: Could not find agent.py in {current_dir}")
     raise e
@@ -21,6 +19,13 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 current_dir = os.path.dirname(os.path.abspath(__file__))
 agent_file_path = os.path.join(current_dir, "agent.py")
 print(agent_file_path)
+# Local modules agent.py imports; they have to ship alongside it
+LOCAL_MODULES = ["agent_trace.py", "attachments.py", "dates.py", "email_client.py", "ics.py", "policy_index.py",
+                 "response_cache.py", "search_cache.py", "templates.py"]
+local_module_paths = [os.path.join(current_dir, name) for name in LOCAL_MODULES]
+# Ship the prebuilt policy index too, if `python policy_index.py build` has been run
+if os.path.exists(os.path.join(current_dir, "policy_index.sqlite3")):
+    local_module_paths.append(os.path.join(current_dir, "policy_index.sqlite3"))
 
 from google.cloud import aiplatform
 from vertexai.preview import reasoning_engines
@@ -49,7 +54,7 @@ remote_agent = reasoning_engines.ReasoningEngine.create(
         "pydantic>=2.6.4", 
         "cloudpickle==3.0.0" 
         ],
-    extra_packages=[agent_file_path],
+    extra_packages=[agent_file_path, *local_module_paths],
     display_name="Email Calendar Agent 2.5",
     description="Agent using Gemini 2.5 Flash to create .ics files and send emails.",
 )
@@ -1,4 +1,7 @@
+import asyncio
 import os
+import threading
+
 import vertexai
 from vertexai.preview import reasoning_engines
 from google.cloud import aiplatform
@@ -8,32 +11,20 @@ PROJECT_ID = "qwiklabs-gcp-01-3bb38adc87a2"
 LOCATION = "us-central1"
 STAGING_BUCKET = f"gs://{PROJECT_ID}-agent-engine"
 MODEL_NAME = "gemini-1.5-flash" # Use 1.5-flash for maximum stability in Agent Engine
+MAX_IN_FLIGHT = int(os.getenv("CALENDAR_AGENT_MAX_IN_FLIGHT", 16))
 
 # --- Tool Definitions (Keep these global for easy pickling) ---
 def create_calendar_event(event_name: str, date_str: str) -> dict:
     """Generates an RFC-compliant ICS file and returns the base64 content."""
-    import datetime
-    import base64
-    from dateutil import parser 
-    from icalendar import Calendar, Event
-    # ... (Your existing logic is fine here) ...
-    cal = Calendar()
-    cal.add('prodid', '-//AI Agent Calendar//mxm.dk//')
-    cal.add('version', '2.0')
-    event = Event()
-    event.add('summary', event_name)
+    import dates
+    import ics
     try:
-        dt = parser.parse(date_str)
-        event.add('dtstart', dt)
-        event.add('dtend', dt + datetime.timedelta(hours=1))
-        event.add('dtstamp', datetime.datetime.now())
-        event.add('uid', f"{int(datetime.datetime.now().timestamp())}@ddintl.com")
+        dt = dates.resolve_start(date_str)
     except Exception as e:
         return {"error": str(e)}
-    cal.add_component(event)
     return {
-        "attachment_content": base64.b64encode(cal.to_ical()).decode('utf-8'),
-        "attachment_name": f"{event_name.replace(' ', '_')}.ics"
+        "attachment_content": ics.build_calendar_b64([(event_name, dt)]),
+        "attachment_name": ics.attachment_name(event_name)
     }
 
 def send_email(recipient_email: str, subject: str, body_html: str, 
@@ -46,14 +37,111 @@ def send_email(recipient_email: str, subject: str, body_html: str,
     return {"status": "success"} # Placeholder for brevity
 
 # --- Agent Wrapper ---
+APP_NAME = "calendar_agent"
+
+class _EventChunker:
+    """
+    Turns ADK events into stream chunks:
+        {"type": "text", "text": ...}
+        {"type": "tool_call", "name": ..., "args": {...}}
+        {"type": "tool_result", "name": ..., "response": {...}}
+
+    With SSE streaming the model's text arrives as partial events followed by
+    one final event repeating the whole text; the repeat is dropped.
+    """
+
+    def __init__(self):
+        self.streamed_text = False
+
+    def chunks(self, event):
+        content = getattr(event, "content", None)
+        if content is None or not content.parts:
+            return
+        partial = bool(getattr(event, "partial", False))
+        for part in content.parts:
+            if part.text and not getattr(part, "thought", False):
+                if partial:
+                    self.streamed_text = True
+                    yield {"type": "text", "text": part.text}
+                elif not self.streamed_text:
+                    yield {"type": "text", "text": part.text}
+            elif part.function_call:
+                yield {"type": "tool_call", "name": part.function_call.name,
+                       "args": dict(part.function_call.args or {})}
+            elif part.function_response:
+                yield {"type": "tool_result", "name": part.function_response.name,
+                       "response": part.function_response.response}
+        if not partial:
+            self.streamed_text = False
+
+class _InFlightLimiter:
+    """
+    Caps concurrent agent runs across threads and asyncio tasks, and lets at
+    most one run use a given session at a time.
+    """
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.waiting = 0
+        self._busy_sessions = set()
+        self._cond = threading.Condition()
+
+    def _try_acquire_locked(self, session_id):
+        if self.in_flight >= self.max_in_flight or session_id in self._busy_sessions:
+            return False
+        self.in_flight += 1
+        if session_id is not None:
+            self._busy_sessions.add(session_id)
+        return True
+
+    def acquire(self, session_id=None):
+        with self._cond:
+            self.waiting += 1
+            try:
+                while not self._try_acquire_locked(session_id):
+                    self._cond.wait()
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self, session_id=None):
+        # Blocking on the Condition would stall the event loop, so tasks poll with backoff.
+        delay = 0.005
+        with self._cond:
+            self.waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    if self._try_acquire_locked(session_id):
+                        return
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def release(self, session_id=None):
+        with self._cond:
+            self.in_flight -= 1
+            self._busy_sessions.discard(session_id)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"in_flight": self.in_flight, "waiting": self.waiting, "max_in_flight": self.max_in_flight}
+
 class CalendarAgent:
-    def __init__(self, model_name: str, project: str, location: str):
+    def __init__(self, model_name: str, project: str, location: str, max_in_flight: int = MAX_IN_FLIGHT):
         self.model_name = model_name
         self.project = project
         self.location = location
+        self.max_in_flight = max_in_flight
 
-    def set_up(self):
-        """This runs on the server. We wrap everything in a try-except to see logs."""
+    def set_up(self, llm=None):
+        """
+        This runs on the server. We wrap everything in a try-except to see logs.
+        `llm` overrides the Gemini model, e.g. with a stub for load tests.
+        """
         try:
             import nest_asyncio
             nest_asyncio.apply()
@@ -61,16 +149,18 @@ class CalendarAgent:
             import vertexai
             from google.adk.agents import Agent
             from google.adk.models.google_llm import Gemini
+            from google.adk.runners import InMemoryRunner
             
             vertexai.init(project=self.project, location=self.location)
             
             # Using Gemini 1.5 Flash for the backend model
-            llm = Gemini(
-                model=self.model_name,
-                vertexai=True,
-                project=self.project,
-                location=self.location
-            )
+            if llm is None:
+                llm = Gemini(
+                    model=self.model_name,
+                    vertexai=True,
+                    project=self.project,
+                    location=self.location
+                )
             
             self.executor = Agent(
                 name="calendar_root",
@@ -78,34 +168,86 @@ class CalendarAgent:
                 instruction="You are a precise assistant. Create calendar events and email them.",
                 tools=[create_calendar_event, send_email],
             )
+            # One runner is reused by every request; each request gets its own session.
+            self.runner = InMemoryRunner(agent=self.executor, app_name=APP_NAME)
+            self.limiter = _InFlightLimiter(self.max_in_flight)
         except Exception as e:
             # This will print to the Reasoning Engine logs if initialization fails
             print(f"CRITICAL ERROR DURING SET_UP: {str(e)}")
             raise e
 
-    def query(self, input_text: str):
+    def _run_args(self, input_text: str, user_id: str, session_id: str):
+        from google.adk.agents.run_config import RunConfig, StreamingMode
+        from google.genai import types
+
+        return {
+            "user_id": user_id,
+            "session_id": session_id,
+            "new_message": types.Content(role="user", parts=[types.Part(text=input_text)]),
+            # SSE makes the model emit partial text events as tokens arrive.
+            "run_config": RunConfig(streaming_mode=StreamingMode.SSE),
+        }
+
+    def stream_query(self, input_text: str, user_id: str = "default_user", session_id: str = None):
         """
-        Updated query method to use .stream() which is standard for 
-        the current Google ADK Agent executor.
+        Runs the agent and yields text chunks and tool-progress events as they
+        happen, instead of waiting for the whole search/ICS/email chain.
+        Errors are yielded as {"type": "error", "error": ...}.
+
+        Without a session_id each call runs in a fresh session that is deleted
+        afterwards, so concurrent requests never see each other's history.
         """
+        self.limiter.acquire(session_id)
+        created = None
         try:
-            responses = []
-            # In ADK, 'stream' is the common method for iterative execution
-            for event in self.executor.stream(input_text):
-                # The event object structure can vary; we check for common content attributes
-                if hasattr(event, 'content'):
-                    responses.append(str(event.content))
-                elif hasattr(event, 'text'):
-                    responses.append(str(event.text))
-                elif isinstance(event, str):
-                    responses.append(event)
-            
-            final_response = "".join(responses)
-            return final_response if final_response else "Action completed, but no text response was generated."
-            
+            if session_id is None:
+                created = asyncio.run(self.runner.session_service.create_session(app_name=APP_NAME, user_id=user_id))
+            chunker = _EventChunker()
+            run_args = self._run_args(input_text, user_id, session_id or created.id)
+            for event in self.runner.run(**run_args):
+                yield from chunker.chunks(event)
         except Exception as e:
-            # This helps us catch if 'stream' is also not the right method
-            return f"Execution error: {str(e)}. Attempting alternative..."
+            yield {"type": "error", "error": f"Execution error: {str(e)}"}
+        finally:
+            self.limiter.release(session_id)
+            if created is not None:
+                asyncio.run(self.runner.session_service.delete_session(
+                    app_name=APP_NAME, user_id=user_id, session_id=created.id))
+
+    async def async_stream_query(self, input_text: str, user_id: str = "default_user", session_id: str = None):
+        """Async-generator version of stream_query for asyncio callers."""
+        await self.limiter.acquire_async(session_id)
+        created = None
+        try:
+            if session_id is None:
+                created = await self.runner.session_service.create_session(app_name=APP_NAME, user_id=user_id)
+            chunker = _EventChunker()
+            run_args = self._run_args(input_text, user_id, session_id or created.id)
+            async for event in self.runner.run_async(**run_args):
+                for chunk in chunker.chunks(event):
+                    yield chunk
+        except Exception as e:
+            yield {"type": "error", "error": f"Execution error: {str(e)}"}
+        finally:
+            self.limiter.release(session_id)
+            if created is not None:
+                await self.runner.session_service.delete_session(
+                    app_name=APP_NAME, user_id=user_id, session_id=created.id)
+
+    def query(self, input_text: str):
+        """
+        Blocking call that returns the agent's full text reply; a thin wrapper
+        around stream_query.
+        """
+        responses = []
+        for chunk in self.stream_query(input_text):
+            if chunk["type"] == "text":
+                responses.append(chunk["text"])
+            elif chunk["type"] == "error":
+                return chunk["error"]
+
+        final_response = "".join(responses)
+        return final_response if final_response else "Action completed, but no text response was generated."
 
 # --- Deployment Logic ---
 if __name__ == "__main__":
@@ -126,6 +268,8 @@ if __name__ == "__main__":
             "nest-asyncio",
             "cloudpickle==3.0.0" 
         ],
+        # Local modules the tools import on the server
+        extra_packages=["dates.py", "ics.py"],
         display_name="Email Calendar Agent Synchronous",
     )
     print(f"Active! Resource: {remote_agent.resource_name}")
@@ -0,0 +1,124 @@
+import gzip
+import json
+import os
+
+import requests
+
+try:
+    from . import attachments
+except ImportError:
+    import attachments
+
+# Request bodies at least this large are gzip-compressed; send_mail_ws accepts Content-Encoding: gzip.
+GZIP_MIN_BYTES = int(os.getenv("EMAIL_CLIENT_GZIP_MIN_BYTES", 16 * 1024))
+
+
+def _resolve_attachment(content):
+    """
+    Resolves an attachment handle from this process's store. Unknown handles
+    are passed through for the web service to resolve from its own store.
+    """
+    if attachments.is_handle(content):
+        try:
+            return attachments.resolve_content(content)
+        except KeyError:
+            pass
+    return content
+
+
+class EmailClient:
+    def __init__(self, host="34.136.30.136", port=8080, pool_size=10):
+        self.base_url = f"http://{host}:{port}"
+        # Keep-alive session so repeated sends reuse the connection to the web service.
+        self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+
+    def _post_json(self, endpoint, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        if len(body) >= GZIP_MIN_BYTES:
+            # Level 1: most of the size win (base64 ICS text shrinks well) for a fraction of the CPU.
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        return self.session.post(endpoint, data=body, headers=headers)
+
+    def send_email(self, recipient_email, subject=None, body_html=None, attachment_content='',
+                   attachment_name="event.ics", idempotency_key=None, trace_id=None, template_id=None,
+                   variables=None):
+        """
+        Calls the Flask web service to send an email via Brevo.
+
+        Pass template_id and variables instead of subject/body_html to have the
+        service render one of its named templates (see templates.py).
+
+        Repeating a call with the same idempotency_key (or, when none is given,
+        the same recipient, subject, body and attachment) returns the original
+        response instead of sending another email. trace_id is sent as
+        X-Trace-Id so the service's timings can be matched to this call.
+        """
+        endpoint = f"{self.base_url}/send-email"
+        
+        payload = {
+            "recipient_email": recipient_email,
+            "subject": subject,
+            "body_html": body_html,
+            "attachment_content": attachment_content,
+            "attachment_name": attachment_name
+        }
+        if template_id:
+            payload["template_id"] = template_id
+            payload["variables"] = variables or {}
+        headers = {}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        if trace_id:
+            headers["X-Trace-Id"] = trace_id
+
+        payload["attachment_content"] = _resolve_attachment(attachment_content)
+
+        try:
+            response = self._post_json(endpoint, payload, headers)
+            response.raise_for_status()  # Raises an error for 4xx or 5xx responses
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            return {"error": str(e)}
+
+    def send_batch(self, messages, trace_id=None):
+        """
+        Sends many emails in one call to the web service, which packs them
+        into as few Brevo requests as it can.
+
+        Args:
+            messages: list of dicts with recipient_email, subject, body_html and
+                optionally attachment_content / attachment_name. Attachment
+                handles are resolved as in send_email.
+            trace_id: optional id sent as X-Trace-Id.
+
+        Returns:
+            {"results": [...]} with one entry per message, in the same order.
+        """
+        endpoint = f"{self.base_url}/send-email/batch"
+        messages = [dict(message, attachment_content=_resolve_attachment(message["attachment_content"]))
+                    if message.get("attachment_content") else message for message in messages]
+
+        try:
+            headers = {"X-Trace-Id": trace_id} if trace_id else None
+            response = self._post_json(endpoint, {"messages": messages}, headers)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            return {"error": str(e)}
+
+    def get_status(self, message_id):
+        """
+        Looks up a message accepted by the web service in queued mode
+        (send_email returned 202 with a message_id).
+        """
+        endpoint = f"{self.base_url}/send-email/{message_id}"
+
+        try:
+            response = self.session.get(endpoint)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            return {"error": str(e)}
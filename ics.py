@@ -0,0 +1,136 @@
+"""
+ICS (RFC 5545) generation for calendar reminders.
+
+The common case, VEVENTs with a summary, a start and a one hour duration, is
+written straight from a string template with proper text escaping and 75-octet
+line folding. icalendar is only imported if the template serializer is
+disabled (ICS_SERIALIZER=icalendar) or fails.
+"""
+import base64
+import datetime
+import os
+import uuid
+
+PRODID = "-//AI Agent Calendar//mxm.dk//"
+UID_DOMAIN = "ddintl.com"
+DEFAULT_DURATION = datetime.timedelta(hours=1)
+ALL_DAY = datetime.timedelta(days=1)
+
+USE_TEMPLATE = os.getenv("ICS_SERIALIZER", "template") != "icalendar"
+
+_CALENDAR_HEADER = f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{PRODID}\r\n"
+_CALENDAR_FOOTER = "END:VCALENDAR\r\n"
+_EVENT_TEMPLATE = (
+    "BEGIN:VEVENT\r\n"
+    "{summary}"
+    "DTSTART{dtstart}\r\n"
+    "DTEND{dtend}\r\n"
+    "DTSTAMP:{dtstamp}\r\n"
+    "UID:{uid}\r\n"
+    "END:VEVENT\r\n"
+)
+_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", ";": "\\;", ",": "\\,", "\n": "\\n", "\r": ""})
+
+
+def new_uid() -> str:
+    """A globally unique UID; unlike a timestamp, two events in the same second never collide."""
+    return f"{uuid.uuid4().hex}@{UID_DOMAIN}"
+
+
+def escape_text(value: str) -> str:
+    return value.translate(_TEXT_ESCAPES)
+
+
+def fold_line(line: str) -> str:
+    """Folds a content line at 75 octets without splitting a UTF-8 sequence."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    start = 0
+    limit = 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Back up to the start of a character if we landed on a continuation byte.
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode("utf-8"))
+        start = end
+        limit = 74  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def format_datetime(dt) -> str:
+    """
+    Returns the property suffix for a DTSTART/DTEND value: ';VALUE=DATE:...'
+    for a date (all-day event), ':...Z' for an aware datetime and a floating
+    ':...' (the reader's local time) for a naive one.
+    """
+    if not isinstance(dt, datetime.datetime):
+        return ";VALUE=DATE:" + dt.strftime("%Y%m%d")
+    if dt.tzinfo is not None and dt.utcoffset() is not None:
+        return ":" + dt.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return ":" + dt.strftime("%Y%m%dT%H%M%S")
+
+
+def _serialize_template(events, dtstamp):
+    stamp = dtstamp.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out = [_CALENDAR_HEADER]
+    for name, start, end, uid in events:
+        out.append(_EVENT_TEMPLATE.format(
+            summary=fold_line("SUMMARY:" + escape_text(name)),
+            dtstart=format_datetime(start),
+            dtend=format_datetime(end),
+            dtstamp=stamp,
+            uid=uid,
+        ))
+    out.append(_CALENDAR_FOOTER)
+    return "".join(out).encode("utf-8")
+
+
+def _serialize_icalendar(events, dtstamp):
+    from icalendar import Calendar, Event
+
+    cal = Calendar()
+    cal.add('prodid', PRODID)
+    cal.add('version', '2.0')
+    for name, start, end, uid in events:
+        event = Event()
+        event.add('summary', name)
+        event.add('dtstart', start)
+        event.add('dtend', end)
+        event.add('dtstamp', dtstamp)
+        event.add('uid', uid)
+        cal.add_component(event)
+    return cal.to_ical()
+
+
+def build_calendar(events, duration=DEFAULT_DURATION) -> bytes:
+    """
+    Serializes one VCALENDAR holding a VEVENT per entry.
+
+    Args:
+        events: iterable of (event_name, start) pairs; start is a datetime, or
+            a date for an all-day event (see dates.resolve_start).
+        duration: length of every timed event; all-day events last one day.
+
+    Returns:
+        The ICS file as bytes.
+    """
+    dtstamp = datetime.datetime.now(datetime.timezone.utc)
+    prepared = [(name, start, start + (duration if isinstance(start, datetime.datetime) else ALL_DAY), new_uid())
+                for name, start in events]
+    if USE_TEMPLATE:
+        try:
+            return _serialize_template(prepared, dtstamp)
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return _serialize_icalendar(prepared, dtstamp)
+
+
+def build_calendar_b64(events, duration=DEFAULT_DURATION) -> str:
+    return base64.b64encode(build_calendar(events, duration)).decode('utf-8')
+
+
+def attachment_name(event_name: str) -> str:
+    return f"{event_name.replace(' ', '_')}.ics"
@@ -0,0 +1,154 @@
+"""
+Deduplication of repeated /send-email requests.
+
+Each send is identified by an idempotency key, either supplied by the caller
+or derived from the message content. The response to the first request is
+kept in a bounded LRU+TTL cache and replayed for duplicates without calling
+the provider again. A duplicate that arrives while the first request is still
+in flight waits for it instead of sending a second copy.
+"""
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 3600))
+DEFAULT_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000))
+
+
+def derive_key(recipient_email, subject, body_html, attachment_content='', attachment_name=''):
+    material = json.dumps([recipient_email, subject, body_html, attachment_content or '', attachment_name or ''])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+INVALID_KEY_ERROR = "idempotency_key must be a non-empty string"
+
+
+def supplied_key(header_value, data):
+    """
+    The caller's key: the Idempotency-Key header, else the idempotency_key
+    field. Returns (key, error); key is None when the caller gave none.
+    """
+    if header_value:
+        return header_value, None
+    key = data.get('idempotency_key')
+    if key is None:
+        return None, None
+    if not isinstance(key, str) or not key:
+        return None, INVALID_KEY_ERROR
+    return key, None
+
+
+def request_key(caller_key, data, payload):
+    """The key for one /send-email request: the caller's key (see supplied_key), else derived from the content."""
+    return caller_key or derive_key(
+        data.get('recipient_email'), payload['subject'], payload['htmlContent'],
+        data.get('attachment_content', ''), data.get('attachment_name', 'event.ics'))
+
+
+def chunk_key(caller_key, number, payload):
+    """
+    The key for one upstream call of /send-email/batch. Keying chunks rather
+    than the whole batch means a retried batch replays the chunks that went
+    through and only resends the ones that failed.
+    """
+    if caller_key:
+        return f"{caller_key}:{number}"
+    material = json.dumps(payload, sort_keys=True)
+    return "batch:" + hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def should_cache(status_code) -> bool:
+    # Throttling and upstream failures are worth retrying, so they are not remembered.
+    return status_code < 500 and status_code != 429
+
+
+class IdempotencyCache:
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _try_begin(self, key):
+        """Returns (cached_response, None), (None, None) when the caller now owns the send, or (None, event) to wait on."""
+        with self._lock:
+            response = self._get_locked(key)
+            if response is not None:
+                self.hits += 1
+                return response, None
+            event = self._in_flight.get(key)
+            if event is None:
+                self._in_flight[key] = threading.Event()
+                self.misses += 1
+            return None, event
+
+    def _timed_out(self):
+        with self._lock:
+            self.misses += 1
+
+    def begin(self, key, wait_timeout=30.0):
+        """
+        Returns the cached response for `key`, or None if the caller should
+        perform the send. A caller that gets None must call complete() or
+        release() afterwards.
+        """
+        while True:
+            response, event = self._try_begin(key)
+            if event is None:
+                return response
+            # Someone else is sending this exact message; wait for their result.
+            if not event.wait(wait_timeout):
+                self._timed_out()
+                return None
+
+    async def begin_async(self, key, wait_timeout=30.0):
+        """begin() for the asyncio server: waiting on a duplicate happens off the event loop."""
+        import asyncio
+
+        while True:
+            response, event = self._try_begin(key)
+            if event is None:
+                return response
+            if not await asyncio.to_thread(event.wait, wait_timeout):
+                self._timed_out()
+                return None
+
+    def complete(self, key, response):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._wake_locked(key)
+
+    def release(self, key):
+        """Ends an in-flight send without caching it (e.g. it failed and may be retried)."""
+        with self._lock:
+            self._wake_locked(key)
+
+    def _wake_locked(self, key):
+        event = self._in_flight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "in_flight": len(self._in_flight),
+                    "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,198 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters and fixed-bucket histograms are a dict update and a bisect under a
+lock, cheap enough to leave on for every request. Gauges are callbacks read
+only when /metrics is scraped.
+
+Per-request traces: start_trace() binds a trace id to the current thread
+(or asyncio task), stage() both records into the shared histogram and adds
+the time to that trace, and finish_request() records the request and
+returns the collected timings. Both servers use the same helpers, so their
+/metrics output is the same.
+"""
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+# TRACE_LOG=1 prints one JSON line per request with its trace id and stage timings.
+TRACE_LOG = os.environ.get("TRACE_LOG", "").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, plus one overflow slot, then sum.
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, {"le": repr(bound)})
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, {'le': '+Inf'})} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, callback):
+        """
+        callback() returns a number, or a dict of {label_value: number} for a
+        `key` label. Registering a name again replaces the earlier callback.
+        """
+        self._gauges = [gauge for gauge in self._gauges if gauge[0] != name]
+        self._gauges.append((name, help, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help, callback in self._gauges:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for key, item in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels(('key',), (key,))} {item}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "send_mail_stage_seconds", "Time spent per request stage.", ("stage",)))
+REQUESTS = REGISTRY.register(Counter(
+    "send_mail_requests_total", "Requests handled, by endpoint and response status.", ("endpoint", "status")))
+REQUEST_BYTES = REGISTRY.register(Counter(
+    "send_mail_request_bytes_total", "Request body bytes received, by endpoint.", ("endpoint",)))
+UPSTREAM_RESPONSES = REGISTRY.register(Counter(
+    "send_mail_upstream_responses_total", "Provider responses, by status code.", ("status",)))
+UPSTREAM_RETRIES = REGISTRY.register(Counter(
+    "send_mail_upstream_retries_total", "Provider calls repeated, by reason.", ("reason",)))
+PROVIDER_ATTEMPTS = REGISTRY.register(Counter(
+    "send_mail_provider_attempts_total", "Delivery attempts, by provider and outcome.", ("provider", "outcome")))
+HEDGES = REGISTRY.register(Counter(
+    "send_mail_hedges_total", "Second providers started, because the first was slow or failed.", ("reason",)))
+
+
+# --- Tracing ---
+# A ContextVar is per thread and, under asyncio, per task, so it covers both servers.
+_current = contextvars.ContextVar("send_mail_trace", default=None)
+
+
+def start_trace(trace_id):
+    _current.set({"trace_id": trace_id, "stages": {}})
+
+
+def current_trace():
+    return _current.get()
+
+
+def use_trace(trace):
+    """Binds an existing trace to this thread, e.g. in a worker running part of the request."""
+    _current.set(trace)
+
+
+def end_trace():
+    trace = current_trace()
+    _current.set(None)
+    return trace
+
+
+def finish_request(endpoint, status, request_bytes, elapsed):
+    """Records a finished request and ends its trace. With TRACE_LOG=1 the trace is printed as one JSON line."""
+    STAGE_SECONDS.observe(elapsed, stage="total")
+    REQUESTS.inc(endpoint=endpoint, status=status)
+    if request_bytes:
+        REQUEST_BYTES.inc(request_bytes, endpoint=endpoint)
+    trace = end_trace()
+    if TRACE_LOG and trace is not None:
+        print(json.dumps({
+            "trace_id": trace["trace_id"], "endpoint": endpoint, "status": status,
+            "bytes": request_bytes or 0, "total_ms": round(elapsed * 1000, 3),
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in trace["stages"].items()},
+        }))
+    return trace
+
+
+@contextlib.contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = current_trace()
+        if trace is not None:
+            trace["stages"][name] = trace["stages"].get(name, 0.0) + elapsed
@@ -0,0 +1,195 @@
+"""
+SQLite-backed outbound mail queue.
+
+Messages are written to disk before /send-email answers, so anything that has
+been accepted survives a process restart. A pool of worker threads drains the
+queue to the provider and records the outcome for the status endpoint.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_QUEUE_PATH = os.getenv("SEND_QUEUE_PATH", "outbox.sqlite3")
+DEFAULT_WORKERS = int(os.getenv("SEND_QUEUE_WORKERS", 4))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("SEND_QUEUE_MAX_ATTEMPTS", 5))
+
+QUEUED = "queued"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    result TEXT,
+    status_code INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, next_attempt_at);
+"""
+
+
+class Outbox:
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")]
+        if "idempotency_key" not in columns:
+            # Queue files from before keys were stored.
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN idempotency_key TEXT")
+        self._wakeup = threading.Condition()
+        # Anything left mid-send by a previous process goes back on the queue.
+        self._execute("UPDATE outbox SET status = ? WHERE status = ?", (QUEUED, SENDING))
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def enqueue(self, payload: dict, idempotency_key=None) -> str:
+        """Queues a payload; `idempotency_key` is the request's key, handed to deliver() with it."""
+        message_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO outbox (id, payload, idempotency_key, status, next_attempt_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (message_id, json.dumps(payload), idempotency_key, QUEUED, now, now, now),
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return message_id
+
+    def claim(self):
+        """Marks the oldest due message as sending and returns (id, payload, attempts, idempotency_key), or None."""
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, payload, attempts, idempotency_key FROM outbox WHERE status = ? AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at LIMIT 1",
+                    (QUEUED, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (SENDING, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2] + 1, row[3]
+
+    def finish(self, message_id, status, result, status_code):
+        self._execute(
+            "UPDATE outbox SET status = ?, result = ?, status_code = ?, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result), status_code, time.time(), message_id),
+        )
+
+    def retry_later(self, message_id, delay, result, status_code):
+        now = time.time()
+        self._execute(
+            "UPDATE outbox SET status = ?, result = ?, status_code = ?, next_attempt_at = ?, updated_at = ? "
+            "WHERE id = ?",
+            (QUEUED, json.dumps(result), status_code, now + delay, now, message_id),
+        )
+
+    def get(self, message_id):
+        rows = self._execute(
+            "SELECT id, status, attempts, result, status_code, created_at, updated_at FROM outbox WHERE id = ?",
+            (message_id,),
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "message_id": row[0],
+            "status": row[1],
+            "attempts": row[2],
+            "result": json.loads(row[3]) if row[3] else None,
+            "status_code": row[4],
+            "created_at": row[5],
+            "updated_at": row[6],
+        }
+
+    def depth(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (QUEUED, SENDING))[0][0]
+
+    def wait_for_work(self, timeout):
+        with self._wakeup:
+            self._wakeup.wait(timeout)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxWorkers:
+    """
+    Drains an Outbox with a fixed pool of threads.
+
+    `deliver(payload, idempotency_key)` must return (body, status_code); the
+    key is None for messages queued without one. 429 and 5xx answers
+    are retried with exponential backoff until `max_attempts`; any other
+    error is final.
+    """
+
+    def __init__(self, outbox, deliver, num_workers=DEFAULT_WORKERS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 backoff_base=1.0, poll_interval=1.0):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.num_workers = num_workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self.outbox._wakeup:
+            self.outbox._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            item = self.outbox.claim()
+            if item is None:
+                self.outbox.wait_for_work(self.poll_interval)
+                continue
+            self.process(*item)
+
+    def process(self, message_id, payload, attempts, idempotency_key=None):
+        try:
+            body, status_code = self.deliver(payload, idempotency_key)
+        except Exception as e:
+            body, status_code = {"error": str(e)}, 500
+
+        if status_code < 400:
+            self.outbox.finish(message_id, SENT, body, status_code)
+        elif (status_code == 429 or status_code >= 500) and attempts < self.max_attempts:
+            self.outbox.retry_later(message_id, self.backoff_base * (2 ** (attempts - 1)), body, status_code)
+        else:
+            self.outbox.finish(message_id, FAILED, body, status_code)
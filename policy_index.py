@@ -0,0 +1,248 @@
+"""
+Precomputed policy-expiration index.
+
+An offline job exports every document from the Vertex AI Search data store,
+pulls out (policy id, holder, expiration date) and writes them to a small
+SQLite file. At run time the file is loaded into memory once, so a lookup by
+policy id or holder is a dict access and "expiring in the next N days" is a
+bisect over a date-sorted list.
+
+Build:
+    python policy_index.py build --datastore-id $DATASTORE_ID
+    python policy_index.py build --from-jsonl policies.jsonl   # offline
+Query:
+    python policy_index.py query --policy-id PX-1042
+    python policy_index.py query --days 30
+"""
+import bisect
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+
+DEFAULT_INDEX_PATH = os.getenv(
+    "POLICY_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy_index.sqlite3"),
+)
+
+# Field names we accept in a document's structured data, in priority order.
+POLICY_ID_FIELDS = ("policy_id", "policy_number", "policyId", "policyNumber", "id")
+HOLDER_FIELDS = ("holder", "policy_holder", "policyholder", "customer", "customer_name", "name")
+EMAIL_FIELDS = ("email", "holder_email", "customer_email")
+EXPIRATION_FIELDS = ("expiration_date", "expiry_date", "expires", "expiration", "end_date", "expirationDate")
+
+_TEXT_PATTERNS = {
+    "policy_id": re.compile(r"policy\s*(?:id|number|no\.?|#)\s*[:#]?\s*([A-Z0-9][A-Z0-9-]{2,})", re.I),
+    "holder": re.compile(r"(?:policy\s*holder|policyholder|holder|insured)\s*(?:name)?\s*:\s*([^\n,;]+)", re.I),
+    "email": re.compile(r"([\w.+-]+@[\w-]+\.[\w.-]+)"),
+    "expiration_date": re.compile(r"(?:expir\w*|expires|end)\s*(?:date|on)?\s*:?\s*([^\n;]+?\d{4})", re.I),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS policies (
+    policy_id TEXT PRIMARY KEY,
+    holder TEXT,
+    email TEXT,
+    expiration_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS policies_expiration ON policies (expiration_date);
+"""
+
+
+def _normalize(value: str) -> str:
+    return " ".join(str(value).casefold().split())
+
+
+def _first(data, fields):
+    for field in fields:
+        value = data.get(field)
+        if value:
+            return str(value)
+    return None
+
+
+def extract_record(struct_data=None, text=None):
+    """
+    Pulls a policy record out of a data store document.
+
+    Structured fields win; free text is scanned with regexes as a fallback.
+    Returns a dict with policy_id, holder, email and an ISO expiration_date,
+    or None if no policy id or expiration date could be found.
+    """
+    try:
+        from . import dates
+    except ImportError:
+        import dates
+
+    struct_data = struct_data or {}
+    record = {
+        "policy_id": _first(struct_data, POLICY_ID_FIELDS),
+        "holder": _first(struct_data, HOLDER_FIELDS),
+        "email": _first(struct_data, EMAIL_FIELDS),
+        "expiration_date": _first(struct_data, EXPIRATION_FIELDS),
+    }
+    if text:
+        for field, pattern in _TEXT_PATTERNS.items():
+            if not record[field]:
+                match = pattern.search(text)
+                if match:
+                    record[field] = match.group(1).strip()
+
+    if not record["policy_id"] or not record["expiration_date"]:
+        return None
+    try:
+        record["expiration_date"] = dates.resolve(record["expiration_date"]).date().isoformat()
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return record
+
+
+# --- Export ---
+def export_datastore(datastore_id, project_id=None):
+    """Yields (struct_data, text) for every document in the data store."""
+    from google.cloud import discoveryengine_v1beta as discoveryengine
+
+    project_id = project_id or os.getenv("GOOGLE_CLOUD_PROJECT")
+    parent = (f"projects/{project_id}/locations/global/collections/default_collection/"
+              f"dataStores/{datastore_id}/branches/default_branch")
+    client = discoveryengine.DocumentServiceClient()
+    for document in client.list_documents(request={"parent": parent, "page_size": 1000}):
+        struct_data = dict(document.struct_data) if document.struct_data else {}
+        if not struct_data and document.json_data:
+            struct_data = json.loads(document.json_data)
+        text = None
+        if document.content and document.content.raw_bytes:
+            text = document.content.raw_bytes.decode("utf-8", errors="replace")
+        yield struct_data, text
+
+
+def export_jsonl(path):
+    """Yields (struct_data, text) from a JSON-lines file, one document per line."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                yield data, data.get("content")
+
+
+def build_index(documents, path=DEFAULT_INDEX_PATH) -> int:
+    """Writes a fresh index from (struct_data, text) pairs. Returns the number of policies."""
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(_SCHEMA)
+    count = 0
+    for struct_data, text in documents:
+        record = extract_record(struct_data, text)
+        if record is None:
+            continue
+        conn.execute(
+            "INSERT OR REPLACE INTO policies (policy_id, holder, email, expiration_date) VALUES (?, ?, ?, ?)",
+            (record["policy_id"], record["holder"], record["email"], record["expiration_date"]),
+        )
+        count += 1
+    conn.commit()
+    conn.close()
+    # Swap in atomically so readers never see a half-built index.
+    os.replace(tmp_path, path)
+    return count
+
+
+# --- Lookup ---
+class PolicyIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        rows = conn.execute(
+            "SELECT policy_id, holder, email, expiration_date FROM policies ORDER BY expiration_date"
+        ).fetchall()
+        conn.close()
+
+        self.records = [
+            {"policy_id": policy_id, "holder": holder, "email": email, "expiration_date": expiration_date}
+            for policy_id, holder, email, expiration_date in rows
+        ]
+        self._dates = [record["expiration_date"] for record in self.records]
+        self._by_id = {_normalize(record["policy_id"]): record for record in self.records}
+        self._by_holder = {}
+        for record in self.records:
+            if record["holder"]:
+                self._by_holder.setdefault(_normalize(record["holder"]), []).append(record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def lookup(self, policy_id=None, holder=None):
+        """Returns the matching records (a policy id match is unique)."""
+        if policy_id:
+            record = self._by_id.get(_normalize(policy_id))
+            return [record] if record else []
+        if holder:
+            return list(self._by_holder.get(_normalize(holder), []))
+        return []
+
+    def expiring_between(self, start: datetime.date, end: datetime.date):
+        """Records whose expiration date falls in [start, end], soonest first."""
+        lo = bisect.bisect_left(self._dates, start.isoformat())
+        hi = bisect.bisect_right(self._dates, end.isoformat())
+        return self.records[lo:hi]
+
+    def expiring_within(self, days: int, today=None):
+        today = today or datetime.date.today()
+        return self.expiring_between(today, today + datetime.timedelta(days=days))
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_index(path=DEFAULT_INDEX_PATH):
+    """Loads the index once per process. Returns None if it has not been built."""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                if not os.path.exists(path):
+                    return None
+                _default_index = PolicyIndex(path)
+    return _default_index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the policy-expiration index")
+    parser.add_argument("--path", default=DEFAULT_INDEX_PATH, help="Index file (default: POLICY_INDEX_PATH)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Export the data store into the index")
+    build.add_argument("--datastore-id", default=os.getenv("DATASTORE_ID"))
+    build.add_argument("--project", default=os.getenv("GOOGLE_CLOUD_PROJECT"))
+    build.add_argument("--from-jsonl", help="Build from a JSON-lines export instead of the data store")
+
+    query = sub.add_parser("query", help="Look up policies in the index")
+    query.add_argument("--policy-id")
+    query.add_argument("--holder")
+    query.add_argument("--days", type=int, help="Policies expiring in the next N days")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.from_jsonl:
+            documents = export_jsonl(args.from_jsonl)
+        elif args.datastore_id:
+            documents = export_datastore(args.datastore_id, args.project)
+        else:
+            parser.error("--datastore-id (or DATASTORE_ID) or --from-jsonl is required")
+        print(f"Indexed {build_index(documents, args.path)} policies into {args.path}")
+    else:
+        index = PolicyIndex(args.path)
+        if args.days is not None:
+            results = index.expiring_within(args.days)
+        else:
+            results = index.lookup(policy_id=args.policy_id, holder=args.holder)
+        for record in results:
+            print(json.dumps(record))
@@ -0,0 +1,467 @@
+"""
+Delivery providers behind send_mail_ws, with health tracking and hedging.
+
+A provider is any object with a `name` and `send(payload, delivery=None)`
+returning (body, status_code) for a Brevo-format payload (see
+brevo_api.build_payload). FunctionProvider adapts a plain function;
+SmtpProvider delivers the same payloads over SMTP.
+
+ProviderRouter tries providers in priority order, skipping any whose circuit
+breaker is open. If the primary has not answered within its recent latency
+percentile, the next provider is started as a hedge; if the primary fails
+with a 429/5xx, the next one takes over straight away.
+
+Only one copy is delivered. The attempts share a Delivery, and each calls
+delivery.claim() right before its irreversible step (the Brevo POST, the SMTP
+DATA). Claims are exclusive and never wait: an attempt that finds the message
+claimed by the other stands down with AlreadyDelivered (an SMTP hedge resets
+its transaction and frees its thread), and settling a failed step hands the
+message back. The router only starts a "slow" hedge while the primary has
+not claimed, i.e. it is stalled before sending (a rate limit pause, a slow
+key fetch or SMTP handshake); a primary whose request is already on the wire
+is waited for, since a second provider could not be stopped from sending a
+second copy. When the attempt that held the claim then fails, a provider
+that stood down is started again. The send's idempotency key also goes to
+the providers, so each dedupes its own repeats: Brevo gets it as the
+idempotencyKey header, and SMTP messages get a Message-ID derived from it.
+"""
+import base64
+import collections
+import concurrent.futures
+import hashlib
+import json
+import mimetypes
+import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid
+
+import metrics
+
+HEDGE_PERCENTILE = float(os.getenv("SEND_HEDGE_PERCENTILE", 0.95))
+HEDGE_MIN_DELAY = float(os.getenv("SEND_HEDGE_MIN_DELAY_SECONDS", 0.05))
+HEDGE_DEFAULT_DELAY = float(os.getenv("SEND_HEDGE_DEFAULT_DELAY_SECONDS", 1.0))
+ROUTER_THREADS = int(os.getenv("SEND_PROVIDER_THREADS", 64))
+
+BREAKER_WINDOW = int(os.getenv("SEND_BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.getenv("SEND_BREAKER_MIN_CALLS", 10))
+BREAKER_FAILURE_RATE = float(os.getenv("SEND_BREAKER_FAILURE_RATE", 0.5))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("SEND_BREAKER_SLOW_CALL_SECONDS", 10))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("SEND_BREAKER_COOLDOWN_SECONDS", 30))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_retryable(status_code) -> bool:
+    """429 and 5xx mean the provider did not take the message and another may."""
+    return status_code == 429 or status_code >= 500
+
+
+class AlreadyDelivered(Exception):
+    """Raised by Delivery.claim() when another attempt is sending, or has sent, the message."""
+
+
+class Delivery:
+    """Shared by the attempts of one send so that only one of them delivers."""
+
+    def __init__(self, key=None, payload=None):
+        if key is None and payload is not None:
+            key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        self.key = key
+        self.delivered_by = None
+        self._holder = None
+        self._lock = threading.Lock()
+
+    @property
+    def claimed(self) -> bool:
+        with self._lock:
+            return self._holder is not None or self.delivered_by is not None
+
+    def claim(self, name):
+        """Takes the message for `name`, or raises AlreadyDelivered at once if another attempt holds it."""
+        with self._lock:
+            owner = self.delivered_by or self._holder
+            if owner is not None and owner != name:
+                raise AlreadyDelivered(owner)
+            self._holder = name
+
+    def settle(self, name, delivered):
+        """Ends a claim. delivered=False means nothing went out, and hands the message back."""
+        with self._lock:
+            if self._holder == name:
+                self._holder = None
+                if delivered:
+                    self.delivered_by = name
+
+    def message_id(self, domain, number=0):
+        """A Message-ID that is the same for every attempt at this send, or None without a key."""
+        if self.key is None:
+            return None
+        return f"<{self.key}.{number}@{domain}>"
+
+
+class CircuitBreaker:
+    """
+    Opens when at least `failure_rate` of the last `window` calls failed or
+    took longer than `slow_call_seconds`. After `cooldown` seconds one probe
+    call is let through (half-open); its outcome closes or re-opens it.
+    """
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS, failure_rate=BREAKER_FAILURE_RATE,
+                 slow_call_seconds=BREAKER_SLOW_CALL_SECONDS, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened = 0
+        self._outcomes = collections.deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, failed, seconds):
+        failed = failed or seconds >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append(failed)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate):
+                self._open()
+
+    def cancel(self):
+        """The call let through produced no verdict (another provider delivered first)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self._outcomes.clear()
+
+
+class ProviderHealth:
+    """Circuit breaker plus recent latencies and outcome counts for one provider."""
+
+    def __init__(self, name, breaker=None, latency_window=200, min_samples=20):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker()
+        self.min_samples = min_samples
+        self.counts = collections.Counter()
+        self._latencies = collections.deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def record(self, outcome, seconds):
+        if outcome == "aborted":
+            self.breaker.cancel()
+        else:
+            self.breaker.record(outcome == "failure", seconds)
+        with self._lock:
+            self.counts[outcome] += 1
+            if outcome == "success":
+                self._latencies.append(seconds)
+
+    def latency_percentile(self, fraction):
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def hedge_delay(self, fraction=HEDGE_PERCENTILE):
+        latency = self.latency_percentile(fraction)
+        return max(HEDGE_DEFAULT_DELAY if latency is None else latency, HEDGE_MIN_DELAY)
+
+    def stats(self) -> dict:
+        p50, p95 = self.latency_percentile(0.50), self.latency_percentile(0.95)
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "state": self.breaker.state,
+            "times_opened": self.breaker.opened,
+            "outcomes": counts,
+            "latency_p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        }
+
+
+class FunctionProvider:
+    def __init__(self, name, send):
+        self.name = name
+        self._send = send
+
+    def send(self, payload, delivery=None):
+        return self._send(payload, delivery)
+
+
+class SmtpProvider:
+    """
+    Delivers Brevo-format payloads through an SMTP server. Each worker thread
+    keeps its own connection open between sends.
+
+        SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_STARTTLS, SMTP_TIMEOUT
+    """
+
+    name = "smtp"
+
+    def __init__(self, host=None, port=None, username=None, password=None, starttls=None, timeout=None):
+        self.host = host or os.getenv("SMTP_HOST", "127.0.0.1")
+        self.port = int(port or os.getenv("SMTP_PORT", 1025))
+        self.username = username or os.getenv("SMTP_USERNAME") or None
+        self.password = password or os.getenv("SMTP_PASSWORD") or None
+        self.starttls = starttls if starttls is not None else os.getenv("SMTP_STARTTLS", "").lower() in ("1", "true")
+        self.timeout = float(timeout or os.getenv("SMTP_TIMEOUT", 20))
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except smtplib.SMTPException:
+                pass
+            self._close()
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def build_messages(payload, delivery=None):
+        """
+        Returns [(recipients, EmailMessage)], one per messageVersion (or one for
+        a single payload). With a keyed Delivery the Message-IDs are stable
+        across attempts, so receivers can drop a repeat of the same send.
+        """
+        sender = payload["sender"]
+        versions = payload.get("messageVersions") or [payload]
+        domain = sender["email"].rpartition("@")[2] or None
+        messages = []
+        for number, version in enumerate(versions):
+            message = EmailMessage()
+            message["From"] = formataddr((sender.get("name", ""), sender["email"]))
+            recipients = [to["email"] for to in version["to"]]
+            message["To"] = ", ".join(recipients)
+            message["Subject"] = version.get("subject") or payload["subject"]
+            message_id = delivery.message_id(domain or "localhost", number) if delivery is not None else None
+            message["Message-ID"] = message_id or make_msgid(domain=domain)
+            message.set_content(version.get("htmlContent") or payload["htmlContent"], subtype="html")
+            for attachment in payload.get("attachment") or []:
+                content_type = mimetypes.guess_type(attachment["name"])[0] or "application/octet-stream"
+                maintype, subtype = content_type.split("/", 1)
+                message.add_attachment(base64.b64decode(attachment["content"]), maintype=maintype,
+                                       subtype=subtype, filename=attachment["name"])
+            messages.append((recipients, message))
+        return messages
+
+    def send(self, payload, delivery=None):
+        messages = self.build_messages(payload, delivery)
+        claimed = False
+        message_ids = []
+        try:
+            conn = self._connection()
+            for recipients, message in messages:
+                conn.mail(payload["sender"]["email"])
+                for recipient in recipients:
+                    code, response = conn.rcpt(recipient)
+                    if code >= 400:
+                        raise smtplib.SMTPRecipientsRefused({recipient: (code, response)})
+                # DATA is the point of no return, so this is the last chance to stand down.
+                if delivery is not None and not claimed:
+                    try:
+                        delivery.claim(self.name)
+                    except AlreadyDelivered:
+                        conn.rset()
+                        raise
+                    claimed = True
+                code, response = conn.data(message.as_bytes())
+                if code >= 400:
+                    raise smtplib.SMTPDataError(code, response)
+                message_ids.append(message["Message-ID"])
+        except AlreadyDelivered:
+            raise
+        except smtplib.SMTPRecipientsRefused as e:
+            self._reset()
+            body, status_code = {"error": f"SMTP refused recipients: {e.recipients}"}, 400
+        except smtplib.SMTPResponseException as e:
+            # 4xx replies are transient, 5xx replies permanent.
+            self._reset()
+            status_code = 503 if 400 <= e.smtp_code < 500 else 400
+            body = {"error": f"SMTP error {e.smtp_code}: {e.smtp_error!r}"}
+        except (smtplib.SMTPException, OSError) as e:
+            self._close()
+            body, status_code = {"error": f"SMTP request failed: {str(e)}"}, 502
+        else:
+            if delivery is not None:
+                delivery.settle(self.name, True)
+            if "messageVersions" in payload:
+                return {"messageIds": message_ids}, 200
+            return {"messageId": message_ids[0]}, 200
+
+        if delivery is not None and claimed:
+            # Part of a batch already went out; handing it to another provider would send those twice.
+            delivery.settle(self.name, bool(message_ids))
+        return body, status_code
+
+    def _reset(self):
+        try:
+            self._local.conn.rset()
+        except Exception:
+            self._close()
+
+
+class ProviderRouter:
+    def __init__(self, providers, hedge_percentile=HEDGE_PERCENTILE, max_workers=ROUTER_THREADS):
+        self.providers = list(providers)
+        self.hedge_percentile = hedge_percentile
+        self.health = {provider.name: ProviderHealth(provider.name) for provider in self.providers}
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._max_workers = max_workers
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = concurrent.futures.ThreadPoolExecutor(self._max_workers,
+                                                                       thread_name_prefix="provider")
+        return self._pool
+
+    def _next_provider(self, after=None):
+        """The next provider after `after` (by priority) whose breaker lets a call through."""
+        start = 0 if after is None else self.providers.index(after) + 1
+        for provider in self.providers[start:]:
+            if self.health[provider.name].breaker.allow():
+                return provider
+        return None
+
+    def _attempt(self, provider, payload, delivery, trace=None):
+        if trace is not None:
+            # Pool threads add their stage timings to the request that started them.
+            metrics.use_trace(trace)
+        start = time.perf_counter()
+        try:
+            body, status_code = provider.send(payload, delivery)
+        except AlreadyDelivered:
+            self.health[provider.name].record("aborted", time.perf_counter() - start)
+            metrics.PROVIDER_ATTEMPTS.inc(provider=provider.name, outcome="aborted")
+            return None
+        finally:
+            if trace is not None:
+                metrics.use_trace(None)
+        elapsed = time.perf_counter() - start
+        outcome = "failure" if is_retryable(status_code) else "success" if status_code < 400 else "rejected"
+        self.health[provider.name].record(outcome, elapsed)
+        metrics.PROVIDER_ATTEMPTS.inc(provider=provider.name, outcome=outcome)
+        return body, status_code
+
+    def send(self, payload, key=None):
+        """
+        Delivers one Brevo-format payload. `key` is the send's idempotency key,
+        passed on to the providers; without one it is derived from the payload.
+        """
+        primary = self._next_provider()
+        if primary is None:
+            return {"error": "No delivery provider is available (all circuits open)"}, 503
+        if len(self.providers) == 1:
+            # Nothing to hedge or fail over to: send on the caller's thread.
+            return self._attempt(primary, payload, Delivery(key, payload))
+
+        delivery = Delivery(key, payload)
+        trace = metrics.current_trace()
+        pool = self._executor()
+        pending = {}
+        stood_down = []
+        restarted = set()
+        secondary = None
+        last_failure = None
+
+        def start(provider, reason=None):
+            if reason is not None:
+                metrics.HEDGES.inc(reason=reason)
+            pending[pool.submit(self._attempt, provider, payload, delivery, trace)] = provider
+
+        start(primary)
+        done, _ = concurrent.futures.wait(pending, timeout=self.health[primary.name].hedge_delay(self.hedge_percentile))
+        if not done and not delivery.claimed:
+            # The secondary's breaker is only asked once it is actually needed.
+            secondary = self._next_provider(primary)
+            if secondary is not None:
+                start(secondary, "slow")
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                result = future.result()
+                if result is None:
+                    stood_down.append(provider)
+                    continue
+                if not is_retryable(result[1]):
+                    return result
+                last_failure = result
+            if last_failure is None or pending or delivery.delivered_by is not None:
+                continue
+            # Nothing is running and nothing went out: give the message to a provider that has not tried it.
+            retry = next((provider for provider in stood_down if provider.name not in restarted), None)
+            if retry is not None:
+                restarted.add(retry.name)
+                start(retry, "failover")
+            elif secondary is None:
+                secondary = self._next_provider(primary)
+                if secondary is not None:
+                    start(secondary, "failover")
+        return last_failure or ({"error": "Delivery aborted"}, 500)
+
+    def stats(self) -> dict:
+        return {name: health.stats() for name, health in self.health.items()}
+
+
+def build_router(names, brevo_send):
+    """Builds a router for SEND_PROVIDERS-style names, e.g. ["brevo", "smtp"]."""
+    factories = {
+        "brevo": lambda: FunctionProvider("brevo", brevo_send),
+        "smtp": SmtpProvider,
+    }
+    unknown = [name for name in names if name not in factories]
+    if unknown:
+        raise ValueError(f"Unknown delivery provider(s): {', '.join(unknown)}")
+    return ProviderRouter([factories[name]() for name in names])
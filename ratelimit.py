@@ -0,0 +1,145 @@
+"""
+Client-side rate limiting for outbound provider calls.
+
+A token bucket shared by every worker thread in the process. When the
+provider answers 429 the bucket halves its rate and pauses for as long as
+Retry-After (or Brevo's x-sib-ratelimit-reset) asks, then creeps back up to
+the configured rate one successful call at a time (AIMD).
+"""
+import datetime
+import email.utils
+import os
+import threading
+import time
+
+DEFAULT_RATE = float(os.getenv("BREVO_RATE_LIMIT", 20))
+DEFAULT_BURST = float(os.getenv("BREVO_RATE_BURST", 40))
+
+
+def parse_retry_after(headers):
+    """Returns the number of seconds the provider asked us to wait, or None."""
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            # An HTTP date; anything else falls through to Brevo's own headers.
+            try:
+                parsed = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                parsed = None
+            if parsed is not None:
+                if parsed.tzinfo is None:
+                    parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+                return max(parsed.timestamp() - time.time(), 0.0)
+
+    # Brevo reports its own window: remaining calls and seconds until reset.
+    remaining = headers.get("x-sib-ratelimit-remaining")
+    reset = headers.get("x-sib-ratelimit-reset")
+    if remaining is not None and reset is not None:
+        try:
+            if int(remaining) <= 0:
+                return max(float(reset), 0.0)
+        except ValueError:
+            pass
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=None,
+                 decrease_factor=0.5, recovery_step=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.min_rate = min_rate or max(rate * 0.05, 0.1)
+        self.decrease_factor = decrease_factor
+        self.recovery_step = recovery_step or max(rate * 0.02, 0.01)
+        self.waiting = 0
+        self.throttled = 0
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        if now <= self._last:
+            return
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, timeout=None) -> bool:
+        """Blocks until a call may be made. Returns False if `timeout` ran out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now >= self._paused_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    wait = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.001)
+                    if deadline is not None:
+                        if now >= deadline:
+                            return False
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self):
+        """acquire() for the asyncio server: sleeps on the event loop instead of blocking a thread."""
+        import asyncio
+
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.001)
+                self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                with self._cond:
+                    self.waiting -= 1
+
+    def on_success(self, headers=None):
+        """Records an accepted call and nudges the rate back toward the configured maximum."""
+        pause = parse_retry_after(headers) if headers is not None else None
+        with self._cond:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.recovery_step)
+            if pause:
+                self._pause(pause)
+
+    def on_rate_limited(self, headers=None):
+        """Records a 429: shrink the rate and hold every caller until the provider's window resets."""
+        pause = parse_retry_after(headers) if headers is not None else None
+        with self._cond:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._pause(pause if pause is not None else 1.0 / self.rate)
+
+    def _pause(self, seconds):
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._last = self._paused_until
+        self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 3),
+                "waiting": self.waiting,
+                "throttled": self.throttled,
+                "paused_for": round(max(self._paused_until - time.monotonic(), 0.0), 3),
+            }
@@ -0,0 +1,160 @@
+"""
+Headless bulk reminder run: no LLM in the loop.
+
+Scans the policy index for policies expiring in a window, builds each ICS
+attachment in a process pool, and streams the emails through EmailClient on a
+bounded thread pool. Every delivered reminder is appended to a checkpoint
+file, so an interrupted run can be restarted with the same arguments and will
+only send what is left. Each send also carries an idempotency key derived
+from the policy and its expiration date, so the web service drops any
+duplicate that slips through.
+
+    python reminders.py --days 30 --checkpoint reminders-2026-10.jsonl
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import sys
+import time
+
+import dates
+import ics
+import policy_index
+from email_client import EmailClient
+
+SUBJECT_TEMPLATE = "Reminder: your policy {policy_id} expires on {date}"
+BODY_TEMPLATE = (
+    "<p>Dear {holder},</p>"
+    "<p>Your insurance policy <b>{policy_id}</b> expires on <b>{date}</b>. "
+    "A calendar reminder is attached.</p>"
+)
+
+
+def reminder_key(record) -> str:
+    return f"reminder:{record['policy_id']}:{record['expiration_date']}"
+
+
+def build_reminder(record) -> dict:
+    """Builds one reminder email (runs in a worker process)."""
+    expires = dates.resolve_start(record["expiration_date"])
+    date_text = expires.strftime(dates.FORMAL_FORMAT)
+    event_name = f"Policy {record['policy_id']} expires"
+    return {
+        "key": reminder_key(record),
+        "recipient_email": record["email"],
+        "subject": SUBJECT_TEMPLATE.format(policy_id=record["policy_id"], date=date_text),
+        "body_html": BODY_TEMPLATE.format(holder=record["holder"] or "customer",
+                                          policy_id=record["policy_id"], date=date_text),
+        "attachment_content": ics.build_calendar_b64([(event_name, expires)]),
+        "attachment_name": ics.attachment_name(event_name),
+    }
+
+
+class Checkpoint:
+    """Append-only JSON-lines record of reminders that were delivered."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        self.done.add(json.loads(line)["key"])
+        self._file = open(path, "a")
+
+    def record(self, key, result):
+        self.done.add(key)
+        self._file.write(json.dumps({"key": key, "result": result, "at": time.time()}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run(records, client, checkpoint, processes=None, workers=16, dry_run=False):
+    """Sends a reminder for every record not already in the checkpoint. Returns counters."""
+    stats = {"skipped": 0, "no_email": 0, "sent": 0, "failed": 0}
+    pending = []
+    for record in records:
+        if reminder_key(record) in checkpoint.done:
+            stats["skipped"] += 1
+        elif not record.get("email"):
+            stats["no_email"] += 1
+        else:
+            pending.append(record)
+
+    def send(message):
+        if dry_run:
+            return message["key"], {"dry_run": True}
+        result = client.send_email(
+            recipient_email=message["recipient_email"],
+            subject=message["subject"],
+            body_html=message["body_html"],
+            attachment_content=message["attachment_content"],
+            attachment_name=message["attachment_name"],
+            idempotency_key=message["key"],
+        )
+        return message["key"], result
+
+    def collect(futures):
+        for future in futures:
+            key, result = future.result()
+            if "error" in result:
+                stats["failed"] += 1
+                print(f"Failed {key}: {result['error']}", file=sys.stderr)
+            else:
+                stats["sent"] += 1
+                if not dry_run:
+                    checkpoint.record(key, result)
+
+    max_in_flight = workers * 2
+    with concurrent.futures.ProcessPoolExecutor(processes) as builders, \
+            concurrent.futures.ThreadPoolExecutor(workers) as senders:
+        in_flight = set()
+        for message in builders.map(build_reminder, pending, chunksize=64):
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(senders.submit(send, message))
+        collect(concurrent.futures.as_completed(in_flight))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send reminders for policies expiring soon")
+    parser.add_argument("--days", type=int, default=30, help="Window size, starting today (default: 30)")
+    parser.add_argument("--start", help="Window start date (overrides today)")
+    parser.add_argument("--end", help="Window end date (overrides --days)")
+    parser.add_argument("--index-path", default=policy_index.DEFAULT_INDEX_PATH)
+    parser.add_argument("--checkpoint", default="reminders-checkpoint.jsonl")
+    parser.add_argument("--host", default="34.136.30.136", help="send_mail_ws host")
+    parser.add_argument("--port", type=int, default=8080, help="send_mail_ws port")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent sends")
+    parser.add_argument("--processes", type=int, default=None, help="ICS builder processes (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="Build everything but do not send")
+    args = parser.parse_args()
+
+    start = dates.resolve(args.start).date() if args.start else dates.today().date()
+    end = dates.resolve(args.end).date() if args.end else start + datetime.timedelta(days=args.days)
+
+    index = policy_index.PolicyIndex(args.index_path)
+    records = index.expiring_between(start, end)
+    print(f"{len(records)} policies expire between {start} and {end}")
+
+    checkpoint = Checkpoint(args.checkpoint)
+    began = time.perf_counter()
+    try:
+        stats = run(records, EmailClient(args.host, args.port, pool_size=args.workers), checkpoint,
+                    processes=args.processes, workers=args.workers, dry_run=args.dry_run)
+    finally:
+        checkpoint.close()
+    elapsed = time.perf_counter() - began
+    rate = stats["sent"] / elapsed * 3600 if elapsed else 0.0
+    print(json.dumps({**stats, "seconds": round(elapsed, 2), "per_hour": round(rate)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Bounded reading of /send-email request bodies.
+
+Bodies may arrive with Content-Encoding: gzip (EmailClient compresses large
+ones). They are read from the request stream in chunks and decompressed
+incrementally, and reading stops with BodyTooLarge as soon as the
+decompressed size passes the limit, so a small compressed body cannot
+inflate into an arbitrarily large one.
+"""
+import os
+import zlib
+
+MAX_BODY_BYTES = int(os.getenv("SEND_MAX_BODY_BYTES", 32 * 1024 * 1024))
+CHUNK_SIZE = 256 * 1024
+
+
+class BodyTooLarge(ValueError):
+    pass
+
+
+class BodyReader:
+    """Accumulates body chunks, gunzipping them if needed, up to max_bytes."""
+
+    def __init__(self, content_encoding=None, max_bytes=MAX_BODY_BYTES, content_length=None):
+        encoding = (content_encoding or "identity").strip().lower()
+        if encoding not in ("identity", "gzip"):
+            raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+        # Uncompressed bodies can be refused from Content-Length alone, before reading anything.
+        if encoding == "identity" and content_length and content_length > max_bytes:
+            raise BodyTooLarge(f"Request body exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._parts = []
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding == "gzip" else None
+
+    def feed(self, chunk: bytes):
+        if not chunk:
+            return
+        if self._decompressor is None:
+            self._append(chunk)
+            return
+        try:
+            # max_length keeps each step bounded; whatever did not fit waits in unconsumed_tail.
+            data = self._decompressor.decompress(chunk, self.max_bytes - self.size + 1)
+            self._append(data)
+            while self._decompressor.unconsumed_tail:
+                data = self._decompressor.decompress(self._decompressor.unconsumed_tail,
+                                                     self.max_bytes - self.size + 1)
+                self._append(data)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip request body: {e}") from e
+
+    def _append(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise BodyTooLarge(f"Request body exceeds {self.max_bytes} bytes")
+        if data:
+            self._parts.append(data)
+
+    def finish(self) -> bytes:
+        if self._decompressor is not None and not self._decompressor.eof:
+            raise ValueError("Truncated gzip request body")
+        parts, self._parts = self._parts, []
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+
+def read_body(stream, content_encoding=None, content_length=None, max_bytes=MAX_BODY_BYTES) -> bytes:
+    """Reads a whole body from a file-like stream. Raises BodyTooLarge, or ValueError for bad encodings."""
+    reader = BodyReader(content_encoding, max_bytes, content_length)
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        reader.feed(chunk)
+    return reader.finish()
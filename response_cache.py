@@ -0,0 +1,217 @@
+"""
+Opt-in response cache in front of root_agent (RESPONSE_CACHE=on).
+
+Two layers, both TTL+LRU bounded and hooked in through ADK callbacks:
+
+- Answers: the final text of a turn is stored under (user, day, normalized
+  intent of the prompt). A repeat of the same question from the same user is
+  answered straight from before_agent_callback, with no model or tool calls.
+  Only the first turn of a session is cached or served, since later turns
+  depend on the conversation so far.
+- Read-only tool results: lookup_policy_expiration and friends are cached
+  by (tool, day, arguments) and served from before_tool_callback, which also
+  speeds up turns that still go to the model. Search results already have
+  their own cache in search_cache.py.
+
+A turn that called a side-effecting tool (send_email, create_calendar_event,
+create_calendar_events) or got a tool error is never stored, so a cache hit
+can never stand in for an email or calendar event that should be created.
+"""
+import collections
+import datetime
+import json
+import os
+import re
+import threading
+import time
+
+try:
+    from .agent_trace import DEFAULT_TURN_TIMEOUT_SECONDS, when_invocation_ends
+except ImportError:
+    from agent_trace import DEFAULT_TURN_TIMEOUT_SECONDS, when_invocation_ends
+
+DEFAULT_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300))
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+
+SIDE_EFFECT_TOOLS = frozenset({"send_email", "create_calendar_event", "create_calendar_events"})
+READ_ONLY_TOOLS = frozenset({"lookup_policy_expiration", "list_expiring_policies"})
+
+# Words that change the phrasing but not the question.
+_FILLER_WORDS = frozenset({
+    "a", "an", "the", "please", "pls", "hi", "hello", "hey", "thanks", "thank", "you", "can", "could", "would",
+    "tell", "me", "let", "know", "i", "want", "to", "like", "kindly", "just",
+})
+_NON_WORD_RE = re.compile(r"[^\w\-]+")
+
+
+def normalize_intent(text: str) -> str:
+    """Case-folds, drops punctuation and filler words: "Hey, when does my policy expire?" -> "when does my policy expire"."""
+    words = _NON_WORD_RE.sub(" ", text.casefold()).split()
+    return " ".join(word for word in words if word not in _FILLER_WORDS)
+
+
+class _TtlLru:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[0]:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+class _Turn:
+    def __init__(self, key):
+        self.key = key
+        self.started = time.monotonic()
+        self.cacheable = key is not None
+        self.answer = None
+        self.served_calls = set()
+
+
+class ResponseCache:
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 turn_timeout=DEFAULT_TURN_TIMEOUT_SECONDS):
+        self.turn_timeout = turn_timeout
+        self.answers = _TtlLru(ttl, max_entries)
+        self.tools = _TtlLru(ttl, max_entries)
+        self._turns = {}
+        self._lock = threading.Lock()
+
+    def callbacks(self) -> dict:
+        """Keyword arguments for Agent(...)."""
+        return {
+            "before_agent_callback": self.before_agent,
+            "after_agent_callback": self.after_agent,
+            "after_model_callback": self.after_model,
+            "before_tool_callback": self.before_tool,
+            "after_tool_callback": self.after_tool,
+        }
+
+    def invalidate(self):
+        self.answers.clear()
+        self.tools.clear()
+
+    def stats(self) -> dict:
+        return {"answers": self.answers.stats(), "tools": self.tools.stats()}
+
+    def _turn(self, context):
+        with self._lock:
+            return self._turns.get(context.invocation_id)
+
+    # --- Answers ---
+    def _answer_key(self, callback_context):
+        content = callback_context.user_content
+        text = " ".join(part.text for part in (content.parts if content else []) or [] if part.text)
+        intent = normalize_intent(text)
+        # Only a session's opening question is self-contained; later turns lean on the conversation.
+        prior_turns = [event for event in callback_context.session.events
+                       if event.author == "user" and event.invocation_id != callback_context.invocation_id]
+        if not intent or prior_turns:
+            return None
+        return json.dumps([callback_context.user_id, datetime.date.today().isoformat(), intent])
+
+    def before_agent(self, callback_context):
+        key = self._answer_key(callback_context)
+        if key is not None:
+            answer = self.answers.get(key)
+            if answer is not None:
+                from google.genai import types
+                return types.Content(role="model", parts=[types.Part(text=answer)])
+        cutoff = time.monotonic() - self.turn_timeout
+        with self._lock:
+            # Turns that never reached after_agent and were not collected yet; nothing of theirs is stored.
+            for invocation_id in [i for i, turn in self._turns.items() if turn.started < cutoff]:
+                del self._turns[invocation_id]
+            self._turns[callback_context.invocation_id] = _Turn(key)
+        # ADK skips after_agent when a turn raises or is ended early; drop the turn with its invocation.
+        when_invocation_ends(callback_context, self._forget, callback_context.invocation_id)
+        return None
+
+    def _forget(self, invocation_id):
+        with self._lock:
+            self._turns.pop(invocation_id, None)
+
+    def after_model(self, callback_context, llm_response):
+        turn = self._turn(callback_context)
+        content = llm_response.content
+        if turn is None or content is None or llm_response.partial or not content.parts:
+            return None
+        # The last model reply without function calls is the turn's answer.
+        if not any(part.function_call for part in content.parts):
+            text = "".join(part.text for part in content.parts if part.text and not part.thought)
+            if text:
+                turn.answer = text
+        return None
+
+    def after_agent(self, callback_context):
+        with self._lock:
+            turn = self._turns.pop(callback_context.invocation_id, None)
+        if turn is not None and turn.cacheable and turn.answer:
+            self.answers.put(turn.key, turn.answer)
+        return None
+
+    # --- Read-only tool results ---
+    @staticmethod
+    def _tool_key(tool, args):
+        return json.dumps([tool.name, datetime.date.today().isoformat(), args], sort_keys=True, default=str)
+
+    def before_tool(self, tool, args, tool_context):
+        turn = self._turn(tool_context)
+        if tool.name in SIDE_EFFECT_TOOLS:
+            if turn is not None:
+                turn.cacheable = False
+            return None
+        if tool.name not in READ_ONLY_TOOLS:
+            return None
+        result = self.tools.get(self._tool_key(tool, args))
+        if result is not None and turn is not None:
+            turn.served_calls.add(tool_context.function_call_id)
+        return result
+
+    def after_tool(self, tool, args, tool_context, tool_response):
+        turn = self._turn(tool_context)
+        failed = isinstance(tool_response, dict) and "error" in tool_response
+        if failed and turn is not None:
+            turn.cacheable = False
+        if (tool.name in READ_ONLY_TOOLS and not failed and tool_response
+                and (turn is None or tool_context.function_call_id not in turn.served_calls)):
+            self.tools.put(self._tool_key(tool, args), tool_response)
+        return None
+
+
+def cache_from_env():
+    """Returns a ResponseCache when RESPONSE_CACHE is on, else None."""
+    if os.getenv("RESPONSE_CACHE", "off").lower() in ("1", "on", "true", "yes"):
+        return ResponseCache()
+    return None
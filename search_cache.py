@@ -0,0 +1,243 @@
+"""
+Result cache in front of Vertex AI Search policy lookups.
+
+VertexAiSearchTool is a model built-in: Gemini runs the retrieval itself on
+every turn, so there is nothing on our side to cache. CachedVertexSearchTool
+replaces it with a function tool that queries the same data store through the
+Discovery Engine search API (the same call ADK's DiscoveryEngineSearchTool
+makes) and keeps results in a TTL+LRU cache keyed by the normalized query.
+
+Set SEARCH_CACHE_PATH to share results between processes through a SQLite
+file; expired rows are pruned as it is written, and it holds at most
+SEARCH_CACHE_DISK_MAX_ENTRIES rows. After the data store is re-indexed, run
+
+    python search_cache.py --invalidate
+
+or call invalidate() so nobody is served stale results. Invalidating bumps a
+generation number in the file; every process sharing it checks that number
+on each lookup and drops its in-memory entries when it has moved. Without
+SEARCH_CACHE_PATH the cache is per process and only invalidate() clears it.
+"""
+import collections
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from google.adk.tools import FunctionTool
+
+DEFAULT_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", 900))
+DEFAULT_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 1024))
+DEFAULT_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH") or None
+# The SQLite file is shared and outlives processes, so it gets its own row cap.
+DEFAULT_DISK_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_DISK_MAX_ENTRIES", 10000))
+# Expired and overflow rows are deleted once every this many puts.
+PRUNE_EVERY = 64
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case-folds, collapses whitespace and drops trailing punctuation."""
+    return _WHITESPACE_RE.sub(" ", query.casefold()).strip().rstrip("?!.").strip()
+
+
+# --- Search Backends ---
+class DiscoveryEngineBackend:
+    """Queries a Vertex AI Search data store through ADK's DiscoveryEngineSearchTool."""
+
+    def __init__(self, data_store_id, max_results=None):
+        self.data_store_id = data_store_id
+        self.max_results = max_results
+        self._tool = None
+
+    def search(self, query: str) -> dict:
+        if self._tool is None:
+            from google.adk.tools.discovery_engine_search_tool import DiscoveryEngineSearchTool
+            self._tool = DiscoveryEngineSearchTool(data_store_id=self.data_store_id, max_results=self.max_results)
+        return self._tool.discovery_engine_search(query)
+
+
+class FakeSearchBackend:
+    """
+    Offline stand-in that matches query words against in-memory documents.
+
+    documents: list of {"title": ..., "url": ..., "content": ...} dicts.
+    """
+
+    def __init__(self, documents=None):
+        self.documents = documents or []
+        self.search_count = 0
+
+    def search(self, query: str) -> dict:
+        self.search_count += 1
+        words = set(normalize_query(query).split())
+        results = [doc for doc in self.documents
+                   if words & set(normalize_query(f"{doc.get('title', '')} {doc.get('content', '')}").split())]
+        return {"status": "success", "results": results}
+
+
+# --- Cache ---
+class SearchCache:
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES, path=DEFAULT_CACHE_PATH,
+                 disk_max_entries=DEFAULT_DISK_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._generation = 0
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS search_cache_expires_at ON search_cache (expires_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache_meta (name TEXT PRIMARY KEY, value INTEGER)"
+            )
+            self._conn.execute("INSERT OR IGNORE INTO search_cache_meta (name, value) VALUES ('generation', 0)")
+            self._generation = self._read_generation()
+            self.prune()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            if self._conn is not None:
+                # Another process ran invalidate(): what this one holds in memory is stale.
+                generation = self._read_generation()
+                if generation != self._generation:
+                    self._entries.clear()
+                    self._generation = generation
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[0]:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT expires_at, value FROM search_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[1])
+                    self._insert_locked(key, row[0], value)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._insert_locked(key, expires_at, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps(value)),
+                )
+                self._puts += 1
+                if self._puts % PRUNE_EVERY == 0:
+                    self._prune_locked()
+
+    def prune(self):
+        """Deletes expired rows from the SQLite file and keeps it to `disk_max_entries` rows."""
+        if self._conn is not None:
+            with self._lock:
+                self._prune_locked()
+
+    def _prune_locked(self):
+        self._conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+        # Every row gets the same TTL, so the soonest to expire are also the oldest.
+        self._conn.execute(
+            "DELETE FROM search_cache WHERE key IN "
+            "(SELECT key FROM search_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,),
+        )
+
+    def _read_generation(self):
+        return self._conn.execute("SELECT value FROM search_cache_meta WHERE name = 'generation'").fetchone()[0]
+
+    def _insert_locked(self, key, expires_at, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drops every cached result, in memory and on disk, for every process sharing the file."""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("DELETE FROM search_cache")
+                self._conn.execute("UPDATE search_cache_meta SET value = value + 1 WHERE name = 'generation'")
+                self._generation = self._read_generation()
+                self._conn.execute("COMMIT")
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+
+class CachedVertexSearchTool(FunctionTool):
+    """Function tool that answers repeated Vertex AI Search queries from a SearchCache."""
+
+    def __init__(self, data_store_id=None, backend=None, cache=None, max_results=None):
+        super().__init__(self.vertex_ai_search)
+        if backend is None:
+            if data_store_id is None:
+                raise ValueError("Either data_store_id or backend must be specified.")
+            backend = DiscoveryEngineBackend(data_store_id, max_results=max_results)
+        self.backend = backend
+        self.cache = cache if cache is not None else SearchCache()
+
+    def vertex_ai_search(self, query: str) -> dict:
+        """Searches the insurance policy data store.
+
+        Args:
+          query: What to look for, e.g. a customer name or policy number.
+
+        Returns:
+          A dictionary with the status of the request and a list of results,
+          each with a title, url and content.
+        """
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = self.backend.search(query)
+        # Errors are not cached so the next turn tries the backend again.
+        if result.get("status") == "success":
+            self.cache.put(key, result)
+        return result
+
+    def invalidate(self):
+        self.cache.invalidate()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the shared search result cache")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help="SQLite cache file (default: SEARCH_CACHE_PATH)")
+    parser.add_argument("--invalidate", action="store_true", help="Drop all cached results, e.g. after re-indexing")
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error("--path or SEARCH_CACHE_PATH is required")
+    cache = SearchCache(path=args.path)
+    if args.invalidate:
+        cache.invalidate()
+        print(f"Invalidated search cache at {args.path}")
@@ -0,0 +1,275 @@
+"""
+Asyncio variant of send_mail_ws.
+
+Same /send-email and /send-email/batch request and response contract, with
+the same idempotency cache, rate limiter, retry policy and /metrics, but
+served from an ASGI event loop with an async HTTP client, so an in-flight
+Brevo call costs a coroutine instead of a worker thread.
+MAX_UPSTREAM_CONCURRENCY bounds how many Brevo calls can be outstanding at
+once. Queued mode and provider failover stay Flask-only.
+
+Run with `python send_mail_ws.py --server async` or `uvicorn send_mail_async:app`.
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import time
+import uuid
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from brevo_api import (ATTACHMENT_TOO_LARGE_ERROR, BREVO_URL, UpstreamAttempts, batch_results, brevo_headers,
+                       build_batch_payloads, build_payload, encode_payload, with_idempotency_key)
+from credentials import get_brevo_api_key, refresh_brevo_api_key
+from idempotency import IdempotencyCache, chunk_key, request_key, should_cache, supplied_key
+import metrics
+from ratelimit import TokenBucket
+from request_body import BodyReader, BodyTooLarge
+import templates
+
+MAX_UPSTREAM_CONCURRENCY = int(os.getenv("MAX_UPSTREAM_CONCURRENCY", 200))
+CONNECT_TIMEOUT = float(os.getenv("BREVO_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("BREVO_READ_TIMEOUT", 20))
+RETRIES = int(os.getenv("BREVO_RETRIES", 3))
+
+# The same process-wide quota and dedup as send_mail_ws.
+brevo_rate_limiter = TokenBucket()
+idempotency_cache = IdempotencyCache()
+
+metrics.REGISTRY.gauge("send_mail_rate_limit", "Adaptive rate limiter state.", lambda: brevo_rate_limiter.stats())
+metrics.REGISTRY.gauge("send_mail_idempotency", "Idempotency cache counters.", lambda: idempotency_cache.stats())
+
+
+class AsyncBrevoClient:
+    """Shared httpx client plus the semaphore that caps upstream concurrency."""
+
+    def __init__(self, max_concurrency=MAX_UPSTREAM_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        # No transport-level retries: post_to_brevo resends, taking a rate-limit token each time.
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+
+    async def post(self, url, body, headers):
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                return await self.client.post(url, content=body, headers=headers)
+            finally:
+                self.in_flight -= 1
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+async def post_to_brevo(brevo, body, headers):
+    """One rate-limited Brevo call; the async twin of send_mail_ws.post_to_brevo."""
+    attempts = UpstreamAttempts(brevo_rate_limiter, RETRIES)
+    while True:
+        with metrics.stage("rate_limit_wait"):
+            await brevo_rate_limiter.acquire_async()
+        try:
+            with metrics.stage("brevo_call"):
+                resp = await brevo.post(BREVO_URL, body, headers)
+        except httpx.HTTPError as e:
+            delay = attempts.after_error(isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)))
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        delay = attempts.after_response(resp.status_code, resp.headers)
+        if delay is None:
+            return resp
+        await asyncio.sleep(delay)
+
+
+async def deliver(brevo, payload, key=None):
+    """Sends a prepared payload through Brevo, with `key` as its idempotencyKey. Returns (response_body, status_code)."""
+    # The key is cached, so this only blocks on a cold start; keep it off the loop anyway.
+    try:
+        with metrics.stage("key_fetch"):
+            api_key = await asyncio.to_thread(get_brevo_api_key)
+    except Exception as e:
+        return {"error": f"Failed to retrieve API key: {str(e)}"}, 500
+
+    headers = brevo_headers(api_key)
+    with metrics.stage("encode_payload"):
+        body = encode_payload(with_idempotency_key(payload, key))
+    try:
+        resp = await post_to_brevo(brevo, body, headers)
+
+        # A 401 usually means the key was rotated; fetch the new one and retry once.
+        if resp.status_code == 401:
+            metrics.UPSTREAM_RETRIES.inc(reason="auth")
+            try:
+                with metrics.stage("key_fetch"):
+                    headers["api-key"] = await asyncio.to_thread(refresh_brevo_api_key)
+            except Exception as e:
+                return {"error": f"Failed to retrieve API key: {str(e)}"}, 500
+            resp = await post_to_brevo(brevo, body, headers)
+    except httpx.HTTPError as e:
+        metrics.UPSTREAM_RESPONSES.inc(status=type(e).__name__)
+        return {"error": f"Brevo request failed: {str(e)}"}, 502
+
+    if resp.status_code < 400:
+        return resp.json(), 200
+    else:
+        return {"error": resp.text}, resp.status_code
+
+
+async def deliver_once(brevo, key, payload):
+    """deliver() behind the idempotency cache. Returns (response_body, status_code, replayed)."""
+    cached = await idempotency_cache.begin_async(key)
+    if cached is not None:
+        return cached[0], cached[1], True
+    try:
+        body, status_code = await deliver(brevo, payload, key)
+    except BaseException:
+        idempotency_cache.release(key)
+        raise
+    if should_cache(status_code):
+        idempotency_cache.complete(key, (body, status_code))
+    else:
+        idempotency_cache.release(key)
+    return body, status_code, False
+
+
+async def read_json_request(request):
+    """
+    Reads the (optionally gzip-compressed) body within SEND_MAX_BODY_BYTES.
+    Returns (data, error_response), like send_mail_ws.read_json_request.
+    """
+    try:
+        content_length = request.headers.get('content-length')
+        reader = BodyReader(request.headers.get('content-encoding'),
+                            content_length=int(content_length) if content_length else None)
+        async for chunk in request.stream():
+            reader.feed(chunk)
+        body = reader.finish()
+    except BodyTooLarge as e:
+        return None, JSONResponse({"error": str(e)}, status_code=413)
+    except ValueError as e:
+        return None, JSONResponse({"error": str(e)}, status_code=400)
+    try:
+        return json.loads(body), None
+    except ValueError:
+        return None, None
+
+
+def traced(endpoint):
+    """Gives each request a trace id and records it in /metrics, as send_mail_ws does in its request hooks."""
+    @functools.wraps(endpoint)
+    async def wrapper(request):
+        trace_id = request.headers.get('x-trace-id') or uuid.uuid4().hex
+        started = time.perf_counter()
+        metrics.start_trace(trace_id)
+        response = await endpoint(request)
+        content_length = request.headers.get('content-length')
+        metrics.finish_request(endpoint.__name__, response.status_code,
+                               int(content_length) if content_length else None, time.perf_counter() - started)
+        response.headers['X-Trace-Id'] = trace_id
+        return response
+    return wrapper
+
+
+@traced
+async def send_email_endpoint(request):
+    # 1. Read and parse the body
+    with metrics.stage("json_parse"):
+        data, error_response = await read_json_request(request)
+    if error_response is not None:
+        return error_response
+
+    # 2. Validate required fields and build the Brevo payload
+    with metrics.stage("build_payload"):
+        payload, error = build_payload(data)
+    if error:
+        return JSONResponse({"error": error}, status_code=413 if error == ATTACHMENT_TOO_LARGE_ERROR else 400)
+
+    # 3. Execute request; duplicates of a recent send get the original response back.
+    caller_key, error = supplied_key(request.headers.get('idempotency-key'), data)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    key = request_key(caller_key, data, payload)
+    body, status_code, replayed = await deliver_once(request.app.state.brevo, key, payload)
+    return JSONResponse(body, status_code=status_code,
+                        headers={'Idempotent-Replayed': 'true'} if replayed else None)
+
+
+@traced
+async def send_email_batch_endpoint(request):
+    """Same contract as send_mail_ws.send_email_batch_endpoint; the upstream calls run concurrently."""
+    with metrics.stage("json_parse"):
+        data, error_response = await read_json_request(request)
+    if error_response is not None:
+        return error_response
+    data = data if isinstance(data, dict) else {}
+    messages = data.get('messages')
+    if not isinstance(messages, list) or not messages:
+        return JSONResponse({"error": "Missing required field: messages (a non-empty list)"}, status_code=400)
+
+    caller_key, error = supplied_key(request.headers.get('idempotency-key'), data)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+
+    with metrics.stage("build_payload"):
+        chunks, errors = build_batch_payloads(messages)
+
+    brevo = request.app.state.brevo
+    sent = await asyncio.gather(*(deliver_once(brevo, chunk_key(caller_key, number, payload), payload)
+                                  for number, (payload, indexes) in enumerate(chunks)))
+    replayed = sum(1 for _, _, was_replayed in sent if was_replayed)
+
+    results = batch_results(messages, errors, chunks, [(body, status_code) for body, status_code, _ in sent])
+    return JSONResponse({"results": results, "upstream_requests": len(chunks) - replayed}, status_code=200,
+                        headers={'Idempotent-Replayed': 'true'} if chunks and replayed == len(chunks) else None)
+
+
+async def send_email_status_endpoint(request):
+    return JSONResponse({"error": "Queued mode is not enabled"}, status_code=404)
+
+
+async def metrics_endpoint(request):
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+async def rate_limit_stats_endpoint(request):
+    stats = brevo_rate_limiter.stats()
+    stats["queue_depth"] = 0
+    return JSONResponse(stats)
+
+
+async def upstream_stats_endpoint(request):
+    brevo = request.app.state.brevo
+    return JSONResponse({"in_flight": brevo.in_flight, "max_concurrency": brevo.max_concurrency})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    templates.get_registry()
+    app.state.brevo = AsyncBrevoClient()
+    try:
+        yield
+    finally:
+        await app.state.brevo.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/send-email', send_email_endpoint, methods=['POST']),
+        Route('/send-email/batch', send_email_batch_endpoint, methods=['POST']),
+        Route('/send-email/{message_id}', send_email_status_endpoint, methods=['GET']),
+        Route('/metrics', metrics_endpoint, methods=['GET']),
+        Route('/rate-limit-stats', rate_limit_stats_endpoint, methods=['GET']),
+        Route('/upstream-stats', upstream_stats_endpoint, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
@@ -1,68 +1,314 @@
+import json
 import os
+import time
+import uuid
 import requests
-from flask import Flask, request, jsonify
-from google.cloud import secretmanager
+from flask import Flask, Response, g, request, jsonify
+
+from brevo_api import (ATTACHMENT_TOO_LARGE_ERROR, BREVO_URL, UpstreamAttempts, batch_results, brevo_headers,
+                       build_batch_payloads, build_payload, encode_payload, with_idempotency_key)
+from credentials import get_brevo_api_key, refresh_brevo_api_key
+from idempotency import IdempotencyCache, chunk_key, request_key, should_cache, supplied_key
+import metrics
+from providers import build_router
+from ratelimit import TokenBucket
+from request_body import BodyTooLarge, read_body
+import templates
+from transport import PooledTransport, is_connect_error
 
 app = Flask(__name__)
 GOOGLE_CLOUD_PROJECT="qwiklabs-gcp-01-3bb38adc87a2"
-def get_brevo_api_key():
-    """Retrieves the API key from Google Secret Manager."""
-    client = secretmanager.SecretManagerServiceClient()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    secret_path = f"projects/{project_id}/secrets/BREVO_API_KEY/versions/latest"
-    
-    response = client.access_secret_version(request={"name": secret_path})
-    return response.payload.data.decode("UTF-8")
+
+# Compile the email templates now, so a broken EMAIL_TEMPLATE_DIR fails at startup rather than on a send.
+templates.get_registry()
+
+# One keep-alive session shared by every request handled by this process.
+brevo_transport = PooledTransport()
+
+# Shared by every worker thread so the process as a whole stays under the plan's quota.
+brevo_rate_limiter = TokenBucket()
+
+# Remembers recent responses so a repeated send is answered without calling Brevo.
+idempotency_cache = IdempotencyCache()
+
+# Set by enable_queue() when the service runs in queued mode.
+outbox = None
+outbox_workers = None
+
+metrics.REGISTRY.gauge("send_mail_transport", "Brevo connection pool counters.", lambda: brevo_transport.stats())
+metrics.REGISTRY.gauge("send_mail_rate_limit", "Adaptive rate limiter state.", lambda: brevo_rate_limiter.stats())
+metrics.REGISTRY.gauge("send_mail_idempotency", "Idempotency cache counters.", lambda: idempotency_cache.stats())
+metrics.REGISTRY.gauge("send_mail_queue_depth", "Messages waiting in the outbox.",
+                       lambda: outbox.depth() if outbox is not None else 0)
+
+def post_to_brevo(url, body, headers, delivery=None):
+    """
+    One rate-limited Brevo call (body is the encoded JSON); every attempt takes
+    a token from the bucket, and brevo_api.UpstreamAttempts decides which
+    failures are resent. With a providers.Delivery, the message is claimed
+    right before each POST so a hedged provider cannot also send it.
+    """
+    attempts = UpstreamAttempts(brevo_rate_limiter, brevo_transport.retries, backoff=brevo_transport.backoff)
+    while True:
+        with metrics.stage("rate_limit_wait"):
+            brevo_rate_limiter.acquire()
+        if delivery is not None:
+            delivery.claim("brevo")
+        try:
+            with metrics.stage("brevo_call"):
+                resp = brevo_transport.post(url, data=body, headers=headers)
+        except requests.exceptions.RequestException as e:
+            connect_error = is_connect_error(e)
+            if delivery is not None:
+                # Only a failed connect proves nothing was sent; after a read timeout Brevo may have the message.
+                delivery.settle("brevo", not connect_error)
+            delay = attempts.after_error(connect_error)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        if delivery is not None:
+            delivery.settle("brevo", resp.status_code < 400)
+        delay = attempts.after_response(resp.status_code, resp.headers)
+        if delay is None:
+            return resp
+        time.sleep(delay)
+
+def deliver_brevo(payload, delivery=None):
+    """Sends a prepared payload through Brevo. Returns (response_body, status_code)."""
+    try:
+        with metrics.stage("key_fetch"):
+            api_key = get_brevo_api_key()
+    except Exception as e:
+        return {"error": f"Failed to retrieve API key: {str(e)}"}, 500
+
+    url = BREVO_URL
+    headers = brevo_headers(api_key)
+    if delivery is not None:
+        payload = with_idempotency_key(payload, delivery.key)
+    # Encoded once, so retries below resend the same bytes.
+    with metrics.stage("encode_payload"):
+        body = encode_payload(payload)
+
+    try:
+        resp = post_to_brevo(url, body, headers, delivery)
+
+        # A 401 usually means the key was rotated; fetch the new one and retry once.
+        if resp.status_code == 401:
+            metrics.UPSTREAM_RETRIES.inc(reason="auth")
+            try:
+                with metrics.stage("key_fetch"):
+                    headers["api-key"] = refresh_brevo_api_key()
+            except Exception as e:
+                return {"error": f"Failed to retrieve API key: {str(e)}"}, 500
+            resp = post_to_brevo(url, body, headers, delivery)
+    except requests.exceptions.RequestException as e:
+        metrics.UPSTREAM_RESPONSES.inc(status=type(e).__name__)
+        return {"error": f"Brevo request failed: {str(e)}"}, 502
+
+    if resp.status_code < 400:
+        return resp.json(), 200
+    else:
+        return {"error": resp.text}, resp.status_code
+
+# SEND_PROVIDERS lists delivery backends in priority order, e.g. "brevo,smtp"; the
+# next one is hedged in when the first is slow and takes over when it fails.
+provider_router = build_router(os.environ.get("SEND_PROVIDERS", "brevo").split(","), deliver_brevo)
+metrics.REGISTRY.gauge("send_mail_provider_circuit_open", "1 while a provider's circuit breaker is not closed.",
+                       lambda: {name: int(stats["state"] != "closed")
+                                for name, stats in provider_router.stats().items()})
+
+def deliver(payload, key=None):
+    """Sends a prepared Brevo-format payload via the configured providers. Returns (response_body, status_code)."""
+    return provider_router.send(payload, key)
+
+def enable_queue(path=None, num_workers=None):
+    """Switches /send-email to queued mode: accept to SQLite, deliver from a worker pool."""
+    global outbox, outbox_workers
+    from outbox import DEFAULT_QUEUE_PATH, DEFAULT_WORKERS, Outbox, OutboxWorkers
+
+    outbox = Outbox(path or DEFAULT_QUEUE_PATH)
+    outbox_workers = OutboxWorkers(outbox, deliver, num_workers=num_workers or DEFAULT_WORKERS)
+    outbox_workers.start()
+
+def read_json_request():
+    """
+    Reads the request body, gunzipping it if sent with Content-Encoding: gzip,
+    within SEND_MAX_BODY_BYTES. Returns (data, error_response); data is None
+    for a body that is not valid JSON, as with get_json(silent=True).
+    """
+    try:
+        body = read_body(request.stream, request.headers.get('Content-Encoding'), request.content_length)
+    except BodyTooLarge as e:
+        return None, (jsonify({"error": str(e)}), 413)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    try:
+        return json.loads(body), None
+    except ValueError:
+        return None, None
+
+@app.before_request
+def start_request_trace():
+    # Callers may pass their own X-Trace-Id (EmailClient does); otherwise one is made up.
+    g.trace_id = request.headers.get('X-Trace-Id') or uuid.uuid4().hex
+    g.started = time.perf_counter()
+    metrics.start_trace(g.trace_id)
+
+@app.after_request
+def finish_request_trace(response):
+    metrics.finish_request(request.endpoint or "unknown", response.status_code, request.content_length,
+                           time.perf_counter() - g.started)
+    response.headers['X-Trace-Id'] = g.trace_id
+    return response
 
 @app.route('/send-email', methods=['POST'])
 def send_email_endpoint():
     # 1. Parse incoming JSON data
-    data = request.get_json()
+    with metrics.stage("json_parse"):
+        data, error_response = read_json_request()
+    if error_response is not None:
+        return error_response
     
-    # 2. Validate required fields
-    recipient_email = data.get('recipient_email')
-    subject = data.get('subject')
-    body_html = data.get('body_html')
-    
-    if not all([recipient_email, subject, body_html]):
-        return jsonify({"error": "Missing required fields: recipient_email, subject, or body_html"}), 400
+    # 2. Validate required fields and build the Brevo payload
+    with metrics.stage("build_payload"):
+        payload, error = build_payload(data)
+    if error:
+        return jsonify({"error": error}), 413 if error == ATTACHMENT_TOO_LARGE_ERROR else 400
 
-    # Optional fields
-    attachment_content = data.get('attachment_content', '')
-    attachment_name = data.get('attachment_name', 'event.ics')
+    # 3. Duplicates of a recent send get the original response back.
+    caller_key, error = supplied_key(request.headers.get('Idempotency-Key'), data)
+    if error:
+        return jsonify({"error": error}), 400
+    idempotency_key = request_key(caller_key, data, payload)
+    cached = idempotency_cache.begin(idempotency_key)
+    if cached is not None:
+        body, status_code = cached
+        response = jsonify(body)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response, status_code
 
     try:
-        api_key = get_brevo_api_key()
-    except Exception as e:
-        return jsonify({"error": f"Failed to retrieve API key: {str(e)}"}), 500
-
-    # 3. Prepare Brevo API call
-    url = "https://api.brevo.com/v3/smtp/email"
-    headers = {
-        "accept": "application/json", 
-        "content-type": "application/json", 
-        "api-key": api_key
-    }
-    
-    payload = {
-        "sender": {"name": "AI Agent", "email": "backup@ddintl.com"},
-        "to": [{"email": recipient_email}],
-        "subject": subject,
-        "htmlContent": body_html
-    }
-
-    if attachment_content:
-        payload["attachment"] = [{"name": attachment_name, "content": attachment_content}]
-    
-    # 4. Execute request
-    resp = requests.post(url, json=payload, headers=headers)
-    
-    if resp.status_code < 400:
-        return jsonify(resp.json()), 200
+        # 4. In queued mode, persist and answer right away; the workers do the send.
+        if outbox is not None:
+            message_id = outbox.enqueue(payload, idempotency_key)
+            body, status_code = {"message_id": message_id, "status": "queued"}, 202
+        else:
+            # 5. Execute request
+            body, status_code = deliver(payload, idempotency_key)
+    except Exception:
+        idempotency_cache.release(idempotency_key)
+        raise
+
+    if should_cache(status_code):
+        idempotency_cache.complete(idempotency_key, (body, status_code))
     else:
-        return jsonify({"error": resp.text}), resp.status_code
+        idempotency_cache.release(idempotency_key)
+    return jsonify(body), status_code
+
+@app.route('/send-email/batch', methods=['POST'])
+def send_email_batch_endpoint():
+    """
+    Sends many emails with as few Brevo calls as possible.
+
+    Body: {"messages": [<same fields as /send-email>, ...]}, plus an optional
+    idempotency_key (or Idempotency-Key header); without one, each upstream
+    call is keyed by its content. Returns one result per input message, in
+    input order.
+    """
+    with metrics.stage("json_parse"):
+        data, error_response = read_json_request()
+    if error_response is not None:
+        return error_response
+    data = data if isinstance(data, dict) else {}
+    messages = data.get('messages')
+    if not isinstance(messages, list) or not messages:
+        return jsonify({"error": "Missing required field: messages (a non-empty list)"}), 400
+
+    caller_key, error = supplied_key(request.headers.get('Idempotency-Key'), data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    with metrics.stage("build_payload"):
+        chunks, errors = build_batch_payloads(messages)
+
+    # Each upstream call is deduplicated on its own, so a retried batch only resends the chunks that failed.
+    outcomes = []
+    replayed = 0
+    for number, (payload, indexes) in enumerate(chunks):
+        key = chunk_key(caller_key, number, payload)
+        cached = idempotency_cache.begin(key)
+        if cached is not None:
+            outcomes.append(cached)
+            replayed += 1
+            continue
+        try:
+            if outbox is not None:
+                outcome = {"message_id": outbox.enqueue(payload, key), "status": "queued"}, 202
+            else:
+                outcome = deliver(payload, key)
+        except Exception:
+            idempotency_cache.release(key)
+            raise
+        if should_cache(outcome[1]):
+            idempotency_cache.complete(key, outcome)
+        else:
+            idempotency_cache.release(key)
+        outcomes.append(outcome)
+
+    results = batch_results(messages, errors, chunks, outcomes)
+    response = jsonify({"results": results, "upstream_requests": len(chunks) - replayed})
+    if chunks and replayed == len(chunks):
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response, 202 if outbox is not None else 200
+
+@app.route('/send-email/<message_id>', methods=['GET'])
+def send_email_status_endpoint(message_id):
+    if outbox is None:
+        return jsonify({"error": "Queued mode is not enabled"}), 404
+    record = outbox.get(message_id)
+    if record is None:
+        return jsonify({"error": f"Unknown message id: {message_id}"}), 404
+    return jsonify(record), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/provider-stats', methods=['GET'])
+def provider_stats_endpoint():
+    return jsonify(provider_router.stats()), 200
+
+@app.route('/transport-stats', methods=['GET'])
+def transport_stats_endpoint():
+    return jsonify(brevo_transport.stats()), 200
+
+@app.route('/rate-limit-stats', methods=['GET'])
+def rate_limit_stats_endpoint():
+    stats = brevo_rate_limiter.stats()
+    stats["queue_depth"] = outbox.depth() if outbox is not None else 0
+    return jsonify(stats), 200
 
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Brevo send-email web service")
+    parser.add_argument("--server", choices=["flask", "async"], default=os.environ.get("SERVER_MODE", "flask"),
+                        help="flask: threaded Flask server; async: asyncio/ASGI server (send_mail_async)")
+    parser.add_argument("--queued", action="store_true", default=os.environ.get("SEND_MODE") == "queued",
+                        help="Accept mail into a local SQLite queue and answer 202 (Flask server only)")
+    parser.add_argument("--queue-path", default=None, help="SQLite file for the queue (default: SEND_QUEUE_PATH)")
+    parser.add_argument("--workers", type=int, default=None, help="Queue worker threads (default: SEND_QUEUE_WORKERS)")
+    args = parser.parse_args()
+
+    if args.queued:
+        enable_queue(args.queue_path, args.workers)
+
     # Use PORT env var for Cloud Run compatibility
     port = int(os.environ.get("PORT", 8080))
-    app.run(host='0.0.0.0', port=port)
+    if args.server == "async":
+        import uvicorn
+        uvicorn.run("send_mail_async:app", host='0.0.0.0', port=port)
+    else:
+        app.run(host='0.0.0.0', port=port)
+
@@ -0,0 +1,127 @@
+"""
+Named email templates rendered by the send service.
+
+Instead of writing a full HTML body, a caller passes template_id plus a few
+variables and /send-email renders the subject and body. Templates use
+{{ name }} placeholders; values are HTML-escaped in the body. Each template
+is compiled once into a str.format pattern when the registry is loaded, so a
+render is one format_map call per part.
+
+The built-in templates below can be extended or overridden by dropping
+<template_id>.json files ({"subject": ..., "html": ..., "defaults": {...}})
+into EMAIL_TEMPLATE_DIR.
+"""
+import functools
+import html
+import json
+import os
+import re
+
+DEFAULT_TEMPLATE_DIR = os.getenv("EMAIL_TEMPLATE_DIR") or None
+
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+BUILTIN_TEMPLATES = {
+    "policy_expiration_reminder": {
+        "subject": "Reminder: policy {{ policy_id }} expires on {{ expiration_date }}",
+        "html": (
+            "<p>Hi {{ holder_name }},</p>"
+            "<p>This is a reminder that your policy <strong>{{ policy_id }}</strong> "
+            "expires on <strong>{{ expiration_date }}</strong>.</p>"
+            "<p>A calendar event is attached so you can renew in time.</p>"
+            "<p>Best regards,<br>Your insurance assistant</p>"
+        ),
+        "defaults": {"holder_name": "there"},
+    },
+    "policy_expiration_digest": {
+        "subject": "Reminder: upcoming policy expirations",
+        "html": (
+            "<p>Hi {{ holder_name }},</p>"
+            "<p>The following policies expire soon: {{ policies }}.</p>"
+            "<p>Calendar events for each of them are attached.</p>"
+            "<p>Best regards,<br>Your insurance assistant</p>"
+        ),
+        "defaults": {"holder_name": "there"},
+    },
+}
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class CompiledTemplate:
+    def __init__(self, template_id, subject, html_body, defaults=None):
+        self.template_id = template_id
+        self.defaults = dict(defaults or {})
+        self._subject, subject_names = self._compile(subject)
+        self._html, self._html_names = self._compile(html_body)
+        self.variables = sorted(subject_names | self._html_names)
+        self.required = [name for name in self.variables if name not in self.defaults]
+
+    @staticmethod
+    def _compile(text):
+        """Turns {{ name }} placeholders into a str.format_map pattern. Returns (pattern, names)."""
+        pieces = []
+        names = set()
+        position = 0
+        for match in _PLACEHOLDER_RE.finditer(text):
+            pieces.append(text[position:match.start()].replace("{", "{{").replace("}", "}}"))
+            pieces.append("{" + match.group(1) + "}")
+            names.add(match.group(1))
+            position = match.end()
+        pieces.append(text[position:].replace("{", "{{").replace("}", "}}"))
+        return "".join(pieces), names
+
+    def render(self, variables=None):
+        """Returns (subject, html). Raises TemplateError if a required variable is missing."""
+        merged = self.defaults.copy()
+        if variables:
+            merged.update(variables)
+        for name in self.required:
+            if merged.get(name) in (None, ""):
+                missing = [name for name in self.required if merged.get(name) in (None, "")]
+                raise TemplateError(f"Template {self.template_id!r} is missing variables: {', '.join(missing)}")
+        escaped = {name: html.escape(str(merged[name])) for name in self._html_names}
+        return self._subject.format_map(merged), self._html.format_map(escaped)
+
+
+def _load_directory(directory):
+    definitions = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".json"):
+            with open(os.path.join(directory, filename)) as f:
+                definitions[filename[:-len(".json")]] = json.load(f)
+    return definitions
+
+
+@functools.lru_cache(maxsize=None)
+def get_registry(directory=DEFAULT_TEMPLATE_DIR) -> dict:
+    """Compiles the built-in templates plus any in `directory`, once per process."""
+    definitions = dict(BUILTIN_TEMPLATES)
+    if directory:
+        definitions.update(_load_directory(directory))
+    return {
+        template_id: CompiledTemplate(template_id, definition["subject"], definition["html"],
+                                      definition.get("defaults"))
+        for template_id, definition in definitions.items()
+    }
+
+
+def render(template_id, variables=None):
+    """Renders a named template. Returns (subject, html); raises TemplateError."""
+    template = get_registry().get(template_id)
+    if template is None:
+        raise TemplateError(f"Unknown template: {template_id}")
+    if variables is not None and not isinstance(variables, dict):
+        raise TemplateError("variables must be an object")
+    return template.render(variables)
+
+
+def describe() -> str:
+    """One line per template, e.g. for the agent instruction."""
+    return "\n".join(
+        f"- '{template.template_id}': variables {', '.join(template.required)}"
+        + (f" (optional: {', '.join(sorted(template.defaults))})" if template.defaults else "")
+        for template in get_registry().values()
+    )
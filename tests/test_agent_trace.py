@@ -0,0 +1,69 @@
+import gc
+import json
+import sys
+from types import SimpleNamespace
+
+from agent_trace import TurnTracer, summarize
+
+
+class Invocation:
+    """Stands in for ADK's InvocationContext; the tracer only needs to be able to weak-reference it."""
+
+
+def context(invocation_id, invocation):
+    return SimpleNamespace(invocation_id=invocation_id, session=SimpleNamespace(id="s1"), agent_name="root_agent",
+                           _invocation_context=invocation, function_call_id="call-1")
+
+
+def usage(prompt, output):
+    return SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=prompt, candidates_token_count=output,
+                                                          total_token_count=prompt + output))
+
+
+def test_turn_records_llm_calls_tokens_and_tools(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = TurnTracer(path=str(path))
+    invocation = Invocation()
+    ctx = context("inv-1", invocation)
+    tool = SimpleNamespace(name="lookup_policy_expiration")
+
+    tracer.before_agent(ctx)
+    tracer.before_model(ctx, SimpleNamespace(model="gemini"))
+    tracer.after_model(ctx, usage(100, 20))
+    tracer.before_tool(tool, {}, ctx)
+    tracer.on_tool_error(tool, {}, ctx, KeyError("PX-1"))
+    tracer.after_agent(ctx)
+
+    record = json.loads(path.read_text())
+    assert record == tracer.recent()[0]
+    assert record["llm_calls"] == 1
+    assert record["tokens"] == {"prompt": 100, "output": 20, "total": 120}
+    assert [(step["kind"], step["name"]) for step in record["steps"]] == [
+        ("llm", "gemini"), ("tool", "lookup_policy_expiration")]
+    assert record["steps"][1]["error"] == "KeyError: 'PX-1'"
+    assert "abandoned" not in record
+    assert set(summarize([record])) == {"llm:gemini", "tool:lookup_policy_expiration"}
+
+
+def test_turn_without_after_agent_is_closed_out_and_unprofiled():
+    tracer = TurnTracer(profile_slow_ms=60_000)
+    invocation = Invocation()
+    tracer.before_agent(context("inv-1", invocation))
+    assert sys.getprofile() is not None
+
+    # The turn raised: ADK drops the invocation without calling after_agent.
+    del invocation
+    gc.collect()
+
+    assert sys.getprofile() is None
+    assert tracer.recent()[0]["abandoned"] is True
+    assert tracer._turns == {}
+
+
+def test_stale_turns_are_reaped_on_the_next_turn():
+    tracer = TurnTracer(turn_timeout=0)
+    kept = Invocation()
+    tracer.before_agent(context("inv-1", kept))
+    tracer.before_agent(context("inv-2", Invocation()))
+    assert [record["invocation_id"] for record in tracer.recent()][:1] == ["inv-1"]
+    assert "inv-1" not in tracer._turns
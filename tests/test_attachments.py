@@ -0,0 +1,61 @@
+import base64
+import json
+
+import attachments
+from attachments import AttachmentStore
+from email_client import EmailClient
+
+
+def test_store_is_bounded_by_total_bytes_and_evicts_least_recently_used():
+    store = AttachmentStore(max_bytes=10)
+    first = store.put(b"aaaa")
+    second = store.put(b"bbbb")
+    store.get(first)
+    third = store.put(b"cccc")
+
+    assert store.get(second) is None
+    assert store.get(first) == b"aaaa"
+    assert store.get(third) == b"cccc"
+    assert store.stats() == {"entries": 2, "bytes": 8, "max_bytes": 10}
+
+
+def test_oversized_entry_is_not_kept_in_memory():
+    store = AttachmentStore(max_bytes=3)
+    handle = store.put(b"too big")
+    assert attachments.is_handle(handle)
+    assert store.get(handle) is None
+    assert store.size == 0
+
+
+def test_disk_copy_outlives_eviction(tmp_path):
+    store = AttachmentStore(max_bytes=4, directory=str(tmp_path))
+    handle = store.put(b"aaaa")
+    store.put(b"bbbb")
+    assert store.get(handle) == b"aaaa"
+    assert AttachmentStore(directory=str(tmp_path)).get(handle) == b"aaaa"
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"results": []}
+
+
+def test_send_batch_resolves_handles_like_send_email(monkeypatch):
+    handle = attachments.put_attachment(b"BEGIN:VCALENDAR")
+    sent = []
+    client = EmailClient()
+    monkeypatch.setattr(client.session, "post", lambda url, data, headers: sent.append(json.loads(data))
+                        or FakeResponse())
+    messages = [{"recipient_email": "a@example.com", "subject": "Hi", "body_html": "x", "attachment_content": handle},
+                {"recipient_email": "b@example.com", "subject": "Hi", "body_html": "x"}]
+
+    client.send_batch(messages)
+
+    resolved = sent[0]["messages"]
+    assert base64.b64decode(resolved[0]["attachment_content"]) == b"BEGIN:VCALENDAR"
+    assert "attachment_content" not in resolved[1]
+    # The caller's messages are left as they were.
+    assert messages[0]["attachment_content"] == handle
@@ -0,0 +1,52 @@
+import base64
+import json
+
+from brevo_api import build_payload, encode_payload
+
+
+def payload_with(*contents):
+    return {"sender": {"email": "bot@example.com"}, "subject": 'Quote " and \\ slash',
+            "attachment": [{"name": f"file{i}.bin", "content": content} for i, content in enumerate(contents)]}
+
+
+def test_spliced_body_matches_json_dumps():
+    contents = [base64.b64encode(bytes(range(256)) * 40).decode("ascii"), base64.b64encode(b"second").decode("ascii")]
+    payload = payload_with(*contents)
+    assert encode_payload(payload) == json.dumps(payload).encode("utf-8")
+
+
+def test_non_base64_content_falls_back_to_json_dumps():
+    for content in ['has "quotes"', "café", "line\nbreak"]:
+        payload = payload_with(content)
+        body = encode_payload(payload)
+        assert body == json.dumps(payload).encode("utf-8")
+        assert json.loads(body) == payload
+
+
+def test_placeholder_text_in_other_fields_is_left_alone():
+    payload = payload_with(base64.b64encode(b"data").decode("ascii"))
+    payload["htmlContent"] = "@@0@@"
+    assert json.loads(encode_payload(payload)) == payload
+
+
+def test_payload_without_attachment():
+    payload = {"subject": "Hi"}
+    assert encode_payload(payload) == b'{"subject": "Hi"}'
+
+
+def test_non_string_attachment_is_rejected():
+    payload, error = build_payload({"recipient_email": "a@example.com", "subject": "Hi", "body_html": "<p>x</p>",
+                                    "attachment_content": 123, "attachment_name": "x.txt"})
+    assert payload is None
+    assert "must be strings" in error
+
+
+def test_null_attachment_fields_mean_no_attachment():
+    payload, error = build_payload({"recipient_email": "a@example.com", "subject": "Hi", "body_html": "<p>x</p>",
+                                    "attachment_content": None, "attachment_name": None})
+    assert error is None
+    assert "attachment" not in payload
+
+    payload, error = build_payload({"recipient_email": "a@example.com", "subject": "Hi", "body_html": "<p>x</p>",
+                                    "attachment_content": "QUJD", "attachment_name": None})
+    assert payload["attachment"] == [{"name": "event.ics", "content": "QUJD"}]
@@ -0,0 +1,105 @@
+import json
+import time
+
+import pytest
+
+from credentials import CachedSecret, FakeSecretSource
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_get_fetches_once_until_expiry():
+    source = FakeSecretSource("key-1")
+    secret = CachedSecret(source, ttl=60, refresh_margin=0)
+
+    assert [secret.get() for _ in range(5)] == ["key-1"] * 5
+    assert source.fetch_count == 1
+
+
+def test_refresh_after_401_replaces_cached_value():
+    source = FakeSecretSource("old-key")
+    secret = CachedSecret(source, ttl=60, refresh_margin=0)
+    assert secret.get() == "old-key"
+
+    # The key was rotated; the provider answered 401 and the caller asks for a fresh one.
+    source.value = "new-key"
+    assert secret.refresh() == "new-key"
+    assert secret.get() == "new-key"
+    assert source.fetch_count == 2
+
+
+def test_get_inside_margin_refreshes_in_background():
+    source = FakeSecretSource("old-key")
+    secret = CachedSecret(source, ttl=60, refresh_margin=60)
+    assert secret.get() == "old-key"
+
+    source.value = "new-key"
+    # The current value is served while the refresh runs.
+    assert secret.get() == "old-key"
+    wait_for(lambda: secret.get() == "new-key")
+
+
+def test_failed_background_refresh_is_not_retried_per_request():
+    source = FakeSecretSource("key-1")
+    secret = CachedSecret(source, ttl=60, refresh_margin=60, refresh_retry=60)
+    secret.get()
+
+    source.error = RuntimeError("backend down")
+    secret.get()
+    wait_for(lambda: source.fetch_count == 2 and not secret._refreshing)
+    for _ in range(20):
+        assert secret.get() == "key-1"
+    time.sleep(0.05)
+    assert source.fetch_count == 2
+
+
+def test_expired_value_with_failing_backend_raises():
+    source = FakeSecretSource("key-1")
+    secret = CachedSecret(source, ttl=60, refresh_margin=0)
+    secret.get()
+    secret.invalidate()
+
+    source.error = RuntimeError("backend down")
+    with pytest.raises(RuntimeError):
+        secret.get()
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.headers = {}
+        self._body = body
+        self.text = json.dumps(body)
+
+    def json(self):
+        return self._body
+
+
+def test_brevo_401_refreshes_key_and_retries_once(monkeypatch):
+    import credentials
+    import send_mail_ws
+
+    source = FakeSecretSource("old-key")
+    monkeypatch.setattr(credentials, "_brevo_api_key", CachedSecret(source, ttl=60, refresh_margin=0))
+    assert credentials.get_brevo_api_key() == "old-key"
+    sent_keys = []
+
+    def post(url, data, headers):
+        sent_keys.append(headers["api-key"])
+        if headers["api-key"] != "new-key":
+            return FakeResponse(401, {"message": "Key not found"})
+        return FakeResponse(201, {"messageId": "<1@example.com>"})
+
+    monkeypatch.setattr(send_mail_ws.brevo_transport, "post", post)
+    source.value = "new-key"
+    body, status_code = send_mail_ws.deliver_brevo({"subject": "Hi"})
+
+    assert (body, status_code) == ({"messageId": "<1@example.com>"}, 200)
+    assert sent_keys == ["old-key", "new-key"]
+    assert credentials.get_brevo_api_key() == "new-key"
@@ -0,0 +1,50 @@
+import datetime
+
+import pytest
+
+import dates
+
+
+def test_fast_path_formats_skip_dateutil():
+    before = dates.cache_info()
+    assert dates.resolve("2025-05-07T15:30:00") == datetime.datetime(2025, 5, 7, 15, 30)
+    assert dates.resolve("Wednesday, May 7, 2025") == datetime.datetime(2025, 5, 7)
+    after = dates.cache_info()
+    assert (after.hits, after.misses) == (before.hits, before.misses)
+
+
+def test_naive_input_stays_floating_unless_a_zone_is_given():
+    assert dates.resolve("2025-05-07T15:30:00").tzinfo is None
+    zone = datetime.timezone(datetime.timedelta(hours=2))
+    assert dates.resolve("2025-05-07T15:30:00", zone).tzinfo is zone
+    assert dates.resolve("2025-05-07T15:30:00+00:00", zone).utcoffset() == datetime.timedelta(0)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2025-05-07", datetime.date(2025, 5, 7)),
+    ("Wednesday, May 7, 2025", datetime.date(2025, 5, 7)),
+    ("May 7 2025", datetime.date(2025, 5, 7)),
+    ("May 7 2025 3pm", datetime.datetime(2025, 5, 7, 15)),
+    ("May 7 2025 12am", datetime.datetime(2025, 5, 7)),
+    ("May 7 2025 00:00", datetime.datetime(2025, 5, 7)),
+    ("2025-05-07T00:00", datetime.datetime(2025, 5, 7)),
+])
+def test_resolve_start_tells_all_day_from_timed(text, expected):
+    result = dates.resolve_start(text)
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+def test_relative_input_follows_the_current_day(monkeypatch):
+    monkeypatch.setattr(dates, "today", lambda tz=None: datetime.datetime(2026, 10, 17, 9))
+    assert dates.resolve("3pm") == datetime.datetime(2026, 10, 17, 15)
+
+    monkeypatch.setattr(dates, "today", lambda tz=None: datetime.datetime(2030, 1, 2, 9))
+    assert dates.resolve("3pm") == datetime.datetime(2030, 1, 2, 15)
+
+
+def test_unparseable_input_raises():
+    with pytest.raises(ValueError):
+        dates.resolve("not a date")
+    with pytest.raises(TypeError):
+        dates.resolve(None)
@@ -0,0 +1,50 @@
+import datetime
+
+import ics
+
+
+def test_escape_text():
+    assert ics.escape_text('a\\b;c,d\r\ne') == r'a\\b\;c\,d\ne'
+
+
+def test_short_line_is_not_folded():
+    assert ics.fold_line("SUMMARY:Hi") == "SUMMARY:Hi\r\n"
+
+
+def test_fold_line_keeps_lines_within_75_octets():
+    line = "SUMMARY:" + "x" * 200
+    folded = ics.fold_line(line)
+    physical = folded[:-2].split("\r\n")
+    assert all(len(part.encode("utf-8")) <= 75 for part in physical)
+    assert all(part.startswith(" ") for part in physical[1:])
+    assert "".join(part[1:] if i else part for i, part in enumerate(physical)) == line
+
+
+def test_fold_line_never_splits_a_utf8_sequence():
+    line = "SUMMARY:" + "é" * 100
+    physical = ics.fold_line(line)[:-2].split("\r\n")
+    for part in physical:
+        assert len(part.encode("utf-8")) <= 75
+        part.encode("utf-8").decode("utf-8")
+    assert "".join(part[1:] if i else part for i, part in enumerate(physical)) == line
+
+
+def test_format_datetime():
+    assert ics.format_datetime(datetime.date(2025, 5, 7)) == ";VALUE=DATE:20250507"
+    assert ics.format_datetime(datetime.datetime(2025, 5, 7, 15, 30)) == ":20250507T153000"
+    aware = datetime.datetime(2025, 5, 7, 15, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    assert ics.format_datetime(aware) == ":20250507T133000Z"
+
+
+def test_calendar_events_round_trip_through_icalendar():
+    from icalendar import Calendar
+
+    body = ics.build_calendar([("Renew policy, #42; call Jane", datetime.datetime(2025, 5, 7, 15)),
+                               ("Holiday", datetime.date(2025, 5, 8))])
+    events = Calendar.from_ical(body).walk("VEVENT")
+
+    assert [str(event["summary"]) for event in events] == ["Renew policy, #42; call Jane", "Holiday"]
+    assert events[0]["dtend"].dt - events[0]["dtstart"].dt == ics.DEFAULT_DURATION
+    assert events[1]["dtstart"].dt == datetime.date(2025, 5, 8)
+    assert events[1]["dtend"].dt == datetime.date(2025, 5, 9)
+    assert events[0]["uid"] != events[1]["uid"]
@@ -0,0 +1,96 @@
+import threading
+
+from idempotency import INVALID_KEY_ERROR, IdempotencyCache, chunk_key, should_cache, supplied_key
+
+
+def test_duplicate_waits_for_in_flight_send_and_replays_it():
+    cache = IdempotencyCache(ttl=60)
+    assert cache.begin("k") is None
+
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(cache.begin("k", wait_timeout=5))) for _ in range(5)]
+    for waiter in waiters:
+        waiter.start()
+    cache.complete("k", ({"messageId": "1"}, 201))
+    for waiter in waiters:
+        waiter.join(5)
+
+    assert results == [({"messageId": "1"}, 201)] * 5
+    assert cache.stats() == {"entries": 1, "in_flight": 0, "hits": 5, "misses": 1}
+
+
+def test_concurrent_begin_hands_the_send_to_one_caller():
+    cache = IdempotencyCache(ttl=60)
+    barrier = threading.Barrier(8)
+    owners = []
+
+    def worker():
+        barrier.wait()
+        response = cache.begin("k", wait_timeout=5)
+        if response is None:
+            owners.append(threading.get_ident())
+            cache.complete("k", ({}, 201))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(owners) == 1
+
+
+def test_release_lets_the_next_caller_send():
+    cache = IdempotencyCache(ttl=60)
+    assert cache.begin("k") is None
+    cache.release("k")
+    assert cache.begin("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_entries_expire_and_are_bounded():
+    cache = IdempotencyCache(ttl=0, max_entries=2)
+    cache.begin("a")
+    cache.complete("a", ({}, 201))
+    assert cache.begin("a") is None
+
+    cache = IdempotencyCache(ttl=60, max_entries=2)
+    for key in "abc":
+        cache.begin(key)
+        cache.complete(key, ({}, 201))
+    assert cache.stats()["entries"] == 2
+    assert cache.begin("a") is None
+
+
+def test_chunk_key():
+    assert chunk_key("batch-1", 3, {}) == "batch-1:3"
+    assert chunk_key(None, 0, {"a": 1, "b": 2}) == chunk_key(None, 5, {"b": 2, "a": 1})
+    assert chunk_key(None, 0, {"a": 1}) != chunk_key(None, 0, {"a": 2})
+
+
+def test_failures_are_not_cached():
+    assert should_cache(201)
+    assert should_cache(400)
+    assert not should_cache(429)
+    assert not should_cache(503)
+
+
+def test_supplied_key_must_be_a_non_empty_string():
+    assert supplied_key("from-header", {"idempotency_key": ["ignored"]}) == ("from-header", None)
+    assert supplied_key(None, {"idempotency_key": "k"}) == ("k", None)
+    assert supplied_key(None, {}) == (None, None)
+    for bad in (["k"], {"k": 1}, 42, ""):
+        assert supplied_key(None, {"idempotency_key": bad}) == (None, INVALID_KEY_ERROR)
+
+
+def test_non_string_idempotency_key_is_a_400():
+    import send_mail_ws
+
+    client = send_mail_ws.app.test_client()
+    message = {"recipient_email": "a@example.com", "subject": "Hi", "body_html": "<p>x</p>"}
+    response = client.post('/send-email', json=dict(message, idempotency_key=["k"]))
+    assert response.status_code == 400
+    assert response.get_json() == {"error": INVALID_KEY_ERROR}
+
+    response = client.post('/send-email/batch', json={"messages": [message], "idempotency_key": {"k": 1}})
+    assert response.status_code == 400
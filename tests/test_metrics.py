@@ -0,0 +1,61 @@
+import asyncio
+
+import metrics
+from metrics import Counter, Histogram, Registry
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests.", ("status",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    requests.inc(status=200)
+    requests.inc(2, status='5"x')
+    latency.observe(0.05)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{status="200"} 1' in lines
+    assert 'requests_total{status="5\\"x"} 2' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+
+
+def test_gauges_are_read_at_render_and_replaced_by_name():
+    registry = Registry()
+    registry.gauge("depth", "Depth.", lambda: 1)
+    registry.gauge("depth", "Depth.", lambda: {"a": 2})
+    registry.gauge("broken", "Broken.", lambda: 1 / 0)
+    text = registry.render()
+    assert 'depth{key="a"} 2' in text
+    assert "depth 1" not in text
+    assert "broken" not in text
+
+
+def test_stage_adds_to_the_current_trace():
+    metrics.start_trace("t1")
+    with metrics.stage("encode_payload"):
+        pass
+    with metrics.stage("encode_payload"):
+        pass
+    trace = metrics.finish_request("send_email_endpoint", 200, 10, 0.01)
+    assert trace["trace_id"] == "t1"
+    assert list(trace["stages"]) == ["encode_payload"]
+    assert metrics.current_trace() is None
+
+
+def test_traces_are_per_asyncio_task():
+    async def request(trace_id, delay):
+        metrics.start_trace(trace_id)
+        await asyncio.sleep(delay)
+        with metrics.stage(trace_id):
+            pass
+        return metrics.end_trace()
+
+    async def both():
+        return await asyncio.gather(request("slow", 0.02), request("fast", 0))
+
+    slow, fast = asyncio.run(both())
+    assert (slow["trace_id"], list(slow["stages"])) == ("slow", ["slow"])
+    assert (fast["trace_id"], list(fast["stages"])) == ("fast", ["fast"])
@@ -0,0 +1,72 @@
+import time
+
+from outbox import FAILED, QUEUED, SENT, Outbox, OutboxWorkers
+
+
+def scripted(*answers):
+    """A deliver() that returns the given answers in turn and records what it was called with."""
+    calls = []
+
+    def deliver(payload, idempotency_key):
+        calls.append((payload, idempotency_key))
+        return answers[min(len(calls), len(answers)) - 1]
+    deliver.calls = calls
+    return deliver
+
+
+def test_message_claimed_by_a_crashed_process_is_queued_again(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    crashed = Outbox(path)
+    message_id = crashed.enqueue({"subject": "Hi"}, "order-1")
+    assert crashed.claim()[0] == message_id
+    assert crashed.claim() is None
+    crashed.close()
+
+    restarted = Outbox(path)
+    assert restarted.get(message_id)["status"] == QUEUED
+    assert restarted.claim() == (message_id, {"subject": "Hi"}, 2, "order-1")
+
+
+def test_429_and_5xx_are_retried_with_backoff(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    deliver = scripted(({"error": "slow down"}, 429), ({"error": "down"}, 503), ({"messageId": "1"}, 201))
+    workers = OutboxWorkers(outbox, deliver, backoff_base=10)
+    message_id = outbox.enqueue({"subject": "Hi"}, "order-1")
+
+    workers.process(*outbox.claim())
+    record = outbox.get(message_id)
+    assert (record["status"], record["status_code"]) == (QUEUED, 429)
+    # Not due yet: the first retry waits backoff_base seconds.
+    assert outbox.claim() is None
+
+    for delay in (0, 0):
+        outbox._execute("UPDATE outbox SET next_attempt_at = ?", (time.time() + delay,))
+        workers.process(*outbox.claim())
+    record = outbox.get(message_id)
+    assert (record["status"], record["attempts"], record["result"]) == (SENT, 3, {"messageId": "1"})
+    assert [key for _, key in deliver.calls] == ["order-1"] * 3
+
+
+def test_gives_up_after_max_attempts_and_on_client_errors(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    workers = OutboxWorkers(outbox, scripted(({"error": "down"}, 503)), max_attempts=1)
+    message_id = outbox.enqueue({"subject": "Hi"})
+    workers.process(*outbox.claim())
+    assert outbox.get(message_id)["status"] == FAILED
+
+    workers = OutboxWorkers(outbox, scripted(({"error": "bad address"}, 400)))
+    message_id = outbox.enqueue({"subject": "Hi"})
+    workers.process(*outbox.claim())
+    assert outbox.get(message_id)["status"] == FAILED
+
+
+def test_queued_sends_keep_their_own_keys(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    deliver = scripted(({"messageId": "1"}, 201))
+    workers = OutboxWorkers(outbox, deliver)
+    # Same content, two different requests.
+    outbox.enqueue({"subject": "Hi"}, "first")
+    outbox.enqueue({"subject": "Hi"}, "second")
+    workers.process(*outbox.claim())
+    workers.process(*outbox.claim())
+    assert sorted(key for _, key in deliver.calls) == ["first", "second"]
@@ -0,0 +1,39 @@
+import datetime
+
+import policy_index
+from policy_index import PolicyIndex, build_index, extract_record
+
+DOCUMENTS = [
+    ({"policy_id": "PX-1", "holder": "Jane Doe", "email": "jane@example.com", "expiration_date": "2026-11-01"}, None),
+    ({}, "Policy number: PX-2\nPolicyholder: John Roe\nContact john@example.com\nExpires on: December 3, 2026"),
+    ({"policy_id": "PX-3", "holder": "Jane Doe", "expiration_date": "2027-01-15"}, None),
+    ({"holder": "No Id", "expiration_date": "2026-11-01"}, None),
+]
+
+
+def test_extract_record_prefers_structured_fields_and_falls_back_to_text():
+    assert extract_record(*DOCUMENTS[1]) == {"policy_id": "PX-2", "holder": "John Roe",
+                                             "email": "john@example.com", "expiration_date": "2026-12-03"}
+    assert extract_record({"policy_number": "PX-9", "expires": "Jan 2 2027"}, "Policy #: PX-0") == {
+        "policy_id": "PX-9", "holder": None, "email": None, "expiration_date": "2027-01-02"}
+    assert extract_record(*DOCUMENTS[3]) is None
+    assert extract_record({"policy_id": "PX-4", "expiration_date": "not a date"}) is None
+
+
+def test_index_lookups_and_expiry_window(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    assert build_index(DOCUMENTS, path) == 3
+    index = PolicyIndex(path)
+
+    assert len(index) == 3
+    assert [r["policy_id"] for r in index.lookup(policy_id=" px-2 ")] == ["PX-2"]
+    assert [r["policy_id"] for r in index.lookup(holder="jane  DOE")] == ["PX-1", "PX-3"]
+    assert index.lookup() == []
+    window = index.expiring_between(datetime.date(2026, 11, 1), datetime.date(2026, 12, 3))
+    assert [r["policy_id"] for r in window] == ["PX-1", "PX-2"]
+    assert [r["policy_id"] for r in index.expiring_within(30, today=datetime.date(2026, 12, 20))] == ["PX-3"]
+
+
+def test_get_index_is_none_until_built(tmp_path, monkeypatch):
+    monkeypatch.setattr(policy_index, "_default_index", None)
+    assert policy_index.get_index(str(tmp_path / "missing.sqlite3")) is None
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from providers import AlreadyDelivered, Delivery, FunctionProvider, ProviderRouter, SmtpProvider
+
+
+def test_claim_is_exclusive_and_never_waits():
+    delivery = Delivery("key")
+    delivery.claim("brevo")
+    # The holder may claim again, e.g. for a retry of its own POST.
+    delivery.claim("brevo")
+    with pytest.raises(AlreadyDelivered):
+        delivery.claim("smtp")
+
+    delivery.settle("brevo", True)
+    assert delivery.delivered_by == "brevo"
+    with pytest.raises(AlreadyDelivered):
+        delivery.claim("smtp")
+
+
+def test_failed_settle_hands_the_message_back():
+    delivery = Delivery("key")
+    delivery.claim("brevo")
+    delivery.settle("brevo", False)
+    assert not delivery.claimed
+    delivery.claim("smtp")
+    assert delivery.claimed
+    assert delivery.delivered_by is None
+
+
+def test_key_is_derived_from_payload_when_not_given():
+    assert Delivery(payload={"a": 1, "b": 2}).key == Delivery(payload={"b": 2, "a": 1}).key
+    assert Delivery("given", {"a": 1}).key == "given"
+    assert Delivery().message_id("example.com") is None
+    assert Delivery("k").message_id("example.com", 2) == "<k.2@example.com>"
+
+
+def test_smtp_message_ids_are_stable_for_a_delivery():
+    payload = {"sender": {"name": "Bot", "email": "bot@example.com"}, "subject": "Hi",
+               "htmlContent": "<p>hi</p>", "to": [{"email": "a@example.com"}]}
+    first = SmtpProvider.build_messages(payload, Delivery("k"))
+    again = SmtpProvider.build_messages(payload, Delivery("k"))
+    assert first[0][1]["Message-ID"] == again[0][1]["Message-ID"] == "<k.0@example.com>"
+
+
+def claiming(name, sent, before_claim=None, status_code=201):
+    """A provider function that delivers through the shared Delivery like the real ones do."""
+    def send(payload, delivery):
+        if before_claim is not None:
+            before_claim()
+        delivery.claim(name)
+        sent.append(name)
+        delivery.settle(name, status_code < 400)
+        return {"messageId": name}, status_code
+    return send
+
+
+def router_for(*providers, hedge_delay=0.05):
+    router = ProviderRouter(providers)
+    for health in router.health.values():
+        health.hedge_delay = lambda fraction: hedge_delay
+    return router
+
+
+def test_stalled_primary_is_hedged_and_delivered_exactly_once():
+    release = threading.Event()
+    sent = []
+    router = router_for(FunctionProvider("slow", claiming("slow", sent, lambda: release.wait(5))),
+                        FunctionProvider("fast", claiming("fast", sent)))
+    started = time.monotonic()
+    try:
+        assert router.send({"subject": "Hi"}, key="k") == ({"messageId": "fast"}, 201)
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+    # The primary wakes up after the hedge delivered, and stands down at its claim.
+    time.sleep(0.1)
+    assert sent == ["fast"]
+    assert router.health["slow"].counts["aborted"] == 1
+
+
+def test_primary_already_sending_is_not_hedged():
+    sent = []
+
+    def on_the_wire(payload, delivery):
+        delivery.claim("primary")
+        time.sleep(0.2)
+        sent.append("primary")
+        delivery.settle("primary", True)
+        return {"messageId": "primary"}, 201
+
+    router = router_for(FunctionProvider("primary", on_the_wire), FunctionProvider("other", claiming("other", sent)))
+    assert router.send({"subject": "Hi"}) == ({"messageId": "primary"}, 201)
+    assert sent == ["primary"]
+    assert router.health["other"].counts == {}
+
+
+def test_provider_that_stood_down_takes_over_when_the_holder_fails():
+    claimed = threading.Event()
+    sent = []
+
+    def failing_hedge(payload, delivery):
+        delivery.claim("hedge")
+        claimed.set()
+        time.sleep(0.1)
+        delivery.settle("hedge", False)
+        return {"error": "down"}, 503
+
+    router = router_for(FunctionProvider("primary", claiming("primary", sent, lambda: claimed.wait(5))),
+                        FunctionProvider("hedge", failing_hedge))
+    assert router.send({"subject": "Hi"}) == ({"messageId": "primary"}, 201)
+    assert sent == ["primary"]
+
+
+def test_retryable_failure_fails_over():
+    sent = []
+    router = router_for(FunctionProvider("a", claiming("a", sent, status_code=503)),
+                        FunctionProvider("b", claiming("b", sent)), hedge_delay=1)
+    assert router.send({"subject": "Hi"}) == ({"messageId": "b"}, 201)
+    assert sent == ["a", "b"]
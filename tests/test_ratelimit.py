@@ -0,0 +1,46 @@
+import time
+
+from ratelimit import TokenBucket, parse_retry_after
+
+
+def test_on_rate_limited_halves_rate_and_pauses_for_retry_after():
+    bucket = TokenBucket(rate=10, burst=10)
+    bucket.on_rate_limited({"Retry-After": "0.2"})
+
+    stats = bucket.stats()
+    assert stats["rate"] == 5
+    assert stats["throttled"] == 1
+    assert stats["tokens"] == 0
+    assert 0.1 < stats["paused_for"] <= 0.2
+    assert not bucket.acquire(timeout=0.05)
+
+    started = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert time.monotonic() - started >= 0.1
+
+
+def test_rate_never_drops_below_min_rate_and_recovers():
+    bucket = TokenBucket(rate=10, burst=10, min_rate=2, recovery_step=1)
+    for _ in range(5):
+        bucket.on_rate_limited({"Retry-After": "0"})
+    assert bucket.rate == 2
+
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 10
+
+
+def test_on_rate_limited_without_headers_pauses_one_interval():
+    bucket = TokenBucket(rate=10, burst=10)
+    bucket.on_rate_limited()
+    assert 0 < bucket.stats()["paused_for"] <= 0.2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"Retry-After": "3"}) == 3
+    assert parse_retry_after({"Retry-After": "-1"}) == 0
+    assert parse_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert parse_retry_after({"Retry-After": "soon"}) is None
+    assert parse_retry_after({"Retry-After": "soon", "x-sib-ratelimit-remaining": "0",
+                              "x-sib-ratelimit-reset": "7"}) == 7
+    assert parse_retry_after({"x-sib-ratelimit-remaining": "5", "x-sib-ratelimit-reset": "7"}) is None
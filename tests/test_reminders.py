@@ -0,0 +1,61 @@
+import base64
+import threading
+
+from reminders import Checkpoint, build_reminder, run
+
+RECORDS = [
+    {"policy_id": "PX-1", "holder": "Jane Doe", "email": "jane@example.com", "expiration_date": "2026-11-01"},
+    {"policy_id": "PX-2", "holder": None, "email": "john@example.com", "expiration_date": "2026-11-02"},
+    {"policy_id": "PX-3", "holder": "No Mail", "email": None, "expiration_date": "2026-11-03"},
+]
+
+
+class FakeClient:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send_email(self, recipient_email, subject, body_html, attachment_content, attachment_name, idempotency_key):
+        with self._lock:
+            self.sent.append(idempotency_key)
+        if recipient_email in self.fail:
+            return {"error": "503 Server Error"}
+        return {"messageId": f"<{idempotency_key}@example.com>"}
+
+
+def test_build_reminder():
+    message = build_reminder(RECORDS[1])
+    assert message["key"] == "reminder:PX-2:2026-11-02"
+    assert message["subject"] == "Reminder: your policy PX-2 expires on Monday, November 02, 2026"
+    assert "Dear customer" in message["body_html"]
+    ics_text = base64.b64decode(message["attachment_content"]).decode("utf-8")
+    assert "DTSTART;VALUE=DATE:20261102" in ics_text
+    assert message["attachment_name"] == "Policy_PX-2_expires.ics"
+
+
+def test_interrupted_run_only_sends_what_is_left(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    client = FakeClient(fail={"john@example.com"})
+    checkpoint = Checkpoint(path)
+    assert run(RECORDS, client, checkpoint, processes=1, workers=2) == {
+        "skipped": 0, "no_email": 1, "sent": 1, "failed": 1}
+    checkpoint.close()
+
+    # Restarted with the same arguments: the delivered reminder is not sent again.
+    client = FakeClient()
+    checkpoint = Checkpoint(path)
+    assert run(RECORDS, client, checkpoint, processes=1, workers=2) == {
+        "skipped": 1, "no_email": 1, "sent": 1, "failed": 0}
+    checkpoint.close()
+    assert client.sent == ["reminder:PX-2:2026-11-02"]
+    assert Checkpoint(path).done == {"reminder:PX-1:2026-11-01", "reminder:PX-2:2026-11-02"}
+
+
+def test_dry_run_sends_and_records_nothing(tmp_path):
+    client = FakeClient()
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.jsonl"))
+    assert run(RECORDS, client, checkpoint, processes=1, dry_run=True)["sent"] == 2
+    assert client.sent == []
+    assert checkpoint.done == set()
+    checkpoint.close()
@@ -0,0 +1,82 @@
+import gc
+from types import SimpleNamespace
+
+from google.genai import types
+
+from response_cache import ResponseCache, normalize_intent
+
+
+class Invocation:
+    """Stands in for ADK's InvocationContext; the cache only needs to be able to weak-reference it."""
+
+
+def context(invocation_id, prompt, invocation, user_id="u1", earlier_prompts=0):
+    events = [SimpleNamespace(author="user", invocation_id=f"earlier-{i}") for i in range(earlier_prompts)]
+    return SimpleNamespace(invocation_id=invocation_id, user_id=user_id,
+                           user_content=types.Content(role="user", parts=[types.Part(text=prompt)]),
+                           session=SimpleNamespace(events=events), _invocation_context=invocation,
+                           function_call_id=f"{invocation_id}-call")
+
+
+def answer(text):
+    return SimpleNamespace(content=types.Content(role="model", parts=[types.Part(text=text)]), partial=False)
+
+
+def run_turn(cache, ctx, reply, tools=()):
+    """Drives one turn through the callbacks. Returns what before_agent returned."""
+    served = cache.before_agent(ctx)
+    if served is not None:
+        return served
+    for name, response in tools:
+        tool = SimpleNamespace(name=name)
+        if cache.before_tool(tool, {"policy_id": "PX-1"}, ctx) is None:
+            cache.after_tool(tool, {"policy_id": "PX-1"}, ctx, response)
+    cache.after_model(ctx, answer(reply))
+    cache.after_agent(ctx)
+    return None
+
+
+def test_normalize_intent():
+    assert normalize_intent("Hey, when does my policy expire?") == "when does my policy expire"
+
+
+def test_repeated_question_is_a_hit_and_a_new_one_a_miss():
+    cache = ResponseCache(ttl=60)
+    invocation = Invocation()
+    assert run_turn(cache, context("1", "When does my policy expire?", invocation), "On May 7.") is None
+
+    served = run_turn(cache, context("2", "hi, when does my policy expire", invocation), "unused")
+    assert served.parts[0].text == "On May 7."
+    assert run_turn(cache, context("3", "When does my policy expire?", invocation, user_id="u2"), "x") is None
+    assert run_turn(cache, context("4", "Who is my agent?", invocation), "x") is None
+    assert cache.stats()["answers"]["hits"] == 1
+
+
+def test_turns_with_side_effects_or_history_are_not_stored():
+    cache = ResponseCache(ttl=60)
+    invocation = Invocation()
+    run_turn(cache, context("1", "Email me my policy", invocation), "Sent.", tools=[("send_email", {"status": "ok"})])
+    run_turn(cache, context("2", "And the other one?", invocation, earlier_prompts=1), "PX-2.")
+    assert cache.stats()["answers"]["entries"] == 0
+
+
+def test_read_only_tool_results_are_reused_and_errors_are_not():
+    cache = ResponseCache(ttl=60)
+    invocation = Invocation()
+    tool = SimpleNamespace(name="lookup_policy_expiration")
+    run_turn(cache, context("1", "first", invocation), "x", tools=[(tool.name, {"error": "index not built"})])
+    assert cache.before_tool(tool, {"policy_id": "PX-1"}, context("2", "second", invocation)) is None
+
+    run_turn(cache, context("3", "third", invocation), "x", tools=[(tool.name, {"expiration_date": "2026-11-01"})])
+    assert cache.before_tool(tool, {"policy_id": "PX-1"}, context("4", "fourth", invocation)) == {
+        "expiration_date": "2026-11-01"}
+
+
+def test_turn_state_is_dropped_when_after_agent_never_runs():
+    cache = ResponseCache(ttl=60)
+    invocation = Invocation()
+    cache.before_agent(context("1", "When does my policy expire?", invocation))
+    assert cache._turns
+    del invocation
+    gc.collect()
+    assert cache._turns == {}
@@ -0,0 +1,45 @@
+from search_cache import CachedVertexSearchTool, FakeSearchBackend, SearchCache
+
+DOCUMENTS = [{"title": "Policy 42", "url": "gs://policies/42", "content": "Jane Doe home insurance"}]
+
+
+def test_repeated_queries_are_answered_from_cache():
+    backend = FakeSearchBackend(DOCUMENTS)
+    tool = CachedVertexSearchTool(backend=backend, cache=SearchCache(ttl=60))
+
+    first = tool.vertex_ai_search("Jane Doe?")
+    assert first["results"] == DOCUMENTS
+    assert tool.vertex_ai_search("  jane   doe ") == first
+    assert backend.search_count == 1
+
+    tool.invalidate()
+    tool.vertex_ai_search("jane doe")
+    assert backend.search_count == 2
+
+
+def test_disk_cache_is_shared_pruned_and_capped(tmp_path):
+    path = str(tmp_path / "search.db")
+    writer = SearchCache(ttl=60, path=path, disk_max_entries=3)
+    for number in range(5):
+        writer.put(f"q{number}", {"status": "success", "results": [number]})
+
+    reader = SearchCache(ttl=60, path=path, disk_max_entries=3)
+    assert reader.get("q4") == {"status": "success", "results": [4]}
+    assert reader.get("q0") is None
+    assert reader._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] == 3
+
+    expired = SearchCache(ttl=-1, path=path)
+    expired.put("old", {"status": "success", "results": []})
+    expired.prune()
+    assert expired._conn.execute("SELECT COUNT(*) FROM search_cache WHERE key = 'old'").fetchone()[0] == 0
+
+
+def test_invalidate_reaches_other_processes_memory(tmp_path):
+    path = str(tmp_path / "search.db")
+    serving = SearchCache(ttl=60, path=path)
+    serving.put("q", {"status": "success", "results": ["old"]})
+    assert serving.get("q") == {"status": "success", "results": ["old"]}
+
+    # e.g. `python search_cache.py --invalidate` after re-indexing
+    SearchCache(path=path).invalidate()
+    assert serving.get("q") is None
@@ -0,0 +1,30 @@
+import json
+
+import httpx
+from starlette.testclient import TestClient
+
+import credentials
+from credentials import CachedSecret, FakeSecretSource
+import send_mail_async
+
+MESSAGE = {"recipient_email": "a@example.com", "subject": "Hi", "body_html": "<p>x</p>"}
+
+
+def test_sends_carry_the_idempotency_key_and_duplicates_are_replayed(monkeypatch):
+    monkeypatch.setattr(credentials, "_brevo_api_key", CachedSecret(FakeSecretSource()))
+    monkeypatch.setattr(send_mail_async, "idempotency_cache", send_mail_async.IdempotencyCache())
+    bodies = []
+
+    async def post(url, body, headers):
+        bodies.append(json.loads(body))
+        return httpx.Response(201, json={"messageId": f"<{len(bodies)}@example.com>"})
+
+    with TestClient(send_mail_async.app) as client:
+        monkeypatch.setattr(client.app.state.brevo, "post", post)
+        first = client.post('/send-email', json=MESSAGE, headers={"Idempotency-Key": "order-1"})
+        again = client.post('/send-email', json=MESSAGE, headers={"Idempotency-Key": "order-1"})
+
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json()
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert [body["headers"] for body in bodies] == [{"idempotencyKey": "order-1"}]
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import templates
+from templates import CompiledTemplate, TemplateError
+
+
+def test_body_values_are_html_escaped_and_subject_is_plain_text():
+    template = CompiledTemplate("t", "Hi {{ name }}", "<p>{{ name }}</p>")
+    subject, body = template.render({"name": '<b>"Jane" & co</b>'})
+    assert subject == 'Hi <b>"Jane" & co</b>'
+    assert body == "<p>&lt;b&gt;&quot;Jane&quot; &amp; co&lt;/b&gt;</p>"
+
+
+def test_literal_braces_and_format_fields_in_values_are_left_alone():
+    template = CompiledTemplate("t", "{literal} {{name}}", "<style>p {color: red}</style>{{ name }}")
+    subject, body = template.render({"name": "{0.__class__}"})
+    assert subject == "{literal} {0.__class__}"
+    assert body == "<style>p {color: red}</style>{0.__class__}"
+
+
+def test_missing_variables_and_defaults():
+    template = CompiledTemplate("t", "{{ a }}", "{{ b }} {{ c }}", defaults={"c": "x"})
+    assert template.required == ["a", "b"]
+    with pytest.raises(TemplateError, match="missing variables: a, b"):
+        template.render({"a": ""})
+    assert template.render({"a": 1, "b": 2}) == ("1", "2 x")
+
+
+def test_render_by_name():
+    subject, body = templates.render("policy_expiration_reminder",
+                                     {"policy_id": "PX-1", "expiration_date": "May 7, 2025"})
+    assert subject == "Reminder: policy PX-1 expires on May 7, 2025"
+    assert "Hi there" in body
+    with pytest.raises(TemplateError):
+        templates.render("no_such_template")
+    with pytest.raises(TemplateError):
+        templates.render("policy_expiration_reminder", ["PX-1"])
+
+
+def test_directory_templates_override_builtins(tmp_path):
+    (tmp_path / "policy_expiration_reminder.json").write_text(json.dumps({"subject": "S {{ x }}", "html": "H"}))
+    registry = templates.get_registry(str(tmp_path))
+    assert registry["policy_expiration_reminder"].render({"x": 1}) == ("S 1", "H")
+    assert "policy_expiration_digest" in registry
@@ -0,0 +1,93 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from transport import PooledTransport, is_connect_error
+
+
+@pytest.fixture
+def upstream():
+    """A local server that answers with the statuses in `upstream.statuses`, then 201, counting requests."""
+    class Handler(BaseHTTPRequestHandler):
+        def _answer(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            server.requests.append(self.command)
+            if server.delay:
+                time.sleep(server.delay)
+            status = server.statuses.pop(0) if server.statuses else 201
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        do_GET = do_POST = _answer
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests, server.statuses, server.delay = [], [], 0
+    server.url = f"http://127.0.0.1:{server.server_port}/v3/smtp/email"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def fast_transport(**kwargs):
+    return PooledTransport(backoff_factor=0, backoff_jitter=0, **kwargs)
+
+
+def test_post_is_never_retried_by_the_transport(upstream):
+    upstream.statuses = [503, 503]
+    response = fast_transport().post(upstream.url, data=b"{}")
+    assert response.status_code == 503
+    assert upstream.requests == ["POST"]
+
+
+def test_get_is_retried_on_5xx(upstream):
+    upstream.statuses = [503, 502]
+    response = fast_transport().get(upstream.url)
+    assert response.status_code == 201
+    assert upstream.requests == ["GET"] * 3
+
+
+def test_read_timeout_on_post_is_not_a_connect_error(upstream):
+    upstream.delay = 0.5
+    with pytest.raises(requests.exceptions.ReadTimeout) as raised:
+        fast_transport(read_timeout=0.1).post(upstream.url, data=b"{}")
+    assert not is_connect_error(raised.value)
+    assert upstream.requests == ["POST"]
+
+
+def test_refused_connection_is_a_connect_error():
+    with pytest.raises(requests.exceptions.ConnectionError) as raised:
+        fast_transport().post("http://127.0.0.1:9/", data=b"{}")
+    assert is_connect_error(raised.value)
+
+
+def test_post_to_brevo_resends_503_taking_a_token_each_time(upstream, monkeypatch):
+    import send_mail_ws
+
+    transport = fast_transport()
+    acquired = []
+    monkeypatch.setattr(send_mail_ws, "brevo_transport", transport)
+    monkeypatch.setattr(send_mail_ws.brevo_rate_limiter, "acquire", lambda timeout=None: acquired.append(1) or True)
+    upstream.statuses = [503, 500]
+
+    response = send_mail_ws.post_to_brevo(upstream.url, b"{}", {})
+    assert response.status_code == 201
+    assert upstream.requests == ["POST"] * 3
+    assert len(acquired) == 3
+
+
+def test_post_to_brevo_does_not_resend_502(upstream, monkeypatch):
+    import send_mail_ws
+
+    monkeypatch.setattr(send_mail_ws, "brevo_transport", fast_transport())
+    upstream.statuses = [502]
+    assert send_mail_ws.post_to_brevo(upstream.url, b"{}", {}).status_code == 502
+    assert upstream.requests == ["POST"]
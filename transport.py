@@ -0,0 +1,119 @@
+import os
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = int(os.getenv("BREVO_POOL_SIZE", 10))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("BREVO_CONNECT_TIMEOUT", 3.05))
+DEFAULT_READ_TIMEOUT = float(os.getenv("BREVO_READ_TIMEOUT", 20))
+DEFAULT_RETRIES = int(os.getenv("BREVO_RETRIES", 3))
+RETRY_STATUSES = (500, 502, 503, 504)
+# A POST is only resent when the answer proves nothing was accepted. 502/504
+# and read timeouts can come after the provider already queued the message.
+POST_RETRY_STATUSES = (500, 503)
+
+
+def is_connect_error(exc) -> bool:
+    """True when a request failed before it reached the server, so resending a POST cannot duplicate it."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.exceptions.ConnectionError):
+        return False
+    reason = exc.args[0] if exc.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+def backoff(retry_number, factor=0.3, jitter=0.5) -> float:
+    """Seconds to wait before the `retry_number`-th resend (1-based): exponential, plus random jitter."""
+    return factor * (2 ** (retry_number - 1)) + random.uniform(0, jitter)
+
+
+class PooledTransport:
+    """
+    A shared keep-alive HTTP session for outbound provider calls.
+
+    Connections to the same host are pooled and reused and every call gets a
+    connect/read timeout. GETs are retried inside the transport on 5xx and
+    dropped connections, with exponential backoff plus jitter. POSTs are never
+    retried here: the caller decides (see is_connect_error and
+    POST_RETRY_STATUSES), so each resend goes through its rate limiter and a
+    read timeout never turns into a duplicate send.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff_factor=0.3, backoff_jitter=0.5):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # urllib3 retries connect errors whatever the method, so POSTs get their own pool with retries off.
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                   max_retries=0, pool_block=False)
+        self.get_adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                       max_retries=retry, pool_block=False)
+        self.session = self._session(self.adapter)
+        self.get_session = self._session(self.get_adapter)
+
+    @staticmethod
+    def _session(adapter):
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.get_session.get(url, **kwargs)
+
+    def backoff(self, retry_number) -> float:
+        """Seconds to wait before the `retry_number`-th resend (1-based) of a POST."""
+        return backoff(retry_number, self.backoff_factor, self.backoff_jitter)
+
+    def stats(self) -> dict:
+        """Returns request and connection counts across all pooled hosts."""
+        num_requests = 0
+        num_connections = 0
+        hosts = set()
+        for adapter in (self.adapter, self.get_adapter):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                hosts.add((pool.scheme, pool.host, pool.port))
+                num_requests += pool.num_requests
+                num_connections += pool.num_connections
+        reused = max(num_requests - num_connections, 0)
+        return {
+            "hosts": len(hosts),
+            "requests": num_requests,
+            "connections_opened": num_connections,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / num_requests, 4) if num_requests else 0.0,
+        }
+
+    def close(self):
+        self.session.close()
+        self.get_session.close()